@@ -0,0 +1,141 @@
+"""Per-stage timings for the city index build, against the old row-by-row
+ORM build (`CityKeyIter` + `add_location` for each `WOFLocality`, kept in
+`tests/test_db/legacy_build.py`).
+
+Runs against the configured database. With `--synthetic N`, builds an
+in-memory database of N synthetic localities instead.
+
+    python benchmarks/build.py --workers 1 2 4 8
+    python benchmarks/build.py --synthetic 200000 --workers 1 4
+"""
+
+import argparse
+import os
+import random
+import time
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--synthetic', type=int)
+parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+parser.add_argument('--skip-legacy', action='store_true')
+args = parser.parse_args()
+
+if args.synthetic:
+    os.environ['LITECODER_ENV'] = 'test'
+
+import us
+
+from litecoder.db import engine, session
+from litecoder.models import BaseModel, WOFLocality, WOFRegion, WOFCounty
+from litecoder.usa import USCityIndex, keyify
+
+from tests.test_db.legacy_build import AllowBareCityName, CityKeyIter
+
+from fuzzy import SYLLABLES
+
+
+def load_synthetic(num_localities, us_share=0.3):
+    """Fill the in-memory database with WOF-shaped rows.
+    """
+    BaseModel.metadata.create_all(engine)
+
+    states = us.states.STATES
+
+    regions = [
+        dict(wof_id=i, name=s.name, name_abbr=s.abbr, country_iso='US',
+            name_a0='United States', latitude=40.0, longitude=-90.0)
+        for i, s in enumerate(states)
+    ]
+
+    counties = [
+        dict(wof_id=i, name='County %d' % i, country_iso='US')
+        for i in range(3000)
+    ]
+
+    names = [
+        ''.join(random.choices(SYLLABLES, k=random.randint(1, 3))).title()
+        for _ in range(num_localities // 3)
+    ]
+
+    localities = []
+    for wof_id in range(num_localities):
+
+        region = random.choice(regions)
+
+        localities.append(dict(
+            wof_id=wof_id,
+            wof_region_id=region['wof_id'],
+            wof_county_id=random.randrange(3000),
+            name=random.choice(names),
+            country_iso='US' if random.random() < us_share else 'CA',
+            name_a0='United States',
+            name_a1=region['name'],
+            latitude=random.uniform(25, 49),
+            longitude=random.uniform(-125, -67),
+            population=int(random.paretovariate(1) * 1000)
+                if random.random() < 0.7 else None,
+            duplicate=False,
+        ))
+
+    with engine.begin() as conn:
+        conn.execute(WOFRegion.__table__.insert(), regions)
+        conn.execute(WOFCounty.__table__.insert(), counties)
+        conn.execute(WOFLocality.__table__.insert(), localities)
+
+
+def legacy_build():
+    """The pre-pipeline build.
+    """
+    idx = USCityIndex()
+
+    iter_keys = CityKeyIter(AllowBareCityName())
+
+    for row in WOFLocality.clean_us_cities():
+
+        for key in map(keyify, iter_keys(row)):
+            idx.add_key(key, row.wof_id)
+
+        idx.add_location(row)
+
+    return idx
+
+
+def main():
+
+    if args.synthetic:
+        random.seed(1)
+        load_synthetic(args.synthetic)
+
+    results = []
+
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        legacy_build()
+        results.append(('row-by-row', None, time.perf_counter() - start))
+        session.expunge_all()
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        timings = USCityIndex().build(workers=workers)
+        results.append((
+            'pipeline, %d worker(s)' % workers,
+            timings,
+            time.perf_counter() - start,
+        ))
+
+    print()
+    print('Localities: %d' % WOFLocality.query.count())
+    print('US cities:  %d' % WOFLocality.clean_us_cities().count())
+    print()
+
+    base = results[0][2]
+
+    for name, timings, total in results:
+        print('%-24s %7.2fs  %5.1fx' % (name, total, base / total))
+        for stage, seconds in (timings or {}).items():
+            print('    %-20s %7.2fs' % (stage, seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Locality dedupe, old vs new:
+
+- Id columns: the per-column ORM passes (`dedupe_id_col` for each of
+  `ID_COLS`) vs the set-based SQL pass (`dedupe_id_cols`).
+- Proximity: one global KD-tree over ORM rows, with `field_count` per pair,
+  vs name-grouped arrays (`dedupe_proximity`).
+
+Fills an in-memory database with synthetic localities that share ids and
+names, runs both, and checks that they mark the same rows.
+
+    python benchmarks/dedupe.py --rows 100000 --workers 1 4
+"""
+
+import argparse
+import os
+import random
+import time
+
+os.environ['LITECODER_ENV'] = 'test'
+
+from scipy.spatial import cKDTree
+
+from litecoder.db import engine, session
+from litecoder.models import BaseModel, WOFLocality, WOFCounty, WOFRegion
+from litecoder.models.wof_locality import ID_COLS
+
+
+def load_synthetic(num_rows, id_range=10):
+    """Localities with ids drawn from `id_range` x `num_rows` values, so
+    some are shared, and some near-copies of other rows. Some counties /
+    regions don't exist.
+    """
+    BaseModel.metadata.create_all(engine)
+
+    with engine.begin() as conn:
+
+        conn.execute(WOFRegion.__table__.insert(), [
+            dict(wof_id=i) for i in range(50)
+        ])
+
+        conn.execute(WOFCounty.__table__.insert(), [
+            dict(wof_id=i) for i in range(3000)
+        ])
+
+        rows = []
+        for wof_id in range(num_rows):
+
+            row = dict(
+                wof_id=wof_id,
+                wof_region_id=random.randrange(60),
+                wof_county_id=random.randrange(3500),
+                name='City %d' % random.randrange(num_rows // 3),
+                population=random.choice((1000, None)),
+                latitude=random.uniform(25, 49),
+                longitude=random.uniform(-125, -67),
+                duplicate=False,
+            )
+
+            # Near-copies of earlier rows, for proximity dupes.
+            if rows and random.random() < 0.1:
+                src = random.choice(rows)
+                row.update(
+                    name=src['name'],
+                    latitude=src['latitude'] + random.uniform(-0.05, 0.05),
+                    longitude=src['longitude'] + random.uniform(-0.05, 0.05),
+                )
+
+            for name in ID_COLS:
+                row[name] = (
+                    str(random.randrange(num_rows * id_range))
+                    if random.random() < 0.7 else None
+                )
+
+            rows.append(row)
+
+        conn.execute(WOFLocality.__table__.insert(), rows)
+
+
+def dupe_ids():
+    return {
+        r.wof_id for r in
+        WOFLocality.query.filter(WOFLocality.duplicate==True)
+    }
+
+
+def reset_dupes():
+    WOFLocality.query.update({WOFLocality.duplicate: False})
+    session.commit()
+
+
+def legacy_proximity(buffer=0.1):
+    """The old `dedupe_proximity`.
+    """
+    rows = WOFLocality.query.all()
+
+    idx = cKDTree([[r.longitude, r.latitude] for r in rows])
+
+    dupes = set()
+    for id1, id2 in idx.query_pairs(buffer):
+
+        row1, row2 = rows[id1], rows[id2]
+
+        if row1.name == row2.name:
+            dupes.add(row1.wof_id if row1.field_count < row2.field_count
+                else row2.wof_id)
+
+    WOFLocality.set_dupes(dupes)
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1])
+    args = parser.parse_args()
+
+    random.seed(1)
+    load_synthetic(args.rows)
+
+    start = time.perf_counter()
+
+    for name in ID_COLS:
+        WOFLocality.dedupe_id_col(name)
+
+    orm_time = time.perf_counter() - start
+
+    orm_dupes = dupe_ids()
+    reset_dupes()
+
+    start = time.perf_counter()
+    WOFLocality.dedupe_id_cols()
+    sql_time = time.perf_counter() - start
+
+    assert dupe_ids() == orm_dupes
+    reset_dupes()
+
+    start = time.perf_counter()
+    legacy_proximity()
+    tree_time = time.perf_counter() - start
+
+    tree_dupes = dupe_ids()
+
+    array_times = []
+    for workers in args.workers:
+
+        reset_dupes()
+
+        start = time.perf_counter()
+        WOFLocality.dedupe_proximity(workers=workers)
+        array_times.append((workers, time.perf_counter() - start))
+
+        assert dupe_ids() == tree_dupes
+
+    print()
+    print('Rows: %d' % args.rows)
+    print()
+    print('Id columns - %d dupes (same in both)' % len(orm_dupes))
+    print('    orm, per column  %7.2fs' % orm_time)
+    print('    sql, one pass    %7.2fs  %5.1fx' % (
+        sql_time, orm_time / sql_time,
+    ))
+    print()
+    print('Proximity - %d dupes (same in all)' % len(tree_dupes))
+    print('    global tree      %7.2fs' % tree_time)
+
+    for workers, seconds in array_times:
+        print('    by name, %d proc  %7.2fs  %5.1fx' % (
+            workers, seconds, tree_time / seconds,
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Compare the RAM used by entity metadata: the old per-match `Box` dicts vs
+the columnar `EntityStore`.
+
+Rows are synthesized with the same columns as `WOFLocality` (plus nested
+region + county), at roughly the size of the US city index.
+
+    python benchmarks/entity_memory.py --cities 53219
+"""
+
+import argparse
+import gc
+import pickle
+import random
+import string
+import tracemalloc
+
+from box import Box
+
+from litecoder.models import WOFLocality, WOFRegion, WOFCounty
+from litecoder.store import EntityStore
+
+
+class LegacyMatch:
+
+    def __init__(self, model_cls, pk, data):
+        """The pre-`EntityStore` match layout.
+        """
+        self._model_cls = model_cls
+        self._pk = pk
+        self.data = Box(data)
+
+
+def random_value(name, kind):
+
+    if name == 'duplicate':
+        return False
+
+    if random.random() < 0.2:
+        return None
+
+    if kind == 'q':
+        return random.randint(0, 10**9)
+
+    if kind == 'd':
+        return random.uniform(-180, 180)
+
+    if kind == 'b':
+        return random.random() < 0.5
+
+    return ''.join(random.choices(string.ascii_letters, k=random.randint(5, 20)))
+
+
+def random_row(model, wof_id):
+    row = {
+        name: random_value(name, kind)
+        for name, kind, _ in model.store_columns()
+        if kind != 'g'
+    }
+    row['wof_id'] = wof_id
+    return row
+
+
+def synth_cities(num_cities, num_regions=51, num_counties=3000):
+    """Generate WOFLocality-shaped dicts.
+    """
+    regions = [random_row(WOFRegion, i) for i in range(num_regions)]
+    counties = [random_row(WOFCounty, i) for i in range(num_counties)]
+
+    for wof_id in range(num_cities):
+
+        row = random_row(WOFLocality, wof_id)
+
+        # Shared, low-cardinality strings.
+        row['country_iso'] = 'US'
+        row['name_a0'] = 'United States'
+
+        row['region'] = random.choice(regions)
+        row['county'] = random.choice(counties)
+
+        yield row
+
+
+def loaded_size(obj):
+    """Bytes allocated when unpickling `obj`, which is how indexes are loaded.
+    """
+    blob = pickle.dumps(obj)
+
+    gc.collect()
+    tracemalloc.start()
+
+    result = pickle.loads(blob)
+
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del result
+    return size
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cities', type=int, default=53219)
+    args = parser.parse_args()
+
+    random.seed(1)
+    rows = list(synth_cities(args.cities))
+
+    # Like `dict(row)`, parents are copied into each city.
+    legacy = [
+        LegacyMatch(WOFLocality, (r['wof_id'],), dict(
+            r, region=dict(r['region']), county=dict(r['county'])
+        ))
+        for r in rows
+    ]
+
+    store = EntityStore(WOFLocality.store_columns())
+    for row in rows:
+        store.add(row)
+
+    legacy_bytes = loaded_size(legacy)
+    store_bytes = loaded_size(store)
+
+    print('Cities:       %d' % args.cities)
+    print('Box matches:  %.1f MB' % (legacy_bytes / 1e6))
+    print('EntityStore:  %.1f MB' % (store_bytes / 1e6))
+    print('Ratio:        %.1fx' % (legacy_bytes / store_bytes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Throughput of free-text location extraction, in MB/s.
+
+The corpus is synthetic profile bios / posts - filler text, punctuation,
+emoji, and city / state mentions at roughly the rate seen in Twitter
+`location` + `description` fields. Uses the built city + state indexes if
+they exist; otherwise, synthetic keys (and only times `scan`, since there's
+no metadata to hydrate matches from).
+
+    python benchmarks/extract.py --docs 50000
+"""
+
+import argparse
+import os
+import random
+import time
+
+from litecoder import US_CITY_PATH, US_STATE_PATH
+from litecoder.extract import Scanner
+from litecoder.usa import Index, USCityIndex, USStateIndex
+
+from fuzzy import synth_keys
+
+
+WORDS = '''
+    i love my dog and coffee lover mom dad wife husband of two views are my
+    own living in from born raised proud fan sports music art photography
+    tech engineer writer teacher nurse student grad alum he she they based
+    out of bbq tacos hiking travel life is good follow me for more news
+    politics science books film runner yoga cat person
+'''.split()
+
+DECOR = ['', '', '', '!', '.', ',', ' |', ' 🌵', ' ❤️', ' #blessed']
+
+
+def synth_doc(mentions):
+
+    words = random.choices(WORDS, k=random.randint(5, 40))
+
+    for _ in range(random.choice([0, 0, 1, 1, 2])):
+        i = random.randrange(len(words)+1)
+        words.insert(i, random.choice(mentions))
+
+    return ' '.join(w + random.choice(DECOR) for w in words)
+
+
+def synth_mentions(keys, num=5000):
+    """Keys, re-capitalized and punctuated like real mentions.
+    """
+    mentions = []
+
+    for key in random.sample(keys, min(num, len(keys))):
+
+        tokens = key.split(' ')
+        text = ' '.join(t.title() for t in tokens)
+
+        if len(tokens) > 1 and random.random() < 0.5:
+            head, tail = text.rsplit(' ', 1)
+            text = '%s, %s' % (head, tail.upper())
+
+        mentions.append(text)
+
+    return mentions
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--docs', type=int, default=50000)
+    parser.add_argument('--synthetic', type=int)
+    args = parser.parse_args()
+
+    random.seed(1)
+
+    if args.synthetic or not os.path.exists(US_CITY_PATH):
+
+        idx = Index()
+        for i, key in enumerate(synth_keys(args.synthetic or 250000)):
+            idx.add_key(key, i)
+
+        indexes, source = [idx], 'synthetic'
+
+    else:
+        indexes = [USCityIndex.load(), USStateIndex.load()]
+        source = '%s + %s' % (US_CITY_PATH, US_STATE_PATH)
+
+    keys = [k for idx in indexes for k in idx.keys()]
+
+    start = time.perf_counter()
+    scanner = Scanner(indexes)
+    build_time = time.perf_counter() - start
+
+    mentions = synth_mentions(keys)
+    docs = [synth_doc(mentions) for _ in range(args.docs)]
+    mb = sum(len(d.encode('utf8')) for d in docs) / 1e6
+
+    print('Keys:       %d (%s)' % (len(keys), source))
+    print('Prefixes:   %d' % len(scanner))
+    print('Build:      %.2f s' % build_time)
+    print('Corpus:     %d docs, %.1f MB' % (len(docs), mb))
+    print()
+
+    modes = [('scan', scanner.scan)]
+    if source != 'synthetic':
+        modes.append(('extract', scanner.extract))
+
+    for name, func in modes:
+
+        start = time.perf_counter()
+        spans = sum(len(list(func(d))) for d in docs)
+        elapsed = time.perf_counter() - start
+
+        print('%-8s  %6.1f MB/s  %8d spans  %.2f s' % (
+            name, mb / elapsed, spans, elapsed,
+        ))
+
+
+if __name__ == '__main__':
+    main()
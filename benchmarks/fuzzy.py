@@ -0,0 +1,162 @@
+"""Hit rate and latency of fuzzy lookups, on queries with 1-2 random typos.
+
+Queries are made by sampling keys from the index and applying random edits
+(insert, delete, substitute, transpose). A query is a hit if the original key
+is among the results. Uses the built city index if there is one; otherwise,
+a synthetic key set of about the same size.
+
+    python benchmarks/fuzzy.py --queries 2000
+    python benchmarks/fuzzy.py --synthetic 250000
+"""
+
+import argparse
+import os
+import random
+import string
+import time
+
+from litecoder import US_CITY_PATH, fuzzy
+from litecoder.usa import USCityIndex, keyify
+
+
+SYLLABLES = [
+    'ar', 'bur', 'ton', 'ville', 'field', 'wood', 'ing', 'lake', 'mont',
+    'san', 'ta', 'el', 'ro', 'spring', 'port', 'ham', 'ley', 'dale', 'ford',
+    'ber', 'ca', 'na', 'lo', 'mi', 'son', 'ridge', 'hill', 'west', 'new',
+]
+
+STATES = [
+    ('alabama', 'al'), ('california', 'ca'), ('massachusetts', 'ma'),
+    ('new york', 'ny'), ('texas', 'tx'), ('ohio', 'oh'), ('oregon', 'or'),
+    ('florida', 'fl'), ('georgia', 'ga'), ('illinois', 'il'),
+]
+
+
+def synth_keys(num_keys):
+    """City-index-shaped keys: names, with state names / abbrs / usa.
+    """
+    keys = set()
+
+    while len(keys) < num_keys:
+
+        name = ''.join(random.choices(SYLLABLES, k=random.randint(1, 4)))
+        state, abbr = random.choice(STATES)
+
+        keys.update([
+            name,
+            '%s %s' % (name, state),
+            '%s %s' % (name, abbr),
+            '%s %s usa' % (name, abbr),
+        ])
+
+    return sorted(keys)
+
+
+def typo(key, edits):
+
+    chars = list(key)
+    letters = string.ascii_lowercase
+
+    for _ in range(edits):
+
+        op = random.choice('idst' if len(chars) > 1 else 'is')
+        i = random.randrange(len(chars))
+
+        if op == 'i':
+            chars.insert(i, random.choice(letters))
+        elif op == 'd':
+            del chars[i]
+        elif op == 's':
+            chars[i] = random.choice(letters)
+        elif i < len(chars) - 1:
+            chars[i], chars[i+1] = chars[i+1], chars[i]
+
+    return ''.join(chars)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values)-1, int(len(values) * p))]
+
+
+def run(table, queries, max_dist, max_nodes):
+    """Returns: (hit rate, latencies in ms)
+    """
+    hits, times = 0, []
+
+    for key, query in queries:
+
+        start = time.perf_counter()
+        positions = fuzzy.search(table, table.encode(query), max_dist, max_nodes)
+        times.append((time.perf_counter() - start) * 1000)
+
+        target = key and table.encode(key)
+        if any(table.key(pos) == target for pos in positions):
+            hits += 1
+
+    return hits / len(queries), times
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--synthetic', type=int)
+    parser.add_argument('--index', default=US_CITY_PATH)
+    parser.add_argument('--max-nodes', type=int, default=fuzzy.MAX_NODES)
+    args = parser.parse_args()
+
+    random.seed(1)
+
+    if args.synthetic or not os.path.exists(args.index):
+        keys = synth_keys(args.synthetic or 250000)
+        source = 'synthetic'
+    else:
+        keys = sorted(USCityIndex.load(args.index)._key_to_ids)
+        source = args.index
+
+    table = fuzzy.SortedKeys(keys)
+    key_set = set(keys)
+
+    print('Keys:       %d (%s)' % (len(keys), source))
+    print('Max nodes:  %d' % args.max_nodes)
+    print()
+
+    for edits in (1, 2):
+
+        queries = []
+        while len(queries) < args.queries:
+            key = random.choice(keys)
+            query = keyify(typo(key, edits))
+            if query not in key_set:
+                queries.append((key, query))
+
+        hit_rate, times = run(table, queries, edits, args.max_nodes)
+
+        print('%d edit(s), max_dist=%d' % (edits, edits))
+        print('  hit rate  %.1f%%' % (hit_rate * 100))
+        print('  p50       %.2f ms' % percentile(times, 0.5))
+        print('  p99       %.2f ms' % percentile(times, 0.99))
+        print('  max       %.2f ms' % max(times))
+
+    # Strings that aren't near any key - the worst case, since nothing cuts
+    # the search short.
+    junk = []
+    while len(junk) < args.queries:
+        query = ''.join(random.choices(
+            string.ascii_lowercase + ' ', k=random.randint(6, 24)
+        ))
+        junk.append((None, keyify(query)))
+
+    for max_dist in (1, 2):
+
+        _, times = run(table, junk, max_dist, args.max_nodes)
+
+        print('junk, max_dist=%d' % max_dist)
+        print('  p50       %.2f ms' % percentile(times, 0.5))
+        print('  p99       %.2f ms' % percentile(times, 0.99))
+        print('  max       %.2f ms' % max(times))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Cold-start time for the lookup path vs the build path.
+
+Each scenario runs in a fresh interpreter, and the median wall time is
+reported.
+
+    python benchmarks/import_time.py --runs 20
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from litecoder import US_CITY_MMAP_PATH
+
+
+SCENARIOS = [
+
+    ('python (baseline)',
+        'pass'),
+
+    ('import litecoder.usa (lookup)',
+        'import litecoder.usa'),
+
+    ('import litecoder.usa + models (build)',
+        'import litecoder.usa, litecoder.models'),
+
+    ('load mmap index + lookup',
+        'from litecoder.usa import USCityIndex; '
+        'USCityIndex.load_mmap()["Boston, MA"]'),
+
+]
+
+
+def run(code):
+    start = time.perf_counter()
+    subprocess.check_call([sys.executable, '-c', code])
+    return time.perf_counter() - start
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    for label, code in SCENARIOS:
+
+        if 'load_mmap' in code and not os.path.exists(US_CITY_MMAP_PATH):
+            print('%-40s (no index at %s)' % (label, US_CITY_MMAP_PATH))
+            continue
+
+        times = [run(code) for _ in range(args.runs)]
+        print('%-40s %7.1f ms' % (label, statistics.median(times) * 1000))
+
+
+if __name__ == '__main__':
+    main()
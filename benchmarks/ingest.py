@@ -0,0 +1,111 @@
+"""SQLite ingest throughput, in rows/sec: the ORM path (`bulk_save_objects`
++ a commit every 1000 rows, default pragmas) vs the bulk path (tuples via
+`executemany`, tuned pragmas, large transactions, indexes built last).
+
+Docs are copies of the test fixtures with new ids, parsed up front. Rows
+are converted up front too (ORM objects vs tuples), so only the writes are
+timed. Each run writes a fresh database file in a temp dir.
+
+    python benchmarks/ingest.py --rows 200000
+"""
+
+import argparse
+import copy
+import glob
+import os
+import tempfile
+import time
+
+from boltons.iterutils import chunked_iter
+
+from litecoder.db import connect_db, bulk_insert
+from litecoder.models import BaseModel, WOFLocality
+from litecoder.sources.wof import WOFLocalityDoc
+from litecoder.utils import read_json
+
+
+FIXTURES = os.path.join(
+    os.path.dirname(__file__), '../tests/test_db/fixtures/wof-locality',
+)
+
+
+def synth_docs(num_rows):
+
+    paths = glob.glob(os.path.join(FIXTURES, '**/*.geojson'), recursive=True)
+    templates = [read_json(p) for p in paths]
+
+    # Not stored, and big.
+    for doc in templates:
+        doc.pop('geometry', None)
+
+    docs = []
+    for i in range(num_rows):
+        doc = copy.deepcopy(templates[i % len(templates)])
+        doc['id'] = i
+        docs.append(WOFLocalityDoc(doc))
+
+    return docs
+
+
+def orm_load(path, docs, n=1000):
+
+    rows = [d.db_row() for d in docs]
+
+    start = time.perf_counter()
+
+    engine, session = connect_db(path)
+    BaseModel.metadata.create_all(engine)
+
+    for chunk in chunked_iter(rows, n):
+        session.bulk_save_objects(chunk)
+        session.commit()
+
+    session.remove()
+
+    return time.perf_counter() - start
+
+
+def bulk_load(path, docs):
+
+    rows = [d.db_values() for d in docs]
+
+    start = time.perf_counter()
+
+    engine, _ = connect_db(path)
+    BaseModel.metadata.create_all(engine)
+
+    bulk_insert(
+        engine,
+        WOFLocality.__table__,
+        WOFLocality.column_names(),
+        rows,
+    )
+
+    return time.perf_counter() - start
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    docs = synth_docs(args.rows)
+
+    print('Rows: %d' % args.rows)
+
+    with tempfile.TemporaryDirectory() as root:
+
+        for name, func in (('orm', orm_load), ('bulk', bulk_load)):
+
+            path = os.path.join(root, '%s.db' % name)
+
+            elapsed = func(path, docs)
+
+            print('%-5s %8.2fs  %9.0f rows/sec' % (
+                name, elapsed, args.rows / elapsed,
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""GeoJSON parse time and peak RSS: `ujson.load` on whole files vs
+`geojson.read_feature`, which reads `id` + `properties` and stops before
+`geometry`.
+
+Each method runs in a fresh process, so peak RSS is per method. Defaults to
+the WOF localities under DATA_DIR, falling back to the test fixtures.
+
+    python benchmarks/parse.py --root data/wof-locality --limit 50000
+    python benchmarks/parse.py --repeat 50  # fixtures
+"""
+
+import argparse
+import glob
+import os
+import resource
+import subprocess
+import sys
+import time
+
+
+FIXTURES = os.path.join(
+    os.path.dirname(__file__), '../tests/test_db/fixtures',
+)
+
+
+def ujson_load():
+    import ujson
+
+    def read(path):
+        with open(path) as fh:
+            return ujson.load(fh)
+
+    return read
+
+
+def streaming():
+    from litecoder.sources.geojson import read_feature
+    return read_feature
+
+
+METHODS = dict(ujson=ujson_load, streaming=streaming)
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def paths_list(root, limit):
+    pattern = os.path.join(root, '**/*.geojson')
+    return sorted(glob.iglob(pattern, recursive=True))[:limit]
+
+
+def run_method(method, root, limit, repeat):
+    """In the child: parse every path, print seconds + RSS.
+    """
+    read = METHODS[method]()
+
+    paths = paths_list(root, limit) * repeat
+
+    base = max_rss_mb()
+
+    start = time.perf_counter()
+
+    for path in paths:
+        read(path)['properties']
+
+    elapsed = time.perf_counter() - start
+
+    print(len(paths), elapsed, base, max_rss_mb())
+
+
+def main():
+
+    from litecoder import DATA_DIR
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--root', default=os.path.join(DATA_DIR, 'wof-locality'),
+    )
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--method')
+    args = parser.parse_args()
+
+    root = args.root if os.path.isdir(args.root) else FIXTURES
+
+    if args.method:
+        run_method(args.method, root, args.limit, args.repeat)
+        return
+
+    print('Root: %s' % os.path.abspath(root))
+
+    for method in METHODS:
+
+        cmd = [
+            sys.executable, __file__, '--method', method, '--root', root,
+            '--repeat', str(args.repeat),
+        ]
+
+        if args.limit:
+            cmd += ['--limit', str(args.limit)]
+
+        out = subprocess.check_output(cmd).split()
+        num, elapsed, base, peak = int(out[0]), *map(float, out[1:])
+
+        print('%-10s %6d docs  %7.2fs  %7.0f docs/sec  '
+              'peak RSS %6.1fMB (+%.1fMB)' % (
+            method, num, elapsed, num / elapsed, peak, peak - base,
+        ))
+
+
+if __name__ == '__main__':
+    main()
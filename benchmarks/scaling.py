@@ -0,0 +1,165 @@
+"""Scaling curves for the ingest + build pipeline, on synthetic WOF trees.
+
+For each size, writes a tree with `synthetic.SyntheticWOF` and times
+each stage against an in-memory database:
+
+- docs_iter: parse every locality doc, geometry included.
+- load_db: regions, counties and localities, through the ORM.
+- dedupe_id_cols / dedupe_proximity
+- build: `USCityIndex.build`
+
+Then fits time ~ rows^k across sizes; k near 1 is linear.
+
+    python benchmarks/scaling.py --localities 1000 10000 100000
+    python benchmarks/scaling.py --geometry-points 500 --output scaling.json
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+
+os.environ['LITECODER_ENV'] = 'test'
+
+from litecoder.db import engine, session
+from litecoder.models import BaseModel, WOFLocality
+from litecoder.sources.wof import (
+    WOFRegionRepo, WOFCountyRepo, WOFLocalityRepo
+)
+from litecoder.usa import USCityIndex
+
+from synthetic import SyntheticWOF
+
+
+STAGES = (
+    'write', 'docs_iter', 'load_db', 'dedupe_id_cols', 'dedupe_proximity',
+    'build',
+)
+
+
+def repo_dirs(root):
+    return [
+        (repo_cls, os.path.join(root, 'wof-%s' % placetype))
+        for repo_cls, placetype in (
+            (WOFRegionRepo, 'region'),
+            (WOFCountyRepo, 'county'),
+            (WOFLocalityRepo, 'locality'),
+        )
+    ]
+
+
+def run_stages(spec, root):
+    """Returns: dict, stage -> seconds
+    """
+    timings = dict()
+
+    def timed(stage, func):
+        start = time.perf_counter()
+        func()
+        timings[stage] = time.perf_counter() - start
+
+    timed('write', lambda: spec.write(root))
+
+    locality_repo = WOFLocalityRepo(os.path.join(root, 'wof-locality'))
+    timed('docs_iter', lambda: sum(1 for _ in locality_repo.docs_iter()))
+
+    BaseModel.metadata.drop_all(engine)
+    BaseModel.metadata.create_all(engine)
+
+    def load_db():
+        for repo_cls, path in repo_dirs(root):
+            repo_cls(path).load_db()
+
+    timed('load_db', load_db)
+    timed('dedupe_id_cols', WOFLocality.dedupe_id_cols)
+    timed('dedupe_proximity', WOFLocality.dedupe_proximity)
+    timed('build', lambda: USCityIndex().build())
+
+    session.remove()
+
+    return timings
+
+
+def exponent(sizes, seconds):
+    """Least-squares slope of log(time) on log(size).
+    """
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in seconds]
+
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+
+    num = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+    den = sum((x - mx) ** 2 for x in xs)
+
+    return num / den if den else float('nan')
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--localities', type=int, nargs='+',
+        default=[1000, 10000, 100000])
+    parser.add_argument('--regions', type=int, default=50)
+    parser.add_argument('--name-collision-rate', type=float, default=0.3)
+    parser.add_argument('--id-dupe-rate', type=float, default=0.02)
+    parser.add_argument('--near-dupe-rate', type=float, default=0.02)
+    parser.add_argument('--geometry-points', type=int, default=0)
+    parser.add_argument('--output', help='Write timings as JSON.')
+    args = parser.parse_args()
+
+    results = []
+
+    for num in args.localities:
+
+        spec = SyntheticWOF(
+            regions=args.regions,
+            counties=max(10, num // 10),
+            localities=num,
+            name_collision_rate=args.name_collision_rate,
+            id_dupe_rate=args.id_dupe_rate,
+            near_dupe_rate=args.near_dupe_rate,
+            geometry_points=args.geometry_points,
+        )
+
+        root = tempfile.mkdtemp()
+
+        try:
+            timings = run_stages(spec, root)
+        finally:
+            shutil.rmtree(root)
+
+        results.append((num, timings))
+
+        print('%d localities: %s' % (num, ', '.join(
+            '%s %.2fs' % (stage, timings[stage]) for stage in STAGES
+        )), flush=True)
+
+    sizes = [num for num, _ in results]
+
+    print()
+    print('%-18s' % 'seconds' + ''.join('%11d' % s for s in sizes) +
+        '   µs/row (largest)   k')
+
+    for stage in STAGES:
+
+        seconds = [timings[stage] for _, timings in results]
+
+        print('%-18s' % stage + ''.join('%11.2f' % t for t in seconds) +
+            '   %15.1f   %5.2f' % (
+                seconds[-1] / sizes[-1] * 1e6,
+                exponent(sizes, seconds),
+            ))
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(dict(
+                args=vars(args),
+                results=[dict(localities=n, seconds=t) for n, t in results],
+            ), fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""Load test for the HTTP service - p50 / p99 latency and requests / sec.
+
+Points keep-alive connections at a running `litecoder serve`, each sending
+requests back to back for a fixed time:
+
+    litecoder serve --port 8080 &
+    python benchmarks/serve.py --url 127.0.0.1:8080 --connections 50
+
+Without `--url`, it starts a local server in a child process for each
+`--window-ms`, over the built indexes if they exist, otherwise synthetic
+keys. `--batch N` posts arrays of N strings instead of single GETs.
+
+    python benchmarks/serve.py --window-ms 0 2 --connections 1 50
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import time
+
+from urllib.parse import quote
+
+from litecoder import US_CITY_PATH
+from litecoder.server import GeocodeServer
+from litecoder.store import infer_columns
+from litecoder.usa import Index, USCityIndex, USStateIndex
+
+from fuzzy import synth_keys
+
+
+def synthetic_indexes(num_keys):
+    """A city-shaped index over synthetic keys, and an empty state index.
+    """
+    idx = Index()
+
+    for i, key in enumerate(synth_keys(num_keys)):
+
+        data = dict(
+            wof_id=i,
+            name=key,
+            population=random.randrange(100, 100000),
+            latitude=random.uniform(25, 49),
+            longitude=random.uniform(-125, -67),
+        )
+
+        if i == 0:
+            columns = infer_columns([data])
+
+        idx.add_entity(data, columns)
+        idx.add_key(key, i)
+
+    return idx, Index()
+
+
+def load_indexes(num_keys):
+    if os.path.exists(US_CITY_PATH):
+        return USCityIndex.load(), USStateIndex.load()
+    return synthetic_indexes(num_keys)
+
+
+def synth_queries(keys, num=10000, miss_rate=0.2):
+    """Keys, re-capitalized like real input, plus some misses.
+    """
+    queries = []
+
+    for key in random.sample(keys, min(num, len(keys))):
+
+        text = ' '.join(t.title() for t in key.split(' '))
+
+        if random.random() < miss_rate:
+            text += ' xyz'
+
+        queries.append(text)
+
+    return queries
+
+
+async def read_response(reader):
+
+    status = int((await reader.readline()).split()[1])
+
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b'\r\n':
+            break
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':')[1])
+
+    await reader.readexactly(length)
+
+    return status
+
+
+async def connection(host, port, queries, batch, deadline, latencies):
+    """Send requests back to back until the deadline.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+
+    while time.perf_counter() < deadline:
+
+        if batch:
+            body = json.dumps(random.sample(queries, batch)).encode()
+            req = (
+                'POST /geocode HTTP/1.1\r\nHost: %s\r\n'
+                'Content-Length: %d\r\n\r\n' % (host, len(body))
+            ).encode() + body
+
+        else:
+            req = (
+                'GET /geocode?q=%s HTTP/1.1\r\nHost: %s\r\n\r\n' %
+                (quote(random.choice(queries)), host)
+            ).encode()
+
+        start = time.perf_counter()
+
+        writer.write(req)
+        status = await read_response(reader)
+
+        latencies.append(time.perf_counter() - start)
+
+        assert status == 200
+
+    writer.close()
+
+
+def run_loop(coro):
+    loop = asyncio.new_event_loop()
+
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def load_test(host, port, queries, connections, duration, batch):
+    """Returns: (requests / sec, p50 ms, p99 ms)
+    """
+    latencies = []
+
+    async def main():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            connection(host, port, queries, batch, deadline, latencies)
+            for _ in range(connections)
+        ))
+
+    start = time.perf_counter()
+    run_loop(main())
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies)-1, int(len(latencies)*p))] * 1000
+
+    return len(latencies) / elapsed, pct(0.5), pct(0.99)
+
+
+def run_server(indexes, port, window):
+    GeocodeServer(*indexes, window=window).run('127.0.0.1', port)
+
+
+def wait_for_port(host, port, timeout=30):
+
+    async def ping():
+        _, writer = await asyncio.open_connection(host, port)
+        writer.close()
+
+    start = time.perf_counter()
+
+    while time.perf_counter() - start < timeout:
+        try:
+            return run_loop(ping())
+        except OSError:
+            time.sleep(0.1)
+
+    raise RuntimeError('Server did not start.')
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='host:port of a running server.')
+    parser.add_argument('--connections', type=int, nargs='+', default=[50])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--batch', type=int, default=0)
+    parser.add_argument('--window-ms', type=float, nargs='+', default=[0])
+    parser.add_argument('--keys', type=int, default=250000)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    random.seed(1)
+
+    indexes = load_indexes(args.keys)
+    queries = synth_queries(list(indexes[0].keys()))
+
+    print('Connections: %s, %.0fs each, %s' % (
+        ' / '.join(map(str, args.connections)),
+        args.duration,
+        'batches of %d' % args.batch if args.batch else 'single GETs',
+    ))
+    print()
+
+    if args.url:
+        host, port = args.url.rsplit(':', 1)
+        targets = [(None, host, int(port))]
+
+    else:
+        targets = [(w, '127.0.0.1', args.port) for w in args.window_ms]
+
+    for window, host, port in targets:
+
+        proc = None
+
+        if window is not None:
+
+            proc = multiprocessing.Process(
+                target=run_server,
+                args=(indexes, port, window / 1000),
+                daemon=True,
+            )
+
+            proc.start()
+            wait_for_port(host, port)
+
+        label = '%s:%d' % (host, port) if window is None else (
+            'window %gms' % window
+        )
+
+        for conns in args.connections:
+
+            rps, p50, p99 = load_test(
+                host, port, queries, conns, args.duration, args.batch,
+            )
+
+            print('%-12s  %3d conns  %8.0f req/s  p50 %6.2fms  p99 %6.2fms' %
+                (label, conns, rps, p50, p99))
+
+        if proc:
+            proc.terminate()
+            proc.join()
+
+
+if __name__ == '__main__':
+    main()
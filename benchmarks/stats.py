@@ -0,0 +1,96 @@
+"""Cost of lookup instrumentation, per lookup.
+
+Times `idx[...]` and `lookup_many` over synthetic keys with stats off and
+on, on a mix of hits and misses. `idx[...]` is also compared with an index
+that has the `__getitem__` from before stats.
+
+    python benchmarks/stats.py --keys 250000 --queries 200000
+"""
+
+import argparse
+import random
+import time
+
+from litecoder.usa import Index, keyify
+
+from fuzzy import synth_keys
+
+
+class BareIndex(Index):
+
+    def __getitem__(self, text):
+        return self._ids_to_locs(self._lookup_key(keyify(text)))
+
+
+def time_per_query(func, queries, repeat=3):
+    """Best of `repeat`, in ns per query.
+    """
+    best = float('inf')
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(queries)
+        best = min(best, time.perf_counter() - start)
+
+    return best / len(queries) * 1e9
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--keys', type=int, default=250000)
+    parser.add_argument('--queries', type=int, default=200000)
+    args = parser.parse_args()
+
+    random.seed(1)
+
+    keys = synth_keys(args.keys)
+
+    idx, bare_idx = Index(), BareIndex()
+
+    for i, key in enumerate(keys):
+        idx.add_key(key, i)
+        bare_idx.add_key(key, i)
+
+    # The lookup path doesn't need metadata; just return ids.
+    idx._ids_to_locs = bare_idx._ids_to_locs = lambda ids: ids
+
+    queries = [
+        random.choice(keys) if random.random() < 0.8 else 'miss %d' % i
+        for i in range(args.queries)
+    ]
+
+    def bare(queries):
+        for q in queries:
+            bare_idx[q]
+
+    def getitem(queries):
+        for q in queries:
+            idx[q]
+
+    def many(queries):
+        idx._cache.clear()
+        idx.lookup_many(queries)
+
+    bare_ns = time_per_query(bare, queries)
+    off = dict(get=time_per_query(getitem, queries),
+        many=time_per_query(many, queries))
+
+    idx.enable_stats()
+
+    on = dict(get=time_per_query(getitem, queries),
+        many=time_per_query(many, queries))
+
+    print('Keys: %d, queries: %d (80%% hits)' % (args.keys, args.queries))
+    print()
+    print('                  before     off       on')
+    print('idx[...]       %6.0f ns %6.0f ns %6.0f ns' % (
+        bare_ns, off['get'], on['get'],
+    ))
+    print('lookup_many              %6.0f ns %6.0f ns' % (
+        off['many'], on['many'],
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,562 @@
+"""Benchmark suite, with results saved as JSON for comparing commits.
+
+Covers `keyify`, `Index.__getitem__` on hits and misses, `Index.load`,
+`USCityIndex.build`, `WOFRepo.load_db`, `WOFLocality.dedupe` and
+`Geocoder.best`. Lookups run
+over a synthetic Twitter-like corpus of `location` fields, against an index
+built from the test fixture WOF data and a synthetic one of realistic size;
+the database benchmarks use the fixtures, in an in-memory database.
+
+Benchmarks are classes, like asv: `params`, `setup(param)` once per param,
+`reset(param)` before each sample (untimed), and `time_*(param)` methods.
+`number` is how many operations one call does, for per-op times.
+
+    python benchmarks/suite.py run
+    python benchmarks/suite.py run --filter lookup --repeat 3
+    python benchmarks/suite.py compare results/abc123.json results/def456.json
+
+`run` writes `benchmarks/results/<commit>.json` by default.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timezone
+
+os.environ['LITECODER_ENV'] = 'test'
+
+from litecoder.db import engine, session
+from litecoder.models import BaseModel, WOFLocality
+from litecoder.sources.wof import (
+    WOFRegionRepo, WOFCountyRepo, WOFLocalityRepo
+)
+from litecoder.store import infer_columns
+from litecoder.geocoder import Geocoder
+from litecoder.usa import Index, USCityIndex, USStateIndex, keyify
+
+from fuzzy import synth_keys, STATES
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIXTURES_DIR = os.path.join(ROOT, 'tests', 'test_db', 'fixtures')
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# Strings per corpus.
+CORPUS_SIZE = 20000
+
+# Keys in the synthetic index - about the size of the real city index.
+SYNTHETIC_KEYS = 250000
+
+# Localities added on top of the fixtures, for dedupe.
+SYNTHETIC_LOCALITIES = 5000
+
+# Location fields that aren't places, in roughly the proportions seen in
+# Twitter profiles.
+JUNK = [
+    '', '', '', 'Earth', 'Planet Earth', 'worldwide', 'everywhere',
+    'somewhere', 'she/her', 'he/him', 'they/them', 'in your heart',
+    'home', 'the internet', 'Hogwarts', '🌎', '✨🌙✨', 'NY ✈️ LA',
+    'wherever the wifi is', 'IG: @someone', 'Brooklyn born', 'ur mom',
+    'Global', 'On the road', 'Mars', 'Middle Earth', 'Earth, Milky Way',
+]
+
+
+def random_case(text):
+    return random.choice((str.title, str.upper, str.lower, str))(text)
+
+
+def location_field(key):
+    """Re-format an index key like a hand-typed location field - case,
+    commas, extra spaces, periods.
+    """
+    tokens = key.split(' ')
+
+    if len(tokens) > 1 and random.random() < 0.6:
+        text = '%s, %s' % (' '.join(tokens[:-1]), tokens[-1])
+    else:
+        text = key
+
+    text = random_case(text)
+
+    if random.random() < 0.1:
+        text = '  %s ' % text.replace(' ', '  ')
+
+    if random.random() < 0.05:
+        text = text.replace(' ', '. ', 1)
+
+    return text
+
+
+def twitter_corpus(keys, num=CORPUS_SIZE, junk_rate=0.35, typo_rate=0.1):
+    """Synthetic Twitter `location` fields: index keys, hand-typed, plus
+    junk and misspellings that won't match.
+    """
+    corpus = []
+
+    for _ in range(num):
+
+        r = random.random()
+
+        if r < junk_rate:
+            text = random.choice(JUNK)
+
+        elif r < junk_rate + typo_rate:
+            text = location_field(random.choice(keys))
+            i = random.randrange(len(text) + 1)
+            text = text[:i] + random.choice('qxz') + text[i:]
+
+        else:
+            text = location_field(random.choice(keys))
+
+        corpus.append(text)
+
+    return corpus
+
+
+def reset_db():
+    BaseModel.metadata.drop_all(engine)
+    BaseModel.metadata.create_all(engine)
+
+
+def load_fixtures():
+    reset_db()
+    WOFRegionRepo(os.path.join(FIXTURES_DIR, 'wof-region')).load_db()
+    WOFCountyRepo(os.path.join(FIXTURES_DIR, 'wof-county')).load_db()
+    WOFLocalityRepo(os.path.join(FIXTURES_DIR, 'wof-locality')).load_db()
+
+
+def synthetic_states():
+    """A state index over the synthetic keys' state names + abbreviations.
+    """
+    idx = Index()
+
+    rows = [
+        dict(wof_id=i, name=name, population=random.randrange(10 ** 6, 10 ** 7))
+        for i, (name, _) in enumerate(STATES)
+    ]
+
+    columns = infer_columns(rows)
+
+    for row, (name, abbr) in zip(rows, STATES):
+        idx.add_entity(row, columns)
+        idx.add_key(name, row['wof_id'])
+        idx.add_key(abbr, row['wof_id'])
+
+    return idx
+
+
+def synthetic_index(num_keys=SYNTHETIC_KEYS):
+    """An index over synthetic keys, with one entity per key.
+    """
+    idx = Index()
+
+    columns = None
+
+    for i, key in enumerate(synth_keys(num_keys)):
+
+        data = dict(
+            wof_id=i,
+            name=key,
+            population=random.randrange(100, 100000),
+            latitude=random.uniform(25, 49),
+            longitude=random.uniform(-125, -67),
+        )
+
+        columns = columns or infer_columns([data])
+
+        idx.add_entity(data, columns)
+        idx.add_key(key, i)
+
+    return idx
+
+
+_indexes = {}
+
+
+def get_index(name):
+    """Built once per run, since the DB benchmarks reset the database.
+    """
+    if name not in _indexes:
+
+        random.seed(1)
+
+        if name == 'fixtures':
+            load_fixtures()
+            idx = USCityIndex()
+            idx.build()
+
+        elif name == 'fixtures-states':
+            load_fixtures()
+            idx = USStateIndex()
+            idx.build()
+
+        elif name == 'synthetic-states':
+            idx = synthetic_states()
+
+        else:
+            idx = synthetic_index()
+
+        _indexes[name] = idx
+
+    return _indexes[name]
+
+
+class Keyify:
+
+    number = CORPUS_SIZE
+
+    def setup(self, param):
+        random.seed(1)
+        self.corpus = twitter_corpus(synth_keys(10000))
+
+    def time_keyify(self, param):
+        for text in self.corpus:
+            keyify(text)
+
+
+class Lookup:
+
+    params = ('fixtures', 'synthetic')
+
+    def setup(self, param):
+
+        self.idx = get_index(param)
+
+        random.seed(1)
+        corpus = twitter_corpus(list(self.idx.keys()), CORPUS_SIZE * 2)
+
+        self.hits = [t for t in corpus if self.idx[t]][:CORPUS_SIZE]
+        self.misses = [t for t in corpus if not self.idx[t]][:CORPUS_SIZE]
+
+        self.number = dict(hit=len(self.hits), miss=len(self.misses))
+
+    def time_hit(self, param):
+        idx = self.idx
+        for text in self.hits:
+            idx[text]
+
+    def time_miss(self, param):
+        idx = self.idx
+        for text in self.misses:
+            idx[text]
+
+
+def best_match(matches):
+    if matches:
+        return max(matches, key=lambda m: m.data.population or 0)
+
+
+class Geocode:
+
+    """One best match per string - two index lookups + a population sort,
+    vs `Geocoder.best`.
+    """
+
+    params = ('fixtures', 'synthetic')
+
+    number = CORPUS_SIZE
+
+    def setup(self, param):
+
+        self.city_idx = get_index(param)
+        self.state_idx = get_index('%s-states' % param)
+
+        self.geocoder = Geocoder([self.city_idx, self.state_idx])
+
+        keys = list(self.city_idx.keys()) + list(self.state_idx.keys())
+
+        random.seed(1)
+        self.corpus = twitter_corpus(keys)
+
+    def time_two_indexes(self, param):
+
+        city_idx, state_idx = self.city_idx, self.state_idx
+
+        for text in self.corpus:
+            best_match(city_idx[text]) or best_match(state_idx[text])
+
+    def time_geocoder_best(self, param):
+
+        best = self.geocoder.best
+
+        for text in self.corpus:
+            best(text)
+
+
+class Load:
+
+    params = ('fixtures', 'synthetic')
+
+    def setup(self, param):
+        fh, self.path = tempfile.mkstemp(suffix='.p')
+        os.close(fh)
+        get_index(param).save(self.path)
+
+    def teardown(self, param):
+        os.remove(self.path)
+
+    def time_load(self, param):
+        Index.load(self.path)
+
+
+class Build:
+
+    def setup(self, param):
+        load_fixtures()
+
+    def time_build(self, param):
+        USCityIndex().build()
+
+
+class LoadDB:
+
+    def reset(self, param):
+        reset_db()
+
+    def time_load_db(self, param):
+        WOFRegionRepo(os.path.join(FIXTURES_DIR, 'wof-region')).load_db()
+        WOFCountyRepo(os.path.join(FIXTURES_DIR, 'wof-county')).load_db()
+        WOFLocalityRepo(os.path.join(FIXTURES_DIR, 'wof-locality')).load_db()
+
+
+class Dedupe:
+
+    params = ('fixtures', 'synthetic')
+
+    def setup(self, param):
+
+        load_fixtures()
+
+        if param == 'synthetic':
+            from dedupe import load_synthetic
+            random.seed(1)
+            load_synthetic(SYNTHETIC_LOCALITIES)
+
+    def reset(self, param):
+        WOFLocality.query.update({WOFLocality.duplicate: False})
+        session.commit()
+
+    def time_dedupe(self, param):
+        WOFLocality.dedupe()
+
+
+BENCHMARKS = (Keyify, Lookup, Geocode, Load, Build, LoadDB, Dedupe)
+
+REPEAT = dict(
+    Keyify=7, Lookup=7, Geocode=7, Load=5, Build=5, LoadDB=5, Dedupe=3,
+)
+
+
+def time_once(func, param):
+    """Time one call, with GC off, like timeit.
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        start = time.perf_counter()
+        func(param)
+        return time.perf_counter() - start
+
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def time_methods(cls):
+    return sorted(a for a in dir(cls) if a.startswith('time_'))
+
+
+def run_benchmark(cls, param, repeat, methods):
+    """Yields: (name, result dict) for each `time_*` method.
+    """
+    bench = cls()
+
+    if hasattr(bench, 'setup'):
+        bench.setup(param)
+
+    try:
+        for attr in methods:
+
+            number = getattr(bench, 'number', 1)
+
+            if isinstance(number, dict):
+                number = number[attr[5:]]
+
+            samples = []
+            for _ in range(repeat):
+
+                if hasattr(bench, 'reset'):
+                    bench.reset(param)
+
+                samples.append(time_once(getattr(bench, attr), param))
+
+            per_op = [s / number for s in samples]
+
+            yield '%s.%s' % (cls.__name__, attr), dict(
+                param=param,
+                number=number,
+                samples=samples,
+                min=min(per_op),
+                median=statistics.median(per_op),
+            )
+
+    finally:
+        if hasattr(bench, 'teardown'):
+            bench.teardown(param)
+
+
+def fmt_seconds(seconds):
+
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return '%7.2f %-2s' % (seconds / scale, unit)
+
+    return '%7.0f ns' % (seconds * 1e9)
+
+
+def result_key(name, param):
+    return '%s[%s]' % (name, param) if param else name
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=ROOT, stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(args):
+
+    commit = git_commit()
+
+    results = dict()
+
+    for cls in BENCHMARKS:
+
+        repeat = args.repeat or REPEAT[cls.__name__]
+
+        for param in getattr(cls, 'params', (None,)):
+
+            methods = [
+                m for m in time_methods(cls)
+                if not args.filter or re.search(args.filter, result_key(
+                    '%s.%s' % (cls.__name__, m), param,
+                ))
+            ]
+
+            if not methods:
+                continue
+
+            for name, res in run_benchmark(cls, param, repeat, methods):
+
+                key = result_key(name, param)
+                results[key] = res
+
+                print('%-32s %s  (min %s)' % (
+                    key, fmt_seconds(res['median']), fmt_seconds(res['min']),
+                ), flush=True)
+
+    out = dict(
+        commit=commit,
+        date=datetime.now(timezone.utc).isoformat(),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        cpus=os.cpu_count(),
+        results=results,
+    )
+
+    path = args.output or os.path.join(RESULTS_DIR, '%s.json' % commit)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    with open(path, 'w') as fh:
+        json.dump(out, fh, indent=2)
+
+    print()
+    print('Wrote %s' % path)
+
+
+def compare(args):
+    """Print new / old median ratios. Exits 1 if anything got slower than
+    the threshold.
+    """
+    with open(args.old) as fh:
+        old = json.load(fh)
+
+    with open(args.new) as fh:
+        new = json.load(fh)
+
+    print('%s -> %s' % (old['commit'], new['commit']))
+    print()
+
+    regressions = 0
+
+    for key, res in new['results'].items():
+
+        base = old['results'].get(key)
+
+        if base is None:
+            print('%-32s %s  (new)' % (key, fmt_seconds(res['median'])))
+            continue
+
+        ratio = res['median'] / base['median']
+
+        flag = ''
+        if ratio > args.threshold:
+            flag = 'slower'
+            regressions += 1
+        elif ratio < 1 / args.threshold:
+            flag = 'faster'
+
+        print('%-32s %s -> %s  %5.2fx  %s' % (
+            key,
+            fmt_seconds(base['median']),
+            fmt_seconds(res['median']),
+            ratio,
+            flag,
+        ))
+
+    sys.exit(1 if regressions else 0)
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    p = commands.add_parser('run')
+    p.set_defaults(func=run)
+    p.add_argument('--filter', help='Regex on benchmark names.')
+    p.add_argument('--repeat', type=int, help='Samples per benchmark.')
+    p.add_argument('-o', '--output', help='Default: results/<commit>.json')
+
+    p = commands.add_parser('compare')
+    p.set_defaults(func=compare)
+    p.add_argument('old')
+    p.add_argument('new')
+    p.add_argument('--threshold', type=float, default=1.1,
+        help='Flag ratios beyond this.')
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""Synthetic WOF trees, for `scaling.py` and the pipeline tests.
+"""
+
+import attr
+import json
+import math
+import os
+import random
+
+from litecoder.models.wof_locality import ID_COLS
+
+
+# Base ids, well clear of real WOF ids.
+REGION_BASE_ID = 900000000
+COUNTY_BASE_ID = 910000000
+LOCALITY_BASE_ID = 920000000
+
+CONTINENT_ID = 102191575
+
+COUNTRY_IDS = dict(US=85633793, CA=85633041, MX=85633293)
+
+COUNTRY_NAMES = dict(US='United States', CA='Canada', MX='Mexico')
+
+SYLLABLES = [
+    'ar', 'bur', 'ton', 'ville', 'field', 'wood', 'ing', 'lake', 'mont',
+    'san', 'ta', 'el', 'ro', 'spring', 'port', 'ham', 'ley', 'dale', 'ford',
+    'ber', 'ca', 'na', 'lo', 'mi', 'son', 'ridge', 'hill', 'west', 'new',
+]
+
+# Column -> WOF concordance key, for the dedupe id columns.
+CONCORDANCES = {
+    'dbp_id': 'dbp:id',
+    'fb_id': 'fb:id',
+    'fct_id': 'fct:id',
+    'fips_code': 'fips:code',
+    'gn_id': 'gn:id',
+    'gp_id': 'gp:id',
+    'loc_id': 'loc:id',
+    'nyt_id': 'nyt:id',
+    'qs_id': 'qs:id',
+    'qs_pg_id': 'qs_pg:id',
+    'wd_id': 'wd:id',
+    'wk_page': 'wk:page',
+}
+
+# Languages for filler `name:*` properties - real docs carry ~100 of them,
+# which is most of what the parser has to chew through.
+LANGS = [
+    'ara', 'cat', 'deu', 'dut', 'fin', 'fra', 'gre', 'heb', 'hin', 'ita',
+    'jpn', 'kor', 'lav', 'nld', 'pol', 'por', 'rus', 'spa', 'swe', 'tha',
+    'tur', 'ukr', 'urd', 'vie', 'zho',
+]
+
+
+def wof_path(root, wof_id):
+    """WOF-style nested path - 920000123 -> 920/000/123/920000123.geojson.
+    """
+    digits = str(wof_id)
+    parts = [digits[i:i+3] for i in range(0, len(digits), 3)]
+    return os.path.join(root, *parts, '%d.geojson' % wof_id)
+
+
+def polygon(lon, lat, radius, num_points):
+    """A closed ring around a point.
+    """
+    ring = [
+        [
+            round(lon + radius * math.cos(2 * math.pi * i / num_points), 6),
+            round(lat + radius * math.sin(2 * math.pi * i / num_points), 6),
+        ]
+        for i in range(num_points)
+    ]
+
+    return dict(type='Polygon', coordinates=[ring + ring[:1]])
+
+
+@attr.s
+class SyntheticWOF:
+    """WOF-shaped GeoJSON trees for regions, counties and localities, for
+    scale-testing ingest, dedupe and the index build.
+    """
+
+    regions = attr.ib(default=50)
+    counties = attr.ib(default=3000)
+    localities = attr.ib(default=30000)
+
+    # Share of localities that take an existing name - "Springfield".
+    # Popular names get picked more, so name counts are long-tailed.
+    name_collision_rate = attr.ib(default=0.3)
+
+    # Share of localities that share an `ID_COLS` id with an earlier one.
+    id_dupe_rate = attr.ib(default=0.02)
+
+    # Share of localities that copy an earlier one's name, a few km away.
+    near_dupe_rate = attr.ib(default=0.02)
+
+    # Max offset of a near-duplicate, in degrees.
+    near_dupe_offset = attr.ib(default=0.05)
+
+    # Vertices per polygon. 0 writes Points.
+    geometry_points = attr.ib(default=0)
+
+    # Filler `name:*` properties per doc.
+    extra_names = attr.ib(default=25)
+
+    # ISO codes, with weights. Non-US docs are skipped by the city build.
+    countries = attr.ib(default=(('US', 1),))
+
+    seed = attr.ib(default=1)
+
+    def write(self, root):
+        """Write `wof-region`, `wof-county` and `wof-locality` under a root
+        directory.
+
+        Args:
+            root (str)
+
+        Returns: dict, placetype -> docs written.
+        """
+        rand = random.Random(self.seed)
+
+        regions = list(self.region_docs(rand))
+        counties = list(self.county_docs(rand, regions))
+
+        counts = dict(region=0, county=0, locality=0)
+
+        for placetype, docs in (
+            ('region', regions),
+            ('county', counties),
+            ('locality', self.locality_docs(rand, regions, counties)),
+        ):
+
+            subdir = os.path.join(root, 'wof-%s' % placetype)
+
+            for doc in docs:
+                write_doc(subdir, doc)
+                counts[placetype] += 1
+
+        return counts
+
+    def name(self, rand, k=(1, 3)):
+        return ''.join(rand.choices(SYLLABLES, k=rand.randint(*k))).title()
+
+    def country(self, rand):
+        codes, weights = zip(*self.countries)
+        return rand.choices(codes, weights)[0]
+
+    def geometry(self, lon, lat, radius):
+        if self.geometry_points:
+            return polygon(lon, lat, radius, self.geometry_points)
+        return dict(type='Point', coordinates=[lon, lat])
+
+    def feature(self, rand, wof_id, placetype, name, lon, lat, radius,
+        props):
+        """Wrap properties in a Feature, with WOF's common fields.
+        """
+        props = dict(
+            props,
+            **{
+                'wof:id': wof_id,
+                'wof:name': name,
+                'wof:placetype': placetype,
+                'name:eng_x_preferred': [name],
+                'geom:latitude': lat,
+                'geom:longitude': lon,
+                'mz:is_current': 1,
+                'wof:superseded_by': [],
+            }
+        )
+
+        for lang in rand.sample(LANGS, min(self.extra_names, len(LANGS))):
+            props['name:%s_x_preferred' % lang] = [name]
+
+        return dict(
+            id=wof_id,
+            type='Feature',
+            properties=props,
+            bbox=[lon-radius, lat-radius, lon+radius, lat+radius],
+            geometry=self.geometry(lon, lat, radius),
+        )
+
+    def region_docs(self, rand):
+
+        for i in range(self.regions):
+
+            wof_id = REGION_BASE_ID + i
+            iso = self.country(rand)
+            name = '%s %d' % (self.name(rand, (2, 3)), i)
+
+            yield self.feature(
+                rand, wof_id, 'region', name,
+                round(rand.uniform(-125, -67), 6),
+                round(rand.uniform(25, 49), 6),
+                2,
+                {
+                    'iso:country': iso,
+                    'qs:a0': COUNTRY_NAMES[iso],
+                    'qs:a1': name,
+                    'abrv:eng_x_preferred': ['R%d' % i],
+                    'wof:abbreviation': 'R%d' % i,
+                    'wof:hierarchy': [dict(
+                        continent_id=CONTINENT_ID,
+                        country_id=COUNTRY_IDS[iso],
+                        region_id=wof_id,
+                    )],
+                    'wof:concordances': {'wd:id': 'QR%d' % wof_id},
+                },
+            )
+
+    def county_docs(self, rand, regions):
+
+        for i in range(self.counties):
+
+            wof_id = COUNTY_BASE_ID + i
+            region = rand.choice(regions)
+            rprops = region['properties']
+
+            yield self.feature(
+                rand, wof_id, 'county', '%s County' % self.name(rand),
+                round(rprops['geom:longitude'] + rand.uniform(-2, 2), 6),
+                round(rprops['geom:latitude'] + rand.uniform(-2, 2), 6),
+                0.3,
+                {
+                    'iso:country': rprops['iso:country'],
+                    'qs:a0': rprops['qs:a0'],
+                    'qs:a1': '*%s' % rprops['wof:name'],
+                    'wof:hierarchy': [dict(
+                        rprops['wof:hierarchy'][0],
+                        county_id=wof_id,
+                    )],
+                },
+            )
+
+    def locality_docs(self, rand, regions, counties):
+        """Yields localities. Names, points and ids of earlier ones are kept,
+        so that later ones can collide with them.
+        """
+        names = []
+        concordances = []
+        placed = []
+
+        for i in range(self.localities):
+
+            wof_id = LOCALITY_BASE_ID + i
+            county = rand.choice(counties)
+            cprops = county['properties']
+
+            name = self.name(rand)
+            lon = round(cprops['geom:longitude'] + rand.uniform(-1, 1), 6)
+            lat = round(cprops['geom:latitude'] + rand.uniform(-1, 1), 6)
+
+            r = rand.random()
+
+            if placed and r < self.near_dupe_rate:
+                name, lon, lat = rand.choice(placed)
+                offset = self.near_dupe_offset
+                lon = round(lon + rand.uniform(-offset, offset), 6)
+                lat = round(lat + rand.uniform(-offset, offset), 6)
+
+            elif names and r < self.near_dupe_rate + self.name_collision_rate:
+                name = rand.choice(names)
+
+            names.append(name)
+            placed.append((name, lon, lat))
+
+            # Unique ids for a random subset of the id columns.
+            conc = {
+                CONCORDANCES[col]: '%s-%d' % (col, wof_id)
+                for col in ID_COLS if rand.random() < 0.6
+            }
+
+            # Copy one id from an earlier locality.
+            if concordances and rand.random() < self.id_dupe_rate:
+                key, value = rand.choice(list(rand.choice(concordances)))
+                conc[key] = value
+
+            if conc:
+                concordances.append(tuple(conc.items()))
+
+            pop = int(rand.paretovariate(1) * 500)
+
+            props = {
+                'iso:country': cprops['iso:country'],
+                'qs:a0': cprops['qs:a0'],
+                'qs:a1': cprops['qs:a1'],
+                'wof:hierarchy': [dict(
+                    cprops['wof:hierarchy'][0],
+                    locality_id=wof_id,
+                )],
+                'wof:concordances': conc,
+                'wk:wordcount': rand.randrange(100, 10000),
+            }
+
+            # Some localities have no population, like the real data.
+            if rand.random() < 0.7:
+                props['gn:population'] = pop
+                props['wof:population'] = pop
+
+            yield self.feature(
+                rand, wof_id, 'locality', name, lon, lat, 0.05, props,
+            )
+
+
+def write_doc(root, doc):
+    """Write a doc under a placetype directory.
+    """
+    path = wof_path(root, doc['id'])
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w') as fh:
+        json.dump(doc, fh)
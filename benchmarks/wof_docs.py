@@ -0,0 +1,83 @@
+"""Per-doc field extraction time: the compiled field specs vs the original
+`safe_property` classes (kept in `tests/test_db/legacy_wof.py`).
+
+Docs are the test fixtures, parsed up front, with geometry dropped. Times
+extracting every model column from each doc, like `db_row` does.
+
+    PYTHONPATH=. python benchmarks/wof_docs.py --repeat 20000
+"""
+
+import argparse
+import glob
+import os
+import time
+
+from litecoder.sources import wof
+from litecoder.utils import read_json
+
+from tests.test_db import FIXTURES_DIR
+from tests.test_db import legacy_wof
+
+
+DOC_CLASSES = (
+    ('wof-region', wof.WOFRegionDoc, legacy_wof.WOFRegionDoc),
+    ('wof-county', wof.WOFCountyDoc, legacy_wof.WOFCountyDoc),
+    ('wof-locality', wof.WOFLocalityDoc, legacy_wof.WOFLocalityDoc),
+)
+
+
+def read_docs(name):
+
+    pattern = os.path.join(FIXTURES_DIR, name, '**/*.geojson')
+
+    docs = [read_json(p) for p in glob.glob(pattern, recursive=True)]
+
+    for doc in docs:
+        doc.pop('geometry', None)
+
+    return docs
+
+
+def legacy_row(doc, columns):
+    return {col: getattr(doc, col) for col in columns if hasattr(doc, col)}
+
+
+def time_per_doc(func, docs, repeat):
+
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        for doc in docs:
+            func(doc)
+
+    return (time.perf_counter() - start) / (repeat * len(docs))
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20000)
+    args = parser.parse_args()
+
+    for name, doc_cls, legacy_cls in DOC_CLASSES:
+
+        docs = read_docs(name)
+        columns = doc_cls.model.column_names()
+
+        legacy = time_per_doc(
+            lambda d: legacy_row(legacy_cls(d), columns),
+            docs, args.repeat,
+        )
+
+        compiled = time_per_doc(
+            lambda d: doc_cls(d).row(),
+            docs, args.repeat,
+        )
+
+        print('%-13s legacy %6.1fus  compiled %5.1fus  %5.1fx' % (
+            name, legacy * 1e6, compiled * 1e6, legacy / compiled,
+        ))
+
+
+if __name__ == '__main__':
+    main()
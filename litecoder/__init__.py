@@ -13,6 +13,14 @@ US_STATE_PATH = os.path.join(DATA_DIR, 'us-states.p')
 
 US_CITY_PATH = os.path.join(DATA_DIR, 'us-cities.p')
 
+US_STATE_MMAP_PATH = os.path.join(DATA_DIR, 'us-states.idx')
+
+US_CITY_MMAP_PATH = os.path.join(DATA_DIR, 'us-cities.idx')
+
+US_CITY_NAME_POPS_PATH = os.path.join(DATA_DIR, 'us-city-name-pops.p')
+
+US_GEOCODER_PATH = os.path.join(DATA_DIR, 'us-geocoder.p')
+
 
 logging.basicConfig(
     format='%(asctime)s | %(levelname)s : %(message)s',
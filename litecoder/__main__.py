@@ -0,0 +1,6 @@
+
+
+from .cli import main
+
+
+main()
@@ -0,0 +1,141 @@
+
+
+import pickle
+import statistics
+
+from collections import defaultdict
+
+from .usa import keyify
+
+# NOTE: What `USCityIndex.update` / `rethreshold` need, without the models -
+# unpickling a build state shouldn't import SQLAlchemy.
+
+
+class NamePopulations(dict):
+
+    def __init__(self, pops=(), median=None):
+        """Name -> populations, largest first, over every locality - including
+        dupes and non-US rows. This is all the bare-name test needs, so it's
+        persisted with the index and can be passed back into a build.
+
+        Args:
+            pops (dict): Keyified name -> sorted populations.
+            median (float): Stands in for missing populations.
+        """
+        super().__init__(pops)
+        self.median = median
+        self._rest = None
+
+    @classmethod
+    def from_rows(cls, localities, alt_names):
+        """Args:
+            localities (list): `WOFLocality` rows, as dicts.
+            alt_names (dict): Wikidata id -> alt names.
+        """
+        median = statistics.median([
+            r['population'] for r in localities if r['population']
+        ])
+
+        pops = defaultdict(list)
+
+        for row in localities:
+            names = set((row['name'], *alt_names.get(row['wd_id'], [])))
+            for name in names:
+                pops[keyify(name)].append(row['population'] or median)
+
+        return cls({
+            name: tuple(sorted(values, reverse=True))
+            for name, values in pops.items()
+        }, median)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as fh:
+            return pickle.load(fh)
+
+    def save(self, path):
+        with open(path, 'wb') as fh:
+            pickle.dump(self, fh)
+
+    def __getstate__(self):
+        return dict(median=self.median)
+
+    def __setstate__(self, state):
+        self.median = state['median']
+        self._rest = None
+
+    def rest_pop(self, key):
+        """Total population of all but the largest city with a name.
+        """
+        if self._rest is None:
+            self._rest = {
+                name: sum(values[1:])
+                for name, values in self.items()
+            }
+
+        return self._rest.get(key, 0)
+
+    def allow_bare(self, name, pop, min_p1_gap, blocklist):
+        """Is a name unique enough to be indexed on its own? True if the
+        city outnumbers all other cities with the name, combined, by more
+        than `min_p1_gap`.
+
+        Args:
+            name (str)
+            pop (int): The city's population, or None.
+            min_p1_gap (int)
+            blocklist (set): Keyified names.
+
+        Returns: bool
+        """
+        key = keyify(name)
+
+        if key in blocklist:
+            return False
+
+        return (pop or 0) - self.rest_pop(key) > min_p1_gap
+
+
+class BuildState:
+
+    def __init__(self, name_pops, fingerprints, blocklist, min_p1_gap,
+        names):
+        """What a city index was built from, for incremental updates.
+
+        Args:
+            name_pops (NamePopulations)
+            fingerprints (dict): WOF id -> `fingerprint`, for indexed cities.
+            blocklist (set): Keyified bare-name blocklist.
+            min_p1_gap (int)
+            names (dict): WOF id -> name + alt names, for indexed cities.
+        """
+        self.name_pops = name_pops
+        self.fingerprints = fingerprints
+        self.blocklist = blocklist
+        self.min_p1_gap = min_p1_gap
+        self.names = names
+
+    @classmethod
+    def from_table(cls, table, fingerprints):
+        return cls(
+            table.name_pops,
+            fingerprints,
+            table.blocklist,
+            table.min_p1_gap,
+            {data['wof_id']: tuple(names) for data, names in table.cities},
+        )
+
+    def changed_names(self, table):
+        """Get names where the bare-name test could have a different result
+        - population lists or blocklist membership changed.
+
+        Returns: set
+        """
+        old, new = self.name_pops, table.name_pops
+
+        names = {
+            name for name in old.keys() | new.keys()
+            if old.get(name) != new.get(name)
+        }
+
+        return names | (self.blocklist ^ table.blocklist)
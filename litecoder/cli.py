@@ -0,0 +1,345 @@
+
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+from collections import deque
+from contextlib import ExitStack
+from multiprocessing import Pool
+from boltons.iterutils import chunked_iter
+
+from . import (
+    US_CITY_PATH, US_STATE_PATH, US_CITY_MMAP_PATH, US_STATE_MMAP_PATH
+)
+from .usa import USCityIndex, USStateIndex
+from .utils import state_abbr
+
+
+GEOCODE_FIELDS = ('wof_id', 'name', 'state', 'lat', 'lon', 'type')
+
+
+class InputError(ValueError):
+    pass
+
+
+def load_index(cls, path, mmap_path, default_path):
+    """Load an index from a path. `.idx` files are memory-mapped, anything
+    else is unpickled. By default, prefer the mmap copy if it was built.
+    """
+    if path is None:
+        path = mmap_path if os.path.exists(mmap_path) else default_path
+
+    if path.endswith('.idx'):
+        return cls.load_mmap(path)
+
+    return cls.load(path)
+
+
+def best_match(matches):
+    """Pick the most populous match.
+    """
+    if matches:
+        return max(matches, key=lambda m: m.data.population or 0)
+
+
+def city_fields(match):
+    region = match.data.region
+    return (
+        match.data.wof_id,
+        match.data.name,
+        region.name_abbr if region else state_abbr(match.data.name_a1),
+        match.data.latitude,
+        match.data.longitude,
+        'city',
+    )
+
+
+def state_fields(match):
+    return (
+        match.data.wof_id,
+        match.data.name,
+        match.data.name_abbr,
+        match.data.latitude,
+        match.data.longitude,
+        'state',
+    )
+
+
+class Resolver:
+
+    def __init__(self, city_idx, state_idx):
+        self.city_idx = city_idx
+        self.state_idx = state_idx
+
+    def __call__(self, values):
+        """Resolve a chunk of strings. Cities are tried first, then states.
+
+        Args:
+            values (list of str)
+
+        Returns: list of tuples, aligned with GEOCODE_FIELDS; None on misses.
+        """
+        texts = ['' if v is None else str(v) for v in values]
+
+        cities = self.city_idx.lookup_many(texts)
+        states = self.state_idx.lookup_many(texts)
+
+        rows = []
+        for city_matches, state_matches in zip(cities, states):
+
+            city = best_match(city_matches)
+            state = best_match(state_matches)
+
+            if city:
+                rows.append(city_fields(city))
+            elif state:
+                rows.append(state_fields(state))
+            else:
+                rows.append(None)
+
+        return rows
+
+
+# Set by `init_worker`, keyed on the index paths.
+_resolver = None
+_resolver_paths = None
+
+
+def init_worker(city_path, state_path):
+    """Load the indexes once per process. This runs in the parent first, so
+    forked workers inherit the loaded indexes; with mmap indexes, all workers
+    share the same pages.
+    """
+    global _resolver, _resolver_paths
+
+    if _resolver_paths == (city_path, state_path):
+        return
+
+    _resolver = Resolver(
+        load_index(USCityIndex, city_path, US_CITY_MMAP_PATH, US_CITY_PATH),
+        load_index(USStateIndex, state_path, US_STATE_MMAP_PATH, US_STATE_PATH),
+    )
+
+    _resolver_paths = (city_path, state_path)
+
+
+def geocode_chunk(values):
+    return _resolver(values)
+
+
+def geocode_chunks(chunks, column, workers, city_path, state_path):
+    """Geocode chunks of rows, in input order.
+
+    With workers, at most 2 chunks per worker are in flight, so memory stays
+    flat on large inputs.
+
+    Yields: (row, fields) pairs
+    """
+    init_worker(city_path, state_path)
+
+    if workers <= 1:
+
+        for rows in chunks:
+            yield from zip(rows, geocode_chunk([r.get(column) for r in rows]))
+
+        return
+
+    with Pool(workers, init_worker, (city_path, state_path)) as pool:
+
+        pending = deque()
+
+        for rows in chunks:
+
+            values = [r.get(column) for r in rows]
+            pending.append((rows, pool.apply_async(geocode_chunk, (values,))))
+
+            if len(pending) >= workers * 2:
+                rows, res = pending.popleft()
+                yield from zip(rows, res.get())
+
+        while pending:
+            rows, res = pending.popleft()
+            yield from zip(rows, res.get())
+
+
+class JSONLReader:
+
+    def __init__(self, fh, column):
+        self.fh = fh
+        self.column = column
+        self.missing = []
+
+    def __iter__(self):
+        """Parse rows, noting the lines that don't have the column.
+
+        Yields: dict
+        """
+        for i, line in enumerate(self.fh, 1):
+
+            if not line.strip():
+                continue
+
+            row = json.loads(line)
+
+            if not isinstance(row, dict):
+                raise InputError('Line %d: expected a JSON object, got %s.' % (
+                    i, type(row).__name__,
+                ))
+
+            if self.column not in row:
+                self.missing.append(i)
+
+            yield row
+
+
+def read_rows(fh, fmt, column):
+    """Returns: (field names, row iterator)
+    """
+    if fmt == 'csv':
+
+        reader = csv.DictReader(fh)
+        fields = list(reader.fieldnames or [])
+
+        if column not in fields:
+            raise InputError('Column "%s" not in the input. Columns: %s' % (
+                column, ', '.join(fields),
+            ))
+
+        return fields, reader
+
+    return None, JSONLReader(fh, column)
+
+
+def write_rows(fh, fmt, fields, prefix, pairs):
+    """Write rows, with geocoded fields appended.
+    """
+    geo_fields = [prefix+f for f in GEOCODE_FIELDS]
+
+    if fmt == 'csv':
+        writer = csv.writer(fh)
+        writer.writerow(fields + geo_fields)
+
+    for row, geo in pairs:
+
+        geo = geo or [None] * len(geo_fields)
+
+        if fmt == 'csv':
+
+            # Ragged rows - values past the header go after the geo fields.
+            values = [row.get(f) for f in fields] + list(geo)
+            values += row.get(None, [])
+
+            writer.writerow(['' if v is None else v for v in values])
+
+        else:
+            row.update(zip(geo_fields, geo))
+            fh.write(json.dumps(row) + '\n')
+
+
+def guess_format(path):
+    if path and path.endswith(('.jsonl', '.json', '.ndjson')):
+        return 'jsonl'
+    return 'csv'
+
+
+def geocode(args):
+    """Geocode a CSV / JSONL file.
+    """
+    fmt = args.format or guess_format(args.input)
+
+    with ExitStack() as stack:
+
+        fin = (
+            sys.stdin if args.input in (None, '-')
+            else stack.enter_context(open(args.input, newline=''))
+        )
+
+        fout = (
+            sys.stdout if args.output in (None, '-')
+            else stack.enter_context(open(args.output, 'w', newline=''))
+        )
+
+        fields, rows = read_rows(fin, fmt, args.column)
+
+        chunks = chunked_iter(rows, args.chunk_size)
+
+        pairs = geocode_chunks(
+            chunks, args.column, args.workers,
+            args.city_index, args.state_index,
+        )
+
+        write_rows(fout, fmt, fields, args.prefix, pairs)
+
+    missing = getattr(rows, 'missing', None)
+
+    if missing:
+        sys.stderr.write('%d rows have no "%s" field. Lines: %s%s\n' % (
+            len(missing), args.column,
+            ', '.join(map(str, missing[:10])),
+            ', ...' if len(missing) > 10 else '',
+        ))
+
+
+def serve(args):
+    """Run the HTTP geocoding service.
+    """
+    from .server import GeocodeServer
+
+    server = GeocodeServer(
+        load_index(USCityIndex, args.city_index, US_CITY_MMAP_PATH,
+            US_CITY_PATH),
+        load_index(USStateIndex, args.state_index, US_STATE_MMAP_PATH,
+            US_STATE_PATH),
+        window=args.window_ms / 1000,
+        max_batch=args.max_batch,
+    )
+
+    server.run(args.host, args.port)
+
+
+def build_parser():
+
+    parser = argparse.ArgumentParser(prog='litecoder')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    p = commands.add_parser('geocode', help='Geocode a CSV / JSONL column.')
+    p.set_defaults(func=geocode)
+
+    p.add_argument('input', nargs='?', help='Input file. Default: stdin.')
+    p.add_argument('-c', '--column', required=True, help='Column to geocode.')
+    p.add_argument('-o', '--output', help='Output file. Default: stdout.')
+    p.add_argument('-f', '--format', choices=('csv', 'jsonl'))
+    p.add_argument('-w', '--workers', type=int, default=1)
+    p.add_argument('--chunk-size', type=int, default=10000)
+    p.add_argument('--prefix', default='geo_', help='Output column prefix.')
+    p.add_argument('--city-index', help='City index (.idx or pickle).')
+    p.add_argument('--state-index', help='State index (.idx or pickle).')
+
+    p = commands.add_parser('serve', help='Run the HTTP geocoding service.')
+    p.set_defaults(func=serve)
+
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('-p', '--port', type=int, default=8080)
+    p.add_argument('--window-ms', type=float, default=0,
+        help='How long to wait for a batch to fill. Default: one loop turn.')
+    p.add_argument('--max-batch', type=int, default=1000,
+        help='Max strings per lookup pass.')
+    p.add_argument('--city-index', help='City index (.idx or pickle).')
+    p.add_argument('--state-index', help='State index (.idx or pickle).')
+
+    return parser
+
+
+def main(argv=None):
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        args.func(args)
+    except InputError as e:
+        parser.error(str(e))
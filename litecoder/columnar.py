@@ -0,0 +1,168 @@
+
+
+import numpy as np
+
+from time import perf_counter
+
+from .store import INT_NULL
+from .usa import keyify
+
+
+# `wof_id` for rows with no match, or more than one.
+NO_MATCH = -1
+
+
+def factorize(values):
+    """Map values -> (codes, uniques), with code -1 for nulls.
+
+    Uses Arrow's dictionary encoding or pandas' hash table when possible;
+    otherwise falls back to a dict.
+
+    Args:
+        values (list, np.ndarray, pd.Series, pa.Array, pa.ChunkedArray)
+
+    Returns: (np.ndarray of int64, list of str)
+    """
+    module = type(values).__module__
+
+    if module.startswith('pyarrow'):
+        return _factorize_arrow(values)
+
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    if pd is not None:
+        if not module.startswith('pandas'):
+            values = np.asarray(values, dtype=object)
+        codes, uniques = pd.factorize(values)
+        return codes.astype(np.int64), list(uniques)
+
+    seen = dict()
+
+    codes = np.fromiter(
+        (-1 if v is None else seen.setdefault(v, len(seen)) for v in values),
+        dtype=np.int64,
+    )
+
+    return codes, list(seen)
+
+
+def _factorize_arrow(values):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+
+    encoded = values.dictionary_encode()
+
+    codes = pc.fill_null(encoded.indices, -1)
+    codes = codes.to_numpy(zero_copy_only=False).astype(np.int64)
+
+    return codes, encoded.dictionary.to_pylist()
+
+
+def column_array(store, name):
+    """Get a store column as a NumPy array, without copying.
+    """
+    kind = store._kinds[name]
+
+    if kind not in ('q', 'd'):
+        raise ValueError('`%s` is not a numeric column.' % name)
+
+    return np.frombuffer(store.column(name), dtype=np.dtype(kind))
+
+
+def take_columns(store, rows, names):
+    """Gather store columns for an array of rows.
+
+    Args:
+        store (store.EntityStore)
+        rows (np.ndarray): Rows, or -1 for no match.
+        names (iter): Numeric columns.
+
+    Returns: dict of arrays; NO_MATCH for `wof_id`, NaN / INT_NULL for other
+    columns on missing rows.
+    """
+    matched = rows >= 0
+
+    result = dict()
+
+    for name in names:
+
+        column = column_array(store, name)
+        null = NO_MATCH if name == 'wof_id' else \
+            (np.nan if column.dtype.kind == 'f' else INT_NULL)
+
+        if len(column):
+            result[name] = np.where(matched, column[rows], null)
+        else:
+            result[name] = np.full(len(rows), null, dtype=column.dtype)
+
+    return result
+
+
+def geocode_column(index, values, fields=()):
+    """Geocode a column of strings. Values are factorized first, so each
+    distinct string is only looked up once, and results are broadcast back
+    with NumPy indexing. Like `__getitem__` and `lookup_many`, misses fall
+    back to fuzzy search if enabled, and lookups are counted if stats are
+    enabled.
+
+    Args:
+        index (usa.Index)
+        values (list, np.ndarray, pd.Series, pa.Array, pa.ChunkedArray)
+        fields (iter): Extra numeric columns to return - eg, `latitude`,
+            `longitude`, `population`.
+
+    Returns: dict of arrays, aligned with the input:
+        wof_id: int64; NO_MATCH when there are 0 or 2+ matches.
+        count: int64 number of matches.
+        Each field: float64 with NaN, or int64 with INT_NULL, when there
+        isn't a single match.
+    """
+    stats = index.stats
+
+    if stats is not None:
+        start = perf_counter()
+
+    codes, uniques = factorize(values)
+
+    # One slot per unique value, plus a trailing sentinel for null codes (-1).
+    u_rows = np.full(len(uniques)+1, -1, dtype=np.int64)
+    u_count = np.zeros(len(uniques)+1, dtype=np.int64)
+
+    u_matches = []
+
+    for i, text in enumerate(uniques):
+
+        ids = index._lookup_key(keyify(str(text)))
+        rows = None if ids is None else index._ids_to_rows(ids)
+
+        u_matches.append(rows)
+
+        if rows:
+            u_count[i] = len(rows)
+
+        if rows and len(rows) == 1:
+            u_rows[i] = rows[0]
+
+    rows = u_rows[codes]
+
+    result = dict(count=u_count[codes])
+    result.update(take_columns(index._store(), rows, ('wof_id', *fields)))
+
+    if stats is not None:
+
+        # Count each non-null input, as in `lookup_many`.
+        codes = [c for c in codes.tolist() if c >= 0]
+
+        stats.record_batch(
+            [str(uniques[c]) for c in codes],
+            [u_matches[c] for c in codes],
+            perf_counter()-start, 0, keyify,
+        )
+
+    return result
@@ -1,9 +1,15 @@
 
 
 import os
+import sqlite3
+
+from contextlib import contextmanager
+from itertools import islice
+from urllib.parse import quote
 
 from sqlalchemy.engine.url import URL
 from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import QueuePool
 from sqlalchemy import create_engine, event
 
 from . import LITECODER_ENV, DATA_DIR
@@ -38,6 +44,137 @@ def connect_db(db_path):
     return engine, session
 
 
+# Bytes of the file to memory-map, for read-only connections.
+READONLY_MMAP_SIZE = 256 * 1024 ** 2
+
+
+def connect_readonly(db_path, mmap_size=READONLY_MMAP_SIZE, pool_size=8):
+    """Read-only connection to a finished database, for hydrating matches.
+    The file is opened as immutable, so SQLite skips locking and change
+    detection; reads go through mmap. Each thread gets its own session,
+    which checks a connection out of a queue pool - a connection is only
+    ever used by one thread at a time, and threads never wait for one.
+    Nothing issues BEGIN, and writes fail.
+
+    Don't use this while the file can still change.
+
+    Args:
+        db_path (str)
+        mmap_size (int): Bytes.
+        pool_size (int): Idle connections kept open.
+
+    Returns: engine, session
+    """
+    uri = 'file:%s?mode=ro&immutable=1' % quote(os.path.abspath(db_path))
+
+    def creator():
+
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+        conn.execute('pragma query_only=ON')
+        conn.execute('pragma mmap_size=%d' % mmap_size)
+
+        return conn
+
+    engine = create_engine(
+        'sqlite://',
+        creator=creator,
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=-1,
+    )
+
+    factory = sessionmaker(bind=engine)
+    session = scoped_session(factory)
+
+    return engine, session
+
+
+# Fast + unsafe - fine for a load that can just be re-run.
+BULK_LOAD_PRAGMAS = dict(
+    journal_mode='OFF',
+    synchronous='OFF',
+    cache_size=-512000,  # KiB
+    temp_store='MEMORY',
+)
+
+
+@contextmanager
+def bulk_load_connection(engine, table):
+    """Connection tuned for a one-off bulk load. Journaling and fsyncs are
+    turned off, and the table's secondary indexes are dropped, then created
+    again at the end, which is much faster than updating them row by row.
+
+    Args:
+        engine (sqlalchemy.engine.Engine)
+        table (sqlalchemy.Table)
+
+    Yields: sqlalchemy.engine.Connection
+    """
+    with engine.connect() as conn:
+
+        saved = {
+            name: conn.execute('pragma %s' % name).scalar()
+            for name in BULK_LOAD_PRAGMAS
+        }
+
+        for name, value in BULK_LOAD_PRAGMAS.items():
+            conn.execute('pragma %s=%s' % (name, value))
+
+        for index in table.indexes:
+            conn.execute('drop index if exists %s' % index.name)
+
+        try:
+            yield conn
+
+        finally:
+
+            for index in table.indexes:
+                index.create(conn)
+
+            for name, value in saved.items():
+                conn.execute('pragma %s=%s' % (name, value))
+
+
+def bulk_insert(engine, table, columns, rows, n=100000):
+    """Insert tuples with raw `executemany`, in large transactions.
+
+    Args:
+        engine (sqlalchemy.engine.Engine)
+        table (sqlalchemy.Table)
+        columns (list of str): Column order of the tuples.
+        rows (iter of tuple)
+        n (int): Rows per transaction.
+
+    Returns: int, rows inserted.
+    """
+    sql = 'insert into %s (%s) values (%s)' % (
+        table.name,
+        ', '.join(columns),
+        ', '.join('?' * len(columns)),
+    )
+
+    count = 0
+
+    with bulk_load_connection(engine, table) as conn:
+
+        rows = iter(rows)
+
+        while True:
+
+            chunk = list(islice(rows, n))
+
+            if not chunk:
+                break
+
+            with conn.begin():
+                conn.connection.cursor().executemany(sql, chunk)
+
+            count += len(chunk)
+
+    return count
+
+
 db_path = os.path.join(DATA_DIR, 'litecoder.db')
 
 # In-memory for tests.
@@ -45,3 +182,24 @@ if LITECODER_ENV == 'test':
     db_path = None
 
 engine, session = connect_db(db_path)
+
+# See `use_readonly`.
+read_engine, read_session = None, None
+
+
+def use_readonly(path=None, **kwargs):
+    """Hydrate matches through a read-only connection (`connect_readonly`),
+    instead of the read-write session.
+
+    Args:
+        path (str): Defaults to the packaged database.
+    """
+    global read_engine, read_session
+
+    read_engine, read_session = connect_readonly(path or db_path, **kwargs)
+
+
+def hydration_session():
+    """Returns: The session that `Match.db_row` / `hydrate` read from.
+    """
+    return read_session or session
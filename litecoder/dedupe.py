@@ -0,0 +1,118 @@
+
+
+import numpy as np
+
+from multiprocessing import Pool
+from scipy.spatial import cKDTree
+
+
+# Groups at least this big get a KD-tree; smaller ones are compared
+# pairwise.
+TREE_MIN_SIZE = 64
+
+
+def name_groups(names):
+    """Group row indexes by exact name. None is a name too, like the `==`
+    check the old pairwise dedupe did.
+
+    Args:
+        names (list)
+
+    Returns: list of int arrays, ascending, for groups of 2+ rows.
+    """
+    codes = {}
+    name_codes = np.fromiter(
+        (codes.setdefault(n, len(codes)) for n in names),
+        dtype=np.int64,
+        count=len(names),
+    )
+
+    order = np.argsort(name_codes, kind='stable')
+    counts = np.bincount(name_codes, minlength=len(codes))
+
+    groups = np.split(order, np.cumsum(counts)[:-1])
+
+    return [g for g in groups if len(g) > 1]
+
+
+def group_pairs(points, buffer):
+    """Find pairs within `buffer` in one name group.
+
+    Args:
+        points (np.ndarray): (n, 2) lon / lat.
+        buffer (float): Max distance, in degrees.
+
+    Returns: (n, 2) array of local index pairs, i < j.
+    """
+    if len(points) >= TREE_MIN_SIZE:
+        return cKDTree(points).query_pairs(buffer, output_type='ndarray')
+
+    i, j = np.triu_indices(len(points), k=1)
+
+    d = points[i] - points[j]
+    close = (d ** 2).sum(axis=1) <= buffer ** 2
+
+    return np.column_stack((i[close], j[close]))
+
+
+def chunk_pairs(args):
+    """Pairs for a list of groups, as global row indexes.
+
+    Args:
+        args (tuple): ([(row indexes, points)], buffer)
+    """
+    groups, buffer = args
+
+    pairs = [
+        group[group_pairs(points, buffer)]
+        for group, points in groups
+    ]
+
+    return np.concatenate(pairs) if pairs else np.empty((0, 2), np.int64)
+
+
+def proximity_dupes(lons, lats, names, scores, buffer=0.1, workers=1,
+    chunk_size=10000):
+    """For every pair of same-name rows within `buffer` degrees, mark the
+    less complete one as a dupe - the later row on a tie.
+
+    Only rows that share a name are ever compared, so work tracks the
+    number of real candidate pairs, not the size of the table.
+
+    Args:
+        lons (np.ndarray)
+        lats (np.ndarray)
+        names (list)
+        scores (np.ndarray): Completeness, like `field_count`.
+        buffer (float): Max distance, in degrees.
+        workers (int): Processes to spread name groups across.
+        chunk_size (int): Groups per task.
+
+    Returns: np.ndarray of dupe row indexes.
+    """
+    points = np.column_stack((lons, lats)).astype(np.float64)
+
+    groups = name_groups(names)
+
+    # Only each group's own points go to the workers.
+    chunks = [
+        ([(g, points[g]) for g in groups[i:i+chunk_size]], buffer)
+        for i in range(0, len(groups), chunk_size)
+    ]
+
+    if workers > 1:
+        with Pool(workers) as pool:
+            parts = pool.map(chunk_pairs, chunks)
+    else:
+        parts = list(map(chunk_pairs, chunks))
+
+    if not parts:
+        return np.empty(0, np.int64)
+
+    pairs = np.concatenate(parts)
+
+    i, j = pairs[:, 0], pairs[:, 1]
+
+    dupes = np.where(scores[i] < scores[j], i, j)
+
+    return np.unique(dupes)
@@ -0,0 +1,183 @@
+
+
+import re
+
+
+# Trimmed from the ends of tokens in free text - "(Boston)", "Austin!".
+PUNCT = r'"\'()\[\]{}<>!?;:*#@|/\\'
+
+# Keys are split on whitespace, commas and hyphens (see `usa.keyify`).
+TOKEN_RE = re.compile(
+    r'[^\s,\-{0}](?:[^\s,\-]*[^\s,\-{0}])?'.format(PUNCT)
+)
+
+
+def tokenize(text):
+    """Split free text into index-key tokens.
+
+    Yields: (start, end, token) - offsets into the raw text, and the token
+    normalized like `keyify`.
+    """
+    lower = text.lower()
+
+    # A few characters change length when lowercased; offsets have to come
+    # from the raw text then.
+    if len(lower) != len(text):
+        lower = None
+
+    for m in TOKEN_RE.finditer(lower or text):
+
+        word = m.group()
+
+        if lower is None:
+            word = word.lower()
+
+        if '.' not in word:
+            yield m.start(), m.end(), word
+            continue
+
+        start, end = m.span()
+
+        # Sentence-final periods aren't part of the mention, unless it's an
+        # abbreviation like "D.C."
+        if word[-1] == '.' and word.count('.') == 1:
+            end -= 1
+
+        word = word.replace('.', '')
+
+        if word:
+            yield start, end, word
+
+
+class Span:
+
+    __slots__ = ('start', 'end', 'text', 'key', 'matches')
+
+    def __init__(self, start, end, text, key, matches):
+        """A location mention in free text.
+
+        Args:
+            start (int): Offset of the first character.
+            end (int): Offset after the last character.
+            text (str): The raw mention.
+            key (str): The index key it matched.
+            matches (list): Matches, from each index that has the key.
+        """
+        self.start = start
+        self.end = end
+        self.text = text
+        self.key = key
+        self.matches = matches
+
+    def __repr__(self):
+        return '%s<%d:%d, %s, %d matches>' % (
+            self.__class__.__name__,
+            self.start,
+            self.end,
+            self.text,
+            len(self.matches),
+        )
+
+    @property
+    def wof_ids(self):
+        return [m.data.wof_id for m in self.matches]
+
+
+class Scanner:
+
+    def __init__(self, indexes):
+        """Find index keys in free text.
+
+        Every token prefix of every key goes in a dict, mapped to the
+        indexes that have it as a full key (empty for proper prefixes). Text
+        is scanned left to right; from each token, the longest key is taken
+        and scanning picks up after it. Keys are at most a few tokens long,
+        so this is linear in the length of the text.
+
+        Args:
+            indexes (list of usa.Index): Matches are listed in this order -
+                eg, cities then states.
+        """
+        self.indexes = list(indexes)
+
+        self._prefixes = dict()
+        self.max_tokens = 0
+
+        empty = ()
+
+        for i, idx in enumerate(self.indexes):
+            for key in idx.keys():
+
+                tokens = key.split(' ')
+                self.max_tokens = max(self.max_tokens, len(tokens))
+
+                for j in range(1, len(tokens)):
+                    self._prefixes.setdefault(' '.join(tokens[:j]), empty)
+
+                hits = self._prefixes.get(key, empty)
+                self._prefixes[key] = hits + (i,)
+
+    def __len__(self):
+        return len(self._prefixes)
+
+    def scan(self, text):
+        """Find the leftmost-longest, non-overlapping keys in a text.
+
+        Yields: (start, end, key, index positions)
+        """
+        prefixes = self._prefixes
+        tokens = list(tokenize(text))
+
+        i, n = 0, len(tokens)
+
+        while i < n:
+
+            key = tokens[i][2]
+            hits = prefixes.get(key)
+
+            # Most tokens don't start a key.
+            if hits is None:
+                i += 1
+                continue
+
+            best = (i, key, hits) if hits else None
+
+            for j in range(i+1, min(i + self.max_tokens, n)):
+
+                key += ' ' + tokens[j][2]
+                hits = prefixes.get(key)
+
+                # Not a prefix of any key; longer spans can't match.
+                if hits is None:
+                    break
+
+                if hits:
+                    best = (j, key, hits)
+
+            if best:
+                j, key, hits = best
+                yield tokens[i][0], tokens[j][1], key, hits
+                i = j + 1
+
+            else:
+                i += 1
+
+    def extract(self, text):
+        """Find location mentions in a text.
+
+        Args:
+            text (str)
+
+        Returns: list of Span
+        """
+        spans = []
+
+        for start, end, key, hits in self.scan(text):
+
+            matches = []
+            for i in hits:
+                matches += self.indexes[i][key] or []
+
+            spans.append(Span(start, end, text[start:end], key, matches))
+
+        return spans
@@ -0,0 +1,278 @@
+
+
+from bisect import bisect_left
+
+
+# Max trie nodes expanded per search, past 1 edit; bounds worst-case latency.
+MAX_NODES = 1000
+
+
+class SortedKeys:
+
+    def __init__(self, keys):
+        """A sorted list of keys, treated as an implicit trie: the keys that
+        share a prefix are a contiguous range.
+
+        Args:
+            keys (list of str): Sorted.
+        """
+        self.keys = keys
+        self.num_keys = len(keys)
+
+    def encode(self, text):
+        return text
+
+    def key(self, pos):
+        return self.keys[pos]
+
+    def bisect(self, target, lo=0, hi=None):
+        hi = self.num_keys if hi is None else hi
+        return bisect_left(self.keys, target, lo, hi)
+
+
+def auto_dist(length):
+    """Max edits that make sense for a query of a given length - short
+    strings are exact-only.
+    """
+    if length <= 2:
+        return 0
+
+    if length <= 5:
+        return 1
+
+    return 2
+
+
+def successor(prefix):
+    """The smallest string that sorts after every string with `prefix`, or
+    None if there isn't one.
+    """
+    last = prefix[-1]
+
+    if isinstance(prefix, bytes):
+        return prefix[:-1] + bytes([last+1]) if last < 255 else None
+
+    return prefix[:-1] + chr(ord(last)+1)
+
+
+def search(table, query, max_dist=1, max_nodes=MAX_NODES):
+    """Find keys within `max_dist` edits of a query. Edits are inserts,
+    deletes, substitutions and transpositions of adjacent characters
+    (optimal string alignment distance). Tries 1 edit, then 2, etc.
+
+    1 edit is a fixed set of exact lookups along the query's path in the
+    trie (`_search_one`). 2+ edits walk the implicit trie with a banded DP,
+    pruning branches that can't get back under the limit, and expand at
+    most `max_nodes` nodes in total.
+
+    So, the cost of 1 edit grows with the query's length and the fan-out of
+    its trie path, not the number of keys; past 1 edit, it's capped by
+    `max_nodes`. See benchmarks/README.md for timings.
+
+    Args:
+        table: Sorted key table, with `num_keys`, `key(pos)` and `bisect()`.
+        query (str or bytes): Same type as the keys.
+        max_dist (int)
+        max_nodes (int)
+
+    Returns: list of key positions, at the smallest distance found.
+    """
+    max_dist = min(max_dist, auto_dist(len(query)))
+
+    if not table.num_keys:
+        return []
+
+    for dist in range(1, max_dist+1):
+
+        if dist == 1:
+            matches = _search_one(table, query)
+        else:
+            matches, max_nodes = _search(table, query, dist, max_nodes)
+
+        if matches or max_nodes < 0:
+            return matches
+
+    return []
+
+
+def find(table, target, lo, hi):
+    """Position of a key in a range of the table, or None.
+    """
+    pos = table.bisect(target, lo, hi)
+
+    if pos < hi and table.key(pos) == target:
+        return pos
+
+
+def children(table, depth, lo, hi):
+    """Child nodes of the trie node at a range: (char, lo, hi). The char is
+    a length-1 slice, so it's the same type as the keys.
+    """
+    if lo < hi and len(table.key(lo)) == depth:
+        lo += 1
+
+    while lo < hi:
+
+        key = table.key(lo)
+
+        end = successor(key[:depth+1])
+        end = hi if end is None else table.bisect(end, lo, hi)
+
+        yield key[depth:depth+1], lo, end
+
+        lo = end
+
+
+def _search_one(table, query):
+    """Keys exactly 1 edit away, without a DP. Walks down the query's own
+    path in the trie; at each depth, the one-edit variants that share the
+    prefix so far are a few exact lookups - the delete and transposition
+    here, and a substitution / insert for each child that exists.
+
+    Returns: list of key positions.
+    """
+    n, matches = len(query), set()
+
+    lo, hi = 0, table.num_keys
+
+    for i in range(n+1):
+
+        head, tail = query[:i], query[i+1:]
+
+        if i == n:
+            pos = find(table, query, lo, hi)
+            if pos is not None:
+                return [pos]
+
+        candidates = []
+
+        if i < n:
+            candidates.append(head + tail)
+
+        if i < n-1 and query[i] != query[i+1]:
+            candidates.append(head + query[i+1:i+2] + query[i:i+1] + tail[1:])
+
+        for target in candidates:
+            pos = find(table, target, lo, hi)
+            if pos is not None:
+                matches.add(pos)
+
+        next_range = None
+
+        for char, clo, chi in children(table, i, lo, hi):
+
+            if i < n and char == query[i:i+1]:
+                next_range = clo, chi
+                targets = (head + char + query[i:],)
+
+            elif i < n:
+                targets = (head + char + tail, head + char + query[i:])
+
+            else:
+                targets = (head + char,)
+
+            for target in targets:
+                pos = find(table, target, clo, chi)
+                if pos is not None:
+                    matches.add(pos)
+
+        if next_range is None:
+            break
+
+        lo, hi = next_range
+
+    return sorted(matches)
+
+
+def _search(table, query, max_dist, max_nodes):
+    """Returns: (key positions, remaining node budget)
+    """
+    best, matches = max_dist, []
+
+    # Cells more than `max_dist` off the diagonal can't be under the limit,
+    # so each DP row only fills that band; the rest are capped at `over`.
+    n, over = len(query), max_dist + 1
+
+    root = [min(j, over) for j in range(n+1)]
+
+    # (depth, lo, hi, DP row, parent DP row, last char)
+    stack = [(0, 0, table.num_keys, root, None, None)]
+
+    while stack:
+
+        depth, lo, hi, row, prev_row, prev_char = stack.pop()
+
+        key = table.key(lo)
+
+        # The node's own key sorts first in its range.
+        if len(key) == depth:
+
+            dist = row[-1]
+
+            if dist < best:
+                best, matches = dist, [lo]
+
+            elif dist == best:
+                matches.append(lo)
+
+            lo += 1
+
+        i = depth + 1
+
+        band_lo, band_hi = max(1, i - max_dist), min(n, i + max_dist)
+
+        # Deeper keys are too long to get back under the limit.
+        if band_lo > band_hi and i > max_dist:
+            continue
+
+        # Expand children.
+        while lo < hi:
+
+            max_nodes -= 1
+            if max_nodes < 0:
+                return matches, max_nodes
+
+            key = table.key(lo)
+            char = key[depth]
+
+            end = successor(key[:depth+1])
+            end = hi if end is None else table.bisect(end, lo, hi)
+
+            child = [over] * (n+1)
+
+            if i <= max_dist:
+                child[0] = i
+
+            low = child[0]
+
+            for j in range(band_lo, band_hi+1):
+
+                q = query[j-1]
+
+                cost = min(
+                    child[j-1] + 1,
+                    row[j] + 1,
+                    row[j-1] + (q != char),
+                )
+
+                # Transposition: "ab" <-> "ba"
+                if (
+                    prev_row is not None and j > 1 and
+                    q == prev_char and query[j-2] == char
+                ):
+                    cost = min(cost, prev_row[j-2] + 1)
+
+                if cost > over:
+                    cost = over
+
+                child[j] = cost
+
+                if cost < low:
+                    low = cost
+
+            if low <= best:
+                stack.append((depth+1, lo, end, child, row, char))
+
+            lo = end
+
+    return matches, max_nodes
@@ -0,0 +1,126 @@
+
+
+import pickle
+
+from collections import defaultdict
+
+from . import US_GEOCODER_PATH
+from .usa import keyify
+
+
+def population(store, row):
+    """Population of an entity, 0 if unknown.
+    """
+    try:
+        return store.get(row, 'population') or 0
+    except KeyError:
+        return 0
+
+
+class Geocoder:
+
+    @classmethod
+    def load(cls, path=US_GEOCODER_PATH):
+        with open(path, 'rb') as fh:
+            return pickle.load(fh)
+
+    def __init__(self, indexes):
+        """One key space over several indexes - eg, cities, then states. Each
+        key maps to all of its entities, tagged by index, and ranked once,
+        here: entities from earlier indexes first, then the most populous.
+        A lookup is one `keyify` and one dict probe, and `best` just takes
+        the first entity.
+
+        The key -> entity table is a snapshot; rebuild it after changing
+        the indexes.
+
+        Args:
+            indexes (list of usa.Index)
+        """
+        self.names = [idx.__class__.__name__ for idx in indexes]
+
+        # Match class + entity store, per tag.
+        self._targets = [(idx.match_cls, idx._entities) for idx in indexes]
+
+        self._key_to_codes = self._merge(indexes)
+
+    def _merge(self, indexes):
+        """Rank every key's entities.
+
+        Returns: dict, key -> tuple of codes, `row * len(indexes) + tag`.
+        """
+        num = len(indexes)
+
+        entries = defaultdict(list)
+
+        for tag, idx in enumerate(indexes):
+
+            store = idx._entities
+
+            pops = dict()
+
+            for key in idx.keys():
+                for row in idx._key_rows(key):
+
+                    pop = pops.get(row)
+
+                    if pop is None:
+                        pop = pops[row] = population(store, row)
+
+                    entries[key].append((tag, -pop, row))
+
+        return {
+            key: tuple(row * num + tag for tag, _, row in sorted(rows))
+            for key, rows in entries.items()
+        }
+
+    def __len__(self):
+        return len(self._key_to_codes)
+
+    def __repr__(self):
+        return '%s<%d keys, %s>' % (
+            self.__class__.__name__,
+            len(self._key_to_codes),
+            ' + '.join(self.names),
+        )
+
+    def _match(self, code):
+        row, tag = divmod(code, len(self._targets))
+        match_cls, store = self._targets[tag]
+        return match_cls(store, row)
+
+    def best(self, text):
+        """The top-ranked match for a string.
+
+        Returns: usa.Match, or None
+        """
+        codes = self._key_to_codes.get(keyify(text))
+
+        if codes is None:
+            return None
+
+        return self._match(codes[0])
+
+    def lookup(self, text):
+        """All matches for a string, ranked.
+
+        Returns: list of usa.Match, or None
+        """
+        codes = self._key_to_codes.get(keyify(text))
+
+        if codes is None:
+            return None
+
+        return [self._match(code) for code in codes]
+
+    __getitem__ = lookup
+
+    def keys(self):
+        return iter(self._key_to_codes)
+
+    def save(self, path):
+        """Pickle the merged table and entity stores. Build from indexes
+        loaded with `load`, not `load_mmap` - mapped files can't be pickled.
+        """
+        with open(path, 'wb') as fh:
+            pickle.dump(self, fh)
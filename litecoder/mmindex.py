@@ -0,0 +1,232 @@
+
+
+import sys
+import mmap
+import json
+import struct
+
+from array import array
+
+from .store import EntityStore
+
+
+MAGIC = b'LCINDEX1'
+
+VERSION = 2
+
+
+def encode_strings(strings):
+    """Encode strings as (offsets, blob).
+    """
+    offsets = array('q', [0])
+    blob = bytearray()
+
+    for value in strings:
+        blob += value.encode('utf8')
+        offsets.append(len(blob))
+
+    return offsets, bytes(blob)
+
+
+def write_index(path, key_to_rows, entities, meta=None, blobs=None):
+    """Write a memory-mappable index file.
+
+    Keys are stored as a sorted string table, with a parallel flat array of
+    entity row numbers. Entity metadata is written straight from the columns
+    of the `EntityStore`.
+
+    Args:
+        path (str)
+        key_to_rows (dict): key -> iter of entity rows
+        entities (store.EntityStore)
+        meta (dict): Extra header fields.
+        blobs (dict): Extra name -> bytes sections.
+    """
+    # Sort by UTF-8 bytes, to match byte-wise comparisons at lookup time.
+    keys = sorted((k.encode('utf8'), k) for k in key_to_rows)
+
+    key_offsets, key_blob = encode_strings([k for _, k in keys])
+
+    id_offsets = array('q', [0])
+    ids = array('q')
+
+    for _, key in keys:
+        ids.extend(sorted(key_to_rows[key]))
+        id_offsets.append(len(ids))
+
+    str_offsets, str_blob = encode_strings(entities.strings)
+
+    sections = [
+        ('keys.offsets', key_offsets),
+        ('keys.blob', key_blob),
+        ('ids.offsets', id_offsets),
+        ('ids', ids),
+        ('strings.offsets', str_offsets),
+        ('strings.blob', str_blob),
+        *entities.sections(),
+        *(('blob.'+name, data) for name, data in (blobs or {}).items()),
+    ]
+
+    header = dict(
+        version=VERSION,
+        byteorder=sys.byteorder,
+        num_keys=len(keys),
+        num_entities=len(entities),
+        columns=entities.schema(),
+        overflow=entities.overflow(),
+        meta=meta or {},
+    )
+
+    # Lay out 8-byte-aligned sections after the header.
+    def layout(start):
+        offset, table = start, {}
+        for name, data in sections:
+            typecode = data.typecode if isinstance(data, array) else 'B'
+            nbytes = len(memoryview(data).cast('B'))
+            table[name] = (offset, nbytes, typecode)
+            offset += nbytes + (-nbytes % 8)
+        return table
+
+    # Header size depends on offsets, so grow until stable.
+    start = 0
+    while True:
+        header['sections'] = layout(start)
+        header_bytes = json.dumps(header).encode('utf8')
+        size = len(MAGIC) + 8 + len(header_bytes)
+        size += -size % 8
+        if size == start:
+            break
+        start = size
+
+    with open(path, 'wb') as fh:
+
+        fh.write(MAGIC)
+        fh.write(struct.pack('<Q', len(header_bytes)))
+        fh.write(header_bytes)
+        fh.write(b'\0' * (start - fh.tell()))
+
+        for name, data in sections:
+            nbytes = header['sections'][name][1]
+            fh.write(memoryview(data).cast('B'))
+            fh.write(b'\0' * (-nbytes % 8))
+
+
+class MMapStrings:
+
+    def __init__(self, mm, offsets, base):
+        """Lazily-decoded string table.
+        """
+        self._mm = mm
+        self._offsets = offsets
+        self._base = base
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, ref):
+        start = self._base + self._offsets[ref]
+        end = self._base + self._offsets[ref+1]
+        return self._mm[start:end].decode('utf8')
+
+
+class IndexFile:
+
+    def __init__(self, path):
+        """Memory-map an index file. Pages are shared between processes that
+        open the same file.
+
+        Args:
+            path (str)
+        """
+        self.path = path
+
+        with open(path, 'rb') as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError('Not a litecoder index: %s' % path)
+
+        start = len(MAGIC)
+        header_len, = struct.unpack('<Q', self._mm[start:start+8])
+
+        header = json.loads(self._mm[start+8:start+8+header_len])
+
+        if header['version'] != VERSION:
+            raise ValueError('Index format is v%d' % header['version'])
+
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError('Index byte order is %s' % header['byteorder'])
+
+        self.num_keys = header['num_keys']
+        self.num_entities = header['num_entities']
+        self.meta = header['meta']
+
+        self._buf = memoryview(self._mm)
+        self._sections = header['sections']
+
+        self._key_offsets = self._section('keys.offsets')
+        self._key_base = self._sections['keys.blob'][0]
+        self._id_offsets = self._section('ids.offsets')
+        self._ids = self._section('ids')
+
+        strings = MMapStrings(
+            self._mm,
+            self._section('strings.offsets'),
+            self._sections['strings.blob'][0],
+        )
+
+        self.entities = EntityStore.from_buffers(
+            header['columns'], self._section, strings, header['overflow'],
+        )
+
+    def _section(self, name):
+        offset, nbytes, typecode = self._sections[name]
+        return self._buf[offset:offset+nbytes].cast(typecode)
+
+    def blob(self, name):
+        """Get an extra bytes section, or None if it's missing / empty.
+        """
+        name = 'blob.'+name
+
+        if self._sections.get(name, (0, 0))[1]:
+            return bytes(self._section(name))
+
+    def encode(self, text):
+        return text.encode('utf8')
+
+    def key(self, pos):
+        """Get the key at a position in the sorted key table, as bytes.
+        """
+        offsets, base = self._key_offsets, self._key_base
+        return self._mm[base+offsets[pos]:base+offsets[pos+1]]
+
+    def bisect(self, target, lo=0, hi=None):
+        """Leftmost position where `target` (bytes) could be inserted.
+        """
+        hi = self.num_keys if hi is None else hi
+        key = self.key
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
+    def find(self, key):
+        """Get the position of a key, or -1 if missing.
+        """
+        target = key.encode('utf8')
+        pos = self.bisect(target)
+
+        if pos < self.num_keys and self.key(pos) == target:
+            return pos
+
+        return -1
+
+    def ids(self, pos):
+        """Entity row numbers for the key at a position.
+        """
+        return self._ids[self._id_offsets[pos]:self._id_offsets[pos+1]].tolist()
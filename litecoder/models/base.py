@@ -6,6 +6,10 @@ from sqlalchemy.inspection import inspect
 from ..db import session
 
 
+# Python type -> `store.EntityStore` column kind.
+STORE_KINDS = {bool: 'b', int: 'q', float: 'd'}
+
+
 class BaseModel:
 
     @classmethod
@@ -14,6 +18,34 @@ class BaseModel:
         """
         return cls.__table__.columns.keys()
 
+    @classmethod
+    def column_defaults(cls):
+        """Get (name, default) pairs, for inserts that skip the ORM.
+        """
+        return [
+            (col.name, col.default.arg if col.default is not None else None)
+            for col in cls.__table__.columns
+        ]
+
+    @classmethod
+    def store_columns(cls):
+        """Get (name, kind, child columns) triples for `store.EntityStore`,
+        including parent entities.
+        """
+        md = inspect(cls)
+
+        columns = []
+
+        for attr in md.column_attrs:
+            python_type = attr.columns[0].type.python_type
+            kind = STORE_KINDS.get(python_type, 's')
+            columns.append((attr.key, kind, None))
+
+        for key, rel in md.relationships.items():
+            columns.append((key, 'g', rel.mapper.class_.store_columns()))
+
+        return columns
+
     def __iter__(self):
         """Generate column / value tuples.
 
@@ -2,27 +2,37 @@
 
 import yaml
 import pkgutil
-import us
+import time
 
 import numpy as np
 
 from tqdm import tqdm
+from boltons.iterutils import chunked_iter
 from collections import defaultdict
-from scipy.spatial import cKDTree
+from functools import lru_cache
+
+from sqlalchemy import (
+    Column, Integer, String, Float, Boolean, Table, MetaData, select, union,
+    exists, case, func,
+)
 
-from sqlalchemy import Column, Integer, String, Float, Boolean
 from sqlalchemy.orm import relationship
 
 from ..db import session
-from ..utils import safe_property
+from ..utils import safe_property, state_abbr
 from .. import logger
+from ..dedupe import proximity_dupes
 from .base import BaseModel
+from .wof_county import WOFCounty
+from .wof_region import WOFRegion
 
 
 # TODO: Make pluggable.
-CITY_ALT_NAMES = yaml.load(pkgutil.get_data(
-    'litecoder', 'data/city-alt-names.yml'
-))
+@lru_cache()
+def city_alt_names():
+    """Load Wikidata id -> alt names, on first use.
+    """
+    return yaml.load(pkgutil.get_data('litecoder', 'data/city-alt-names.yml'))
 
 
 ID_COLS = (
@@ -79,9 +89,9 @@ class WOFLocality(BaseModel):
 
     wk_page = Column(String)
 
-    name = Column(String)
+    name = Column(String, index=True)
 
-    country_iso = Column(String)
+    country_iso = Column(String, index=True)
 
     name_a0 = Column(String)
 
@@ -121,8 +131,11 @@ class WOFLocality(BaseModel):
         Args:
             wof_ids (iter)
         """
-        dupes = cls.query.filter(cls.wof_id.in_(wof_ids))
-        dupes.update({cls.duplicate: True}, synchronize_session=False)
+        # Under SQLite's bound-parameter limit.
+        for ids in chunked_iter(wof_ids, 10000):
+            dupes = cls.query.filter(cls.wof_id.in_(ids))
+            dupes.update({cls.duplicate: True}, synchronize_session=False)
+
         session.commit()
 
     @classmethod
@@ -153,37 +166,153 @@ class WOFLocality(BaseModel):
         cls.set_dupes(dupes)
 
     @classmethod
-    def dedupe_proximity(cls, buffer=0.1):
-        """Find duplicates within N degrees.
+    def score_table(cls):
+        """Fill a temp table with `field_count` for every row, in SQL.
+
+        Returns: sqlalchemy.Table, (wof_id, score)
         """
-        # Pre-load rows.
-        rows = cls.query.all()
-        id_row = {i: row for i, row in enumerate(rows)}
+        table = Table(
+            'wof_locality_score', MetaData(),
+            Column('wof_id', Integer, primary_key=True),
+            Column('score', Integer),
+            prefixes=['TEMPORARY'],
+        )
+
+        # Non-null columns + related county / region, like `dict(self)`.
+        score = sum([
+            *(case([(col != None, 1)], else_=0) for col in cls.__table__.c),
+            exists().where(WOFCounty.wof_id == cls.wof_county_id),
+            exists().where(WOFRegion.wof_id == cls.wof_region_id),
+        ])
+
+        table.drop(session.connection(), checkfirst=True)
+        table.create(session.connection())
+
+        session.execute(table.insert().from_select(
+            ['wof_id', 'score'],
+            select([cls.wof_id, score]),
+        ))
+
+        return table
+
+    @classmethod
+    def dedupe_id_cols(cls, names=ID_COLS):
+        """Dedupe via all identifier columns at once, in SQL. Same result
+        as `dedupe_id_col` for each column - in every group of rows that
+        share an id, all but the most complete row are dupes. Ties go to
+        the lowest WOF id.
+
+        Args:
+            names (iter): Id columns.
+
+        Returns: int, number of dupes.
+        """
+        start = time.perf_counter()
+
+        scores = cls.score_table()
+
+        passes = []
+        for name in names:
+
+            col = getattr(cls, name)
+
+            rank = func.row_number().over(
+                partition_by=col,
+                order_by=(scores.c.score.desc(), cls.wof_id),
+            )
+
+            ranked = (
+                select([cls.wof_id, rank.label('rank')])
+                .select_from(cls.__table__.join(
+                    scores, scores.c.wof_id == cls.wof_id,
+                ))
+                .where(col != None)
+                .alias()
+            )
+
+            passes.append(
+                select([ranked.c.wof_id]).where(ranked.c.rank > 1)
+            )
 
-        # Build index.
-        data = [[r.longitude, r.latitude] for r in rows]
-        idx = cKDTree(data)
+        dupes = cls.query.filter(cls.wof_id.in_(union(*passes)))
+
+        count = dupes.update(
+            {cls.duplicate: True},
+            synchronize_session=False,
+        )
+
+        scores.drop(session.connection())
+        session.commit()
+
+        logger.info('Marked %d dupes via %d id columns in %.2fs' % (
+            count, len(passes), time.perf_counter() - start,
+        ))
+
+        return count
+
+    @classmethod
+    def dedupe_proximity(cls, buffer=0.1, workers=1):
+        """Find same-name duplicates within N degrees. Rows come out of SQL
+        as arrays - see `dedupe.proximity_dupes`.
+
+        Args:
+            buffer (float): Max distance, in degrees.
+            workers (int): Processes to spread name groups across.
+
+        Returns: int, number of dupes.
+        """
+        start = time.perf_counter()
+
+        scores = cls.score_table()
+
+        query = (
+            select([
+                cls.wof_id, cls.longitude, cls.latitude, cls.name,
+                scores.c.score,
+            ])
+            .select_from(cls.__table__.join(
+                scores, scores.c.wof_id == cls.wof_id,
+            ))
+            .where(cls.longitude != None)
+            .where(cls.latitude != None)
+            .order_by(cls.wof_id)
+        )
+
+        rows = session.execute(query).fetchall()
+
+        scores.drop(session.connection())
+
+        if not rows:
+            return 0
+
+        wof_ids, lons, lats, names, counts = zip(*rows)
 
         logger.info('Deduping rows within %.2f°' % buffer)
 
-        dupes = set()
-        for id1, id2 in tqdm(idx.query_pairs(buffer)):
+        dupes = proximity_dupes(
+            np.array(lons, dtype=np.float64),
+            np.array(lats, dtype=np.float64),
+            names,
+            np.array(counts),
+            buffer,
+            workers,
+        )
 
-            row1, row2 = id_row[id1], id_row[id2]
+        dupe_ids = np.array(wof_ids)[dupes].tolist()
 
-            if row1.name == row2.name:
+        cls.set_dupes(dupe_ids)
 
-                dupes.add(row1.wof_id if row1.field_count < row2.field_count
-                    else row2.wof_id)
+        logger.info('Marked %d dupes by proximity in %.2fs' % (
+            len(dupe_ids), time.perf_counter() - start,
+        ))
 
-        cls.set_dupes(dupes)
+        return len(dupe_ids)
 
     @classmethod
     def dedupe(cls, *args, **kwargs):
         """Dedupe by shared ids + proximity.
         """
-        for name in ID_COLS:
-            cls.dedupe_id_col(name)
+        cls.dedupe_id_cols()
 
         cls.dedupe_proximity(*args, **kwargs)
 
@@ -226,7 +355,7 @@ class WOFLocality(BaseModel):
     def alt_names(self):
         """Map alt names via Wikidata id.
         """
-        return CITY_ALT_NAMES.get(self.wd_id, [])
+        return city_alt_names().get(self.wd_id, [])
 
     @property
     def names(self):
@@ -239,4 +368,4 @@ class WOFLocality(BaseModel):
     def us_state_abbr(self):
         """A1 name -> US state abbreviation.
         """
-        return us.states.lookup(self.name_a1).abbr
+        return state_abbr(self.name_a1)
@@ -33,7 +33,7 @@ class WOFRegion(BaseModel):
 
     name_abbr = Column(String)
 
-    country_iso = Column(String)
+    country_iso = Column(String, index=True)
 
     name_a0 = Column(String)
 
@@ -0,0 +1,203 @@
+
+
+import time
+import hashlib
+
+from collections import defaultdict
+from contextlib import contextmanager
+from multiprocessing import Pool
+from boltons.iterutils import chunked_iter
+
+from . import logger
+from .db import session
+from .models import WOFLocality, WOFRegion, WOFCounty, wof_locality
+from .usa import keyify, city_keys
+from .utils import state_abbr
+from .build_state import NamePopulations
+
+
+class Timings(dict):
+
+    @contextmanager
+    def stage(self, name):
+        """Time a build stage.
+        """
+        start = time.perf_counter()
+
+        yield
+
+        self[name] = time.perf_counter() - start
+        logger.info('%s: %.2fs' % (name, self[name]))
+
+    def __repr__(self):
+        return ', '.join('%s=%.2fs' % item for item in self.items())
+
+
+def table_rows(model):
+    """Select a whole table as dicts, in one query - no ORM objects.
+    """
+    table = model.__table__
+    names = table.columns.keys()
+
+    # Like an ORM query, see pending changes.
+    session.flush()
+
+    return [dict(zip(names, row)) for row in session.execute(table.select())]
+
+
+def fingerprint(data, names):
+    """Hash everything that a city's keys + metadata are built from, except
+    the populations of other cities with the same names.
+
+    Args:
+        data (dict): Entity metadata.
+        names (iter): Name + alt names.
+
+    Returns: bytes
+    """
+    data = repr((sorted(data.items()), sorted(names)))
+    return hashlib.blake2b(data.encode('utf8'), digest_size=8).digest()
+
+
+class CityTable:
+
+    def __init__(self, min_p1_gap=200000, blocklist=None, name_pops=None):
+        """Everything needed to key US cities, pulled out of SQLite up front.
+        Per-name populations are sorted once, here, rather than once per
+        name per city.
+
+        Args:
+            min_p1_gap (int): See `NamePopulations.allow_bare`.
+            blocklist (iter): Names that never get bare keys.
+            name_pops (NamePopulations): Use a saved table, instead of
+                building one from the locality table.
+        """
+        self.min_p1_gap = min_p1_gap
+        self.blocklist = set(map(keyify, blocklist or []))
+
+        regions = {r['wof_id']: r for r in table_rows(WOFRegion)}
+        counties = {r['wof_id']: r for r in table_rows(WOFCounty)}
+
+        localities = table_rows(WOFLocality)
+
+        alt_names = wof_locality.city_alt_names()
+
+        if name_pops is None:
+            name_pops = NamePopulations.from_rows(localities, alt_names)
+
+        self.name_pops = name_pops
+
+        # (entity dict, names)
+        self.cities = []
+
+        for row in localities:
+
+            # Same filters as `WOFLocality.clean_us_cities`.
+            if (
+                row['duplicate'] == False and
+                row['country_iso'] == 'US' and
+                row['name'] is not None and
+                row['name_a1'] is not None
+            ):
+
+                names = set((row['name'], *alt_names.get(row['wd_id'], [])))
+
+                data = dict(
+                    row,
+                    county=counties.get(row['wof_county_id']),
+                    region=regions.get(row['wof_region_id']),
+                )
+
+                self.cities.append((data, names))
+
+    @property
+    def median_pop(self):
+        return self.name_pops.median
+
+    def __len__(self):
+        return len(self.cities)
+
+    def allow_bare(self, data, name):
+        """See `NamePopulations.allow_bare`.
+        """
+        return self.name_pops.allow_bare(
+            name, data['population'], self.min_p1_gap, self.blocklist,
+        )
+
+    def key_inputs(self, cities=None):
+        """Resolve bare names + state names, so that keys can be generated
+        without the population table.
+
+        Returns: list of (wof_id, names, bare names, state names)
+        """
+        inputs = []
+
+        for data, names in (self.cities if cities is None else cities):
+
+            bare_names = [n for n in names if self.allow_bare(data, n)]
+
+            state_names = [
+                n for n in (data['name_a1'], state_abbr(data['name_a1']))
+                if n
+            ]
+
+            inputs.append((data['wof_id'], names, bare_names, state_names))
+
+        return inputs
+
+    def fingerprints(self):
+        """Returns: dict of wof id -> `fingerprint`
+        """
+        return {
+            data['wof_id']: fingerprint(data, names)
+            for data, names in self.cities
+        }
+
+
+def key_chunk(inputs):
+    """Generate keys for a chunk of cities.
+
+    Returns: dict of key -> [wof ids]
+    """
+    key_ids = defaultdict(list)
+
+    for wof_id, names, bare_names, state_names in inputs:
+        for key in map(keyify, city_keys(names, bare_names, state_names)):
+            key_ids[key].append(wof_id)
+
+    return key_ids
+
+
+def generate_keys(inputs, workers=1, chunk_size=2000):
+    """Generate city keys, optionally across a process pool, and merge the
+    partial maps.
+
+    Args:
+        inputs (list): From `CityTable.key_inputs`.
+        workers (int)
+        chunk_size (int): Cities per task.
+
+    Returns: dict of key -> set of wof ids
+    """
+    chunks = chunked_iter(inputs, chunk_size)
+
+    if workers > 1:
+        pool = Pool(workers)
+        parts = pool.imap_unordered(key_chunk, chunks)
+    else:
+        pool = None
+        parts = map(key_chunk, chunks)
+
+    key_ids = defaultdict(set)
+
+    try:
+        for part in parts:
+            for key, ids in part.items():
+                key_ids[key].update(ids)
+
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    return key_ids
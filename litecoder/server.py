@@ -0,0 +1,496 @@
+
+
+import asyncio
+import json
+
+from urllib.parse import urlsplit, parse_qs
+
+from . import logger
+
+
+# Max request body, in bytes.
+MAX_BODY = 10 * 1024 * 1024
+
+# Max header lines per request.
+MAX_HEADERS = 100
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+RESULT = '{"query":%s,"cities":[%s],"states":[%s]}'
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message=None):
+        """An error response.
+
+        Args:
+            status (int)
+            message (str)
+        """
+        super().__init__(message or REASONS[status])
+        self.status = status
+
+
+class LookupPass:
+
+    def __init__(self, city_idx, state_idx):
+        """Look up a batch of strings against the city and state indexes,
+        and render each result as JSON.
+
+        Args:
+            city_idx (usa.Index)
+            state_idx (usa.Index)
+        """
+        self.city_idx = city_idx
+        self.state_idx = state_idx
+        self._entity_json = {}
+
+    def match_json(self, match):
+        """Encoded `data` for a match. Each entity is only encoded once, so
+        the cache is bounded by the size of the indexes.
+        """
+        key = (match.__class__, match._row)
+
+        text = self._entity_json.get(key)
+
+        if text is None:
+            text = json.dumps(match.data.to_dict())
+            self._entity_json[key] = text
+
+        return text
+
+    def matches_json(self, matches):
+        return ','.join(map(self.match_json, matches or ()))
+
+    def __call__(self, texts):
+        """Resolve a batch of strings.
+
+        Args:
+            texts (list of str)
+
+        Returns: list of JSON objects, as strings, aligned with `texts`.
+        """
+        cities = self.city_idx.lookup_many(texts)
+        states = self.state_idx.lookup_many(texts)
+
+        batch = dict()
+        results = []
+
+        for text, city_matches, state_matches in zip(texts, cities, states):
+
+            res = batch.get(text)
+
+            if res is None:
+                res = batch[text] = RESULT % (
+                    json.dumps(text),
+                    self.matches_json(city_matches),
+                    self.matches_json(state_matches),
+                )
+
+            results.append(res)
+
+        return results
+
+
+class MicroBatcher:
+
+    def __init__(self, func, window=0, max_batch=1000):
+        """Group concurrent lookups into one call to `func`.
+
+        The first request in a batch starts a timer; everything that arrives
+        before it fires (or before `max_batch` strings are queued) is answered
+        by one shared pass. With `window=0`, requests that arrive in the same
+        turn of the event loop are still grouped. The pass runs on the event
+        loop, so `max_batch` also bounds how long it blocks - bigger requests
+        are split into chunks, and the loop gets a turn between passes.
+
+        Args:
+            func (callable): list of str -> list of results.
+            window (float): Max seconds to wait for a batch to fill.
+            max_batch (int): Max strings per pass.
+        """
+        self.func = func
+        self.window = window
+        self.max_batch = max_batch
+
+        self._pending = []
+        self._size = 0
+        self._timer = None
+
+        self.batches = 0
+        self.queries = 0
+
+    async def submit(self, texts):
+        """Queue strings for the next batch.
+
+        Args:
+            texts (list of str)
+
+        Returns: list of results, aligned with `texts`.
+        """
+        loop = asyncio.get_event_loop()
+
+        futures = []
+
+        for i in range(0, len(texts), self.max_batch):
+
+            chunk = texts[i:i+self.max_batch]
+            future = loop.create_future()
+
+            self._pending.append((chunk, future))
+            self._size += len(chunk)
+
+            futures.append(future)
+
+        self.schedule(loop)
+
+        results = []
+        for future in futures:
+            results += await future
+
+        return results
+
+    def schedule(self, loop):
+        """Flush on the next turn of the loop once a batch is full, or when
+        the window closes.
+        """
+        full = self._size >= self.max_batch
+
+        if self._timer is not None:
+
+            if not full:
+                return
+
+            self._timer.cancel()
+
+        self._timer = (
+            loop.call_later(self.window, self.flush)
+            if self.window and not full
+            else loop.call_soon(self.flush)
+        )
+
+    def flush(self):
+        """Run one pass over up to `max_batch` queued strings.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._pending:
+            return
+
+        pending, size = [], 0
+
+        for batch, future in self._pending:
+            if pending and size + len(batch) > self.max_batch:
+                break
+            pending.append((batch, future))
+            size += len(batch)
+
+        self._pending = self._pending[len(pending):]
+        self._size -= size
+
+        if self._pending:
+            self.schedule(asyncio.get_event_loop())
+
+        texts = [text for batch, _ in pending for text in batch]
+
+        try:
+            results = self.func(texts)
+
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.queries += len(texts)
+
+        i = 0
+        for batch, future in pending:
+
+            # The client might have gone away.
+            if not future.done():
+                future.set_result(results[i:i+len(batch)])
+
+            i += len(batch)
+
+
+async def read_line(reader):
+    """Read a line of the request head.
+    """
+    try:
+        return await reader.readline()
+
+    # Longer than the stream's limit (64 KiB).
+    except ValueError:
+        raise HTTPError(400, 'Line too long.')
+
+
+async def read_request(reader):
+    """Parse one HTTP/1.x request.
+
+    Returns: (method, target, version, headers, body), or None when the
+    client closes the connection between requests.
+    """
+    line = await read_line(reader)
+
+    if not line:
+        return None
+
+    try:
+        method, target, version = line.decode('latin-1').split()
+    except ValueError:
+        raise HTTPError(400, 'Bad request line.')
+
+    headers = dict()
+
+    for _ in range(MAX_HEADERS):
+
+        line = await read_line(reader)
+
+        if line in (b'\r\n', b'\n'):
+            break
+
+        if not line:
+            raise asyncio.IncompleteReadError(line, None)
+
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    else:
+        raise HTTPError(400, 'Too many headers.')
+
+    if 'transfer-encoding' in headers:
+        raise HTTPError(411)
+
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HTTPError(400, 'Bad Content-Length.')
+
+    if length > MAX_BODY:
+        raise HTTPError(413)
+
+    body = await reader.readexactly(length) if length else b''
+
+    return method, target, version, headers, body
+
+
+def keep_alive(version, headers):
+    """HTTP/1.1 connections persist unless closed; 1.0 ones don't, unless
+    asked to.
+    """
+    conn = headers.get('connection', '').lower()
+
+    if version == 'HTTP/1.0':
+        return conn == 'keep-alive'
+
+    return conn != 'close'
+
+
+def render_response(status, body, close=False):
+    """Encode a JSON response.
+
+    Args:
+        status (int)
+        body (str): JSON.
+        close (bool): Tell the client the connection is closing.
+
+    Returns: bytes
+    """
+    body = body.encode('utf8')
+
+    head = [
+        'HTTP/1.1 %d %s' % (status, REASONS[status]),
+        'Content-Type: application/json',
+        'Content-Length: %d' % len(body),
+    ]
+
+    if close:
+        head.append('Connection: close')
+
+    return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+
+def error_json(message):
+    return json.dumps(dict(error=message))
+
+
+class GeocodeServer:
+
+    def __init__(self, city_idx, state_idx, window=0, max_batch=1000):
+        """JSON geocoding over HTTP, with the indexes loaded once.
+
+        - `GET /geocode?q=...` - One string.
+        - `POST /geocode` - A JSON array of strings.
+        - `GET /health` - Batch counts.
+
+        Each string gets `{"query", "cities", "states"}`, where the matches
+        are the full `Match.data` dicts. Concurrent requests are answered by
+        shared lookup passes; see `MicroBatcher`.
+
+        Args:
+            city_idx (usa.Index)
+            state_idx (usa.Index)
+            window (float): Batch window, in seconds.
+            max_batch (int): Max strings per pass.
+        """
+        self.batcher = MicroBatcher(
+            LookupPass(city_idx, state_idx), window, max_batch,
+        )
+
+        self.routes = {
+            '/geocode': dict(GET=self.geocode, POST=self.geocode_batch),
+            '/health': dict(GET=self.health),
+        }
+
+    async def geocode(self, query, body):
+
+        texts = query.get('q')
+
+        if not texts:
+            raise HTTPError(400, 'Missing `q`.')
+
+        res, = await self.batcher.submit(texts[:1])
+
+        return res
+
+    async def geocode_batch(self, query, body):
+
+        try:
+            texts = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, 'Body is not JSON.')
+
+        if (
+            not isinstance(texts, list) or
+            not all(isinstance(t, str) for t in texts)
+        ):
+            raise HTTPError(400, 'Body should be an array of strings.')
+
+        if not texts:
+            return '[]'
+
+        return '[%s]' % ','.join(await self.batcher.submit(texts))
+
+    async def health(self, query, body):
+        return json.dumps(dict(
+            status='ok',
+            batches=self.batcher.batches,
+            queries=self.batcher.queries,
+        ))
+
+    async def dispatch(self, method, target, body):
+        """Route a request.
+
+        Returns: (status, JSON body)
+        """
+        url = urlsplit(target)
+
+        handlers = self.routes.get(url.path)
+
+        if handlers is None:
+            raise HTTPError(404)
+
+        handler = handlers.get(method)
+
+        if handler is None:
+            raise HTTPError(405)
+
+        return 200, await handler(parse_qs(url.query), body)
+
+    async def handle(self, reader, writer):
+        """Serve requests on one connection, until it closes.
+        """
+        try:
+            while True:
+
+                try:
+                    req = await read_request(reader)
+                except HTTPError as e:
+                    writer.write(render_response(
+                        e.status, error_json(str(e)), close=True,
+                    ))
+                    break
+
+                if req is None:
+                    break
+
+                method, target, version, headers, body = req
+
+                close = not keep_alive(version, headers)
+
+                try:
+                    status, res = await self.dispatch(method, target, body)
+
+                except HTTPError as e:
+                    status, res = e.status, error_json(str(e))
+
+                except Exception as e:
+                    logger.exception('Error serving %s %s.', method, target)
+                    status, res = 500, error_json(str(e))
+
+                writer.write(render_response(status, res, close))
+                await writer.drain()
+
+                if close:
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """Start listening.
+
+        Returns: asyncio.Server
+        """
+        server = await asyncio.start_server(self.handle, host, port)
+
+        for sock in server.sockets:
+            logger.info('Listening on %s:%d.' % sock.getsockname()[:2])
+
+        return server
+
+    async def serve_forever(self, host='127.0.0.1', port=8080):
+        """Serve until cancelled.
+        """
+        server = await self.start(host, port)
+
+        try:
+            await asyncio.get_event_loop().create_future()
+
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    def run(self, host='127.0.0.1', port=8080):
+        """Block, serving requests.
+        """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        server = loop.run_until_complete(self.start(host, port))
+
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
@@ -0,0 +1,187 @@
+
+
+import os
+import sqlite3
+import tarfile
+
+from contextlib import closing
+from glob import iglob
+from urllib.parse import quote
+from boltons.iterutils import chunked_iter
+
+from ..utils import read_json, loads_json
+from .geojson import read_feature, loads_feature
+
+
+TAR_EXTS = ('.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar')
+
+SQLITE_EXTS = ('.db', '.sqlite')
+
+
+class DirSource:
+
+    def __init__(self, root):
+        """Loose `.geojson` files under a directory.
+        """
+        self.root = root
+
+    def paths_iter(self):
+        """Glob paths.
+        """
+        pattern = os.path.join(self.root, '**/*.geojson')
+        return iglob(pattern, recursive=True)
+
+    def batches_iter(self, batch_size):
+        """Yields: list of paths
+        """
+        return chunked_iter(self.paths_iter(), batch_size)
+
+    def docs_iter(self, batch, skip_geometry=True):
+        """Parse a batch of paths.
+
+        Yields: dict
+        """
+        read = read_feature if skip_geometry else read_json
+
+        for path in batch:
+            yield read(path)
+
+
+class TarSource:
+
+    def __init__(self, path):
+        """`.geojson` members of a (compressed) tar bundle, streamed without
+        extracting to disk.
+        """
+        self.path = path
+
+    def texts_iter(self):
+        """Decompress + walk the bundle once, in order.
+
+        Yields: str, GeoJSON text
+        """
+        with tarfile.open(self.path, 'r|*') as tar:
+            for member in tar:
+                if member.isfile() and member.name.endswith('.geojson'):
+                    yield tar.extractfile(member).read().decode('utf8')
+
+    def batches_iter(self, batch_size):
+        """Yields: list of GeoJSON strings
+        """
+        return chunked_iter(self.texts_iter(), batch_size)
+
+    def docs_iter(self, batch, skip_geometry=True):
+        """Parse a batch of GeoJSON strings.
+
+        Yields: dict
+        """
+        loads = loads_feature if skip_geometry else loads_json
+
+        for text in batch:
+            yield loads(text)
+
+
+class SQLiteSource:
+
+    def __init__(self, path, placetype=None):
+        """A WOF SQLite distribution - GeoJSON bodies in the `geojson` table.
+        When the `spr` table is there, only rows with the given placetype
+        are read. Alt geometries are skipped.
+
+        Args:
+            path (str)
+            placetype (str): WOF placetype - 'region', 'locality', etc.
+        """
+        self.path = path
+        self.placetype = placetype
+
+        with closing(self.connect()) as conn:
+
+            tables = {r[0] for r in conn.execute(
+                "select name from sqlite_master where type = 'table'"
+            )}
+
+            columns = {r[1] for r in conn.execute(
+                'pragma table_info(geojson)'
+            )}
+
+        where, self.params = [], []
+
+        if 'is_alt' in columns:
+            where.append('geojson.is_alt = 0')
+
+        if placetype and 'spr' in tables:
+            where.append(
+                'geojson.id in (select id from spr where placetype = ?)'
+            )
+            self.params.append(placetype)
+
+        self.where = ' and '.join(where) or '1'
+
+    def connect(self):
+        uri = 'file:%s?mode=ro' % quote(os.path.abspath(self.path))
+        return sqlite3.connect(uri, uri=True)
+
+    def batches_iter(self, batch_size):
+        """Read ids only - workers fetch bodies themselves, so the big
+        strings don't cross processes.
+
+        Yields: list of ids
+        """
+        with closing(self.connect()) as conn:
+
+            cursor = conn.execute(
+                'select id from geojson where %s order by id' % self.where,
+                self.params,
+            )
+
+            ids = (row[0] for row in cursor)
+
+            yield from chunked_iter(ids, batch_size)
+
+    def docs_iter(self, batch, skip_geometry=True):
+        """Fetch + parse a batch of bodies.
+
+        Yields: dict
+        """
+        loads = loads_feature if skip_geometry else loads_json
+
+        query = 'select body from geojson where id in (%s) and %s' % (
+            ','.join('?' * len(batch)), self.where,
+        )
+
+        with closing(self.connect()) as conn:
+            for body, in conn.execute(query, [*batch, *self.params]):
+                yield loads(body)
+
+
+def open_source(root, placetype=None):
+    """Pick a source from the type of the root path.
+
+    Args:
+        root (str): Directory, tar bundle, or SQLite distribution.
+        placetype (str): See `SQLiteSource`.
+    """
+    if os.path.isdir(root):
+        return DirSource(root)
+
+    if root.endswith(TAR_EXTS):
+        return TarSource(root)
+
+    if root.endswith(SQLITE_EXTS):
+        return SQLiteSource(root, placetype)
+
+    raise ValueError('Unknown WOF source: %s' % root)
+
+
+def find_source(base):
+    """Find data for a placetype - a directory at `base`, or a bundle /
+    SQLite file at `base` + extension.
+
+    Returns: str, path. Defaults to `base`.
+    """
+    for ext in ('', *TAR_EXTS, *SQLITE_EXTS):
+        if os.path.exists(base + ext):
+            return base + ext
+
+    return base
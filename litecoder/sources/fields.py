@@ -0,0 +1,131 @@
+
+
+class Path:
+
+    def __init__(self, *keys, then=None):
+        """A nested lookup into a parsed doc - `Path('properties', 'gn:id')`.
+        String keys index dicts, int keys index lists. Anything missing or
+        of the wrong type gives None.
+
+        Args:
+            keys (str|int)
+            then (func): Applied to a found value. Must not raise.
+        """
+        self.keys = keys
+        self.then = then
+
+    def compile(self):
+        """Build a getter, without try / except - most fields are missing on
+        most docs, so raising is the common case, not the exception.
+
+        Returns: func(dict) -> value
+        """
+        keys, then = self.keys, self.then
+
+        if then is None and all(type(k) is str for k in keys):
+
+            if len(keys) == 1:
+                k1, = keys
+                return lambda d: d.get(k1)
+
+            if len(keys) == 2:
+                k1, k2 = keys
+
+                def get(d):
+                    d = d.get(k1)
+                    return d.get(k2) if isinstance(d, dict) else None
+
+                return get
+
+            if len(keys) == 3:
+                k1, k2, k3 = keys
+
+                def get(d):
+                    d = d.get(k1)
+                    if not isinstance(d, dict):
+                        return None
+                    d = d.get(k2)
+                    return d.get(k3) if isinstance(d, dict) else None
+
+                return get
+
+        def get(d):
+
+            for k in keys:
+
+                if type(k) is str:
+                    if not isinstance(d, dict):
+                        return None
+                    d = d.get(k)
+
+                elif isinstance(d, (list, str)) and -len(d) <= k < len(d):
+                    d = d[k]
+
+                else:
+                    return None
+
+            if then is not None and d is not None:
+                d = then(d)
+
+            return d
+
+        return get
+
+
+class First:
+
+    def __init__(self, *fields):
+        """Fallback chain - the first field that isn't None.
+
+        Args:
+            fields (Path|func)
+        """
+        self.fields = fields
+
+    def compile(self):
+
+        getters = [compile_field(f) for f in self.fields]
+
+        def get(d):
+            for get_field in getters:
+                value = get_field(d)
+                if value is not None:
+                    return value
+
+        return get
+
+
+def compile_field(field):
+    """Returns: func(dict) -> value
+    """
+    return field if callable(field) else field.compile()
+
+
+class Extractor:
+
+    def __init__(self, fields, names=None):
+        """Compile a field spec once, to pull flat rows out of docs.
+
+        Args:
+            fields (dict): Name -> `Path`, `First`, or func(dict) -> value.
+            names (iter): Fields to include in rows. Defaults to all.
+        """
+        self.getters = {
+            name: compile_field(field)
+            for name, field in fields.items()
+        }
+
+        names = set(self.getters if names is None else names)
+
+        self._items = tuple(
+            (name, get) for name, get in self.getters.items()
+            if name in names
+        )
+
+    def __call__(self, doc):
+        """Args:
+            doc (dict): Parsed JSON.
+
+        Returns: dict, name -> value
+        """
+        return {name: get(doc) for name, get in self._items}
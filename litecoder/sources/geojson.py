@@ -0,0 +1,205 @@
+
+
+import io
+import json
+import re
+
+
+DECODER = json.JSONDecoder()
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Chars per step when skipping a container.
+BLOCK = 4096
+
+OPEN, CLOSE = '{[', '}]'
+
+# All that `WOFDoc` reads.
+FEATURE_MEMBERS = ('id', 'properties')
+
+
+class Truncated(Exception):
+    pass
+
+
+def skip_ws(text, pos):
+    return WHITESPACE.match(text, pos).end()
+
+
+def decode(text, pos):
+    """Decode one JSON value.
+
+    Returns: (value, end offset)
+    """
+    try:
+        return DECODER.raw_decode(text, pos)
+    except json.JSONDecodeError:
+        raise Truncated
+
+
+def skip_container(text, pos):
+    """Find the end of the object / array that starts at `pos`, without
+    decoding it. Blocks that can't close the container and don't touch a
+    string are skipped with `str.count`, so coordinate arrays go by at C
+    speed.
+
+    Returns: int, offset after the closing bracket.
+    """
+    depth = 0
+    in_string = escape = False
+
+    i = pos
+    while i < len(text):
+
+        block = text[i:i+BLOCK]
+
+        if not in_string and '"' not in block:
+
+            closes = block.count('}') + block.count(']')
+
+            # Depth can't reach 0 in this block.
+            if depth - closes > 0:
+                depth += block.count('{') + block.count('[') - closes
+                i += len(block)
+                continue
+
+        for j, c in enumerate(block):
+
+            if in_string:
+                if escape:
+                    escape = False
+                elif c == '\\':
+                    escape = True
+                elif c == '"':
+                    in_string = False
+
+            elif c == '"':
+                in_string = True
+
+            elif c in OPEN:
+                depth += 1
+
+            elif c in CLOSE:
+                depth -= 1
+                if depth == 0:
+                    return i + j + 1
+
+        i += len(block)
+
+    raise Truncated
+
+
+def parse_member(text, pos, names):
+    """Parse one `"key": value` pair and the `,` or `}` after it. Values for
+    keys not in `names` are skipped, not decoded.
+
+    Returns: (key, value, offset after the separator, True if last member)
+    """
+    key, pos = decode(text, skip_ws(text, pos))
+
+    pos = skip_ws(text, pos)
+
+    if text[pos:pos+1] != ':':
+        raise Truncated
+
+    pos = skip_ws(text, pos+1)
+
+    if key in names:
+        value, pos = decode(text, pos)
+
+    elif text[pos:pos+1] in ('{', '['):
+        value, pos = None, skip_container(text, pos)
+
+    else:
+        value, pos = None, decode(text, pos)[1]
+
+    pos = skip_ws(text, pos)
+
+    sep = text[pos:pos+1]
+
+    if sep not in (',', '}'):
+        raise Truncated
+
+    return key, value, pos+1, sep == '}'
+
+
+def parse_members(fh, names, chunk_size=1 << 16):
+    """Parse selected top-level members of a JSON object from a text file.
+    Reads in chunks and stops once every member has been found, so anything
+    after them - WOF puts `geometry` last - is never read. Members that come
+    first are skipped without being decoded.
+
+    Args:
+        fh (file)
+        names (iter): Member keys.
+        chunk_size (int): Chars per read.
+
+    Returns: dict, key -> value, for the keys that exist.
+    """
+    names = set(names)
+
+    members = {}
+
+    text = fh.read(chunk_size)
+
+    pos = skip_ws(text, 0)
+
+    if text[pos:pos+1] != '{':
+        raise ValueError('Not a JSON object: %s' % source_name(fh))
+
+    pos += 1
+
+    if text[skip_ws(text, pos):].startswith('}'):
+        return members
+
+    while names - members.keys():
+
+        try:
+            key, value, end, last = parse_member(text, pos, names)
+
+        # Read more and retry the member. Grow geometrically, so a big
+        # skipped member isn't re-scanned many times.
+        except Truncated:
+
+            more = fh.read(max(chunk_size, len(text)))
+
+            if not more:
+                raise ValueError('Invalid JSON: %s' % source_name(fh))
+
+            text += more
+            continue
+
+        if key in names:
+            members[key] = value
+
+        if last:
+            break
+
+        pos = end
+
+    return members
+
+
+def source_name(fh):
+    return getattr(fh, 'name', '<string>')
+
+
+def read_members(path, names, chunk_size=1 << 16):
+    """Parse selected members from a JSON file. See `parse_members`.
+    """
+    with open(path) as fh:
+        return parse_members(fh, names, chunk_size)
+
+
+def read_feature(path):
+    """Read `id` and `properties` from a GeoJSON feature, skipping geometry.
+
+    Returns: dict
+    """
+    return read_members(path, FEATURE_MEMBERS)
+
+
+def loads_feature(text):
+    """Like `read_feature`, from a string.
+    """
+    return parse_members(io.StringIO(text), FEATURE_MEMBERS)
@@ -0,0 +1,96 @@
+
+
+import traceback
+
+from multiprocessing import Process, Queue, cpu_count
+
+
+def read_batches(batches, tasks, results, num_procs):
+    """Reader process: generate batches (walk / decompress the source) and
+    queue them for the workers.
+    """
+    try:
+        for batch in batches():
+            tasks.put(batch)
+
+    except Exception:
+        results.put(('error', traceback.format_exc()))
+
+    finally:
+        for _ in range(num_procs):
+            tasks.put(None)
+
+
+def work_batches(work, tasks, results):
+    """Worker process: run `work` on batches until the reader is done.
+    """
+    for batch in iter(tasks.get, None):
+
+        try:
+            results.put(('result', work(batch)))
+
+        except Exception:
+            results.put(('error', traceback.format_exc()))
+            return
+
+    results.put(('done', None))
+
+
+def pipeline_iter(batches, work, num_procs=None, max_pending=None):
+    """Run a source -> workers -> parent pipeline. One process generates
+    batches, `num_procs` processes map `work` over them, and results come
+    back to the caller, which can do its own work - like writing to SQLite
+    - while the other stages keep going.
+
+    Args:
+        batches (func): Returns an iterator of batches. Called in the reader
+            process.
+        work (func): Batch -> result. Called in worker processes.
+        num_procs (int): Worker count. Defaults to the CPU count.
+        max_pending (int): Batches queued ahead of the workers. Defaults to
+            4 per worker.
+
+    Yields: `work` results, unordered.
+    """
+    num_procs = num_procs or cpu_count()
+
+    tasks = Queue(max_pending or num_procs * 4)
+    results = Queue()
+
+    procs = [Process(
+        target=read_batches,
+        args=(batches, tasks, results, num_procs),
+        daemon=True,
+    )]
+
+    for _ in range(num_procs):
+        procs.append(Process(
+            target=work_batches,
+            args=(work, tasks, results),
+            daemon=True,
+        ))
+
+    for proc in procs:
+        proc.start()
+
+    try:
+
+        done = 0
+        while done < num_procs:
+
+            kind, value = results.get()
+
+            if kind == 'result':
+                yield value
+
+            elif kind == 'done':
+                done += 1
+
+            else:
+                raise RuntimeError('Pipeline stage failed:\n%s' % value)
+
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+            proc.join()
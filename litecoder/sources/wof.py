@@ -7,383 +7,389 @@ import time
 import us
 
 from collections import UserDict
-from glob import iglob
+from functools import partial
 from boltons.iterutils import chunked_iter
-from multiprocessing import Pool
 from tqdm import tqdm
 from itertools import islice
 
 from .. import logger, DATA_DIR
-from ..utils import safe_property, first, read_json
-from ..db import session
+from ..utils import read_json
+from ..db import engine, session, bulk_insert
 from ..models import WOFLocality, WOFRegion, WOFCounty
+from .fields import Path, First, Extractor
+from .bundles import DirSource, open_source, find_source
+from .stream import pipeline_iter
 
 
 @attr.s
 class WOFRepo:
 
+    # Directory, tar bundle, or SQLite distribution. See `bundles`.
     root = attr.ib()
 
+    # Only parse `id` + `properties` when extracting rows.
+    skip_geometry = attr.ib(default=True)
+
+    placetype = None
+
+    def source(self):
+        """Returns: A `bundles` source - directory, tar bundle, or SQLite.
+        """
+        return open_source(self.root, self.placetype)
+
     def paths_iter(self):
-        """Glob paths.
+        """Glob paths, when the root is a directory.
         """
-        pattern = os.path.join(self.root, '**/*.geojson')
-        return iglob(pattern, recursive=True)
+        return DirSource(self.root).paths_iter()
 
-    def docs_iter(self, num_procs=None):
+    def docs_iter(self, num_procs=None, batch_size=200):
         """Generate parsed GeoJSON docs.
         """
-        with Pool(num_procs) as p:
-            yield from p.imap_unordered(read_json, self.paths_iter())
+        source = self.source()
+
+        for docs in pipeline_iter(
+            partial(source.batches_iter, batch_size),
+            partial(load_docs, source),
+            num_procs,
+        ):
+            yield from docs
+
+    def db_values_iter(self, num_procs=None, batch_size=200, countries=None):
+        """Parse docs and extract rows in worker processes, so that only
+        column values come back to the parent - not full GeoJSON. Walking /
+        decompressing the source runs in its own process, so reading,
+        parsing and the caller's writes overlap.
+
+        Args:
+            num_procs (int): Worker count. Defaults to the CPU count.
+            batch_size (int): Docs per task.
+            countries (iter): Only keep docs with these ISO country codes.
+
+        Yields: tuple, aligned with `model.column_names()`.
+        """
+        countries = set(countries) if countries else None
+
+        source = self.source()
+
+        work = partial(
+            extract_values,
+            self.doc_cls,
+            source,
+            self.skip_geometry,
+            countries,
+        )
+
+        for rows in pipeline_iter(
+            partial(source.batches_iter, batch_size),
+            work,
+            num_procs,
+        ):
+            yield from rows
+
+    def db_rows_iter(self, **kwargs):
+        """Generate model instances. See `db_values_iter`.
+        """
+        model = self.doc_cls.model
+        names = model.column_names()
 
-    def db_rows_iter(self):
-        raise NotImplementedError
+        for values in self.db_values_iter(**kwargs):
+            yield model(**dict(zip(names, values)))
 
-    def load_db(self, n=1000):
+    def load_db(self, n=1000, **kwargs):
         """Load database rows.
         """
-        rows = tqdm(self.db_rows_iter())
+        rows = tqdm(self.db_rows_iter(**kwargs))
 
         for rows in chunked_iter(iter(rows), n):
             session.bulk_save_objects(rows)
             session.commit()
 
+    def bulk_load(self, n=100000, **kwargs):
+        """Load rows as plain tuples, skipping the ORM, with a tuned
+        connection. See `db.bulk_insert`.
 
-class WOFRegionRepo(WOFRepo):
+        Args:
+            n (int): Rows per transaction.
+            kwargs: Passed to `db_values_iter`.
 
-    @classmethod
-    def from_env(cls):
-        return cls(os.path.join(DATA_DIR, 'wof-region'))
+        Returns: int, rows inserted.
+        """
+        model = self.doc_cls.model
 
-    def db_rows_iter(self):
-        for doc in self.docs_iter():
-            yield WOFRegionDoc(doc).db_row()
+        # Finish anything pending on the ORM session first.
+        session.commit()
 
+        return bulk_insert(
+            engine,
+            model.__table__,
+            model.column_names(),
+            tqdm(self.db_values_iter(**kwargs)),
+            n,
+        )
 
-class WOFCountyRepo(WOFRepo):
 
-    @classmethod
-    def from_env(cls):
-        return cls(os.path.join(DATA_DIR, 'wof-county'))
+def load_docs(source, batch):
+    """Worker: parse a batch of full docs.
 
-    def db_rows_iter(self):
-        for doc in self.docs_iter():
-            yield WOFCountyDoc(doc).db_row()
+    Returns: list of dict
+    """
+    return list(source.docs_iter(batch, skip_geometry=False))
 
 
-class WOFLocalityRepo(WOFRepo):
+def extract_values(doc_cls, source, skip_geometry, countries, batch):
+    """Worker: parse a batch of docs and extract rows.
 
-    @classmethod
-    def from_env(cls):
-        return cls(os.path.join(DATA_DIR, 'wof-locality'))
+    Args:
+        doc_cls (type): `WOFDoc` subclass.
+        source: See `bundles`.
+        skip_geometry (bool)
+        countries (set): ISO country codes, or None for all.
+        batch (list): From `source.batches_iter`.
 
-    def db_rows_iter(self):
-        for doc in self.docs_iter():
-            yield WOFLocalityDoc(doc).db_row()
+    Returns: list of tuples
+    """
+    rows = []
 
+    for data in source.docs_iter(batch, skip_geometry):
 
-class WOFDoc(UserDict):
+        doc = doc_cls(data)
 
-    @classmethod
-    def from_path(cls, path):
-        return cls(read_json(path))
+        if countries is None or doc.country_iso in countries:
+            rows.append(doc.db_values())
 
-    def __repr__(self):
-        return '%s<%d>' % (self.__class__.__name__, self.wof_id)
+    return rows
 
-    @safe_property
-    def wof_id(self):
-        return self['id']
 
-    def _wof_hierarchy_id(self, key):
-        """Get WOF hierarchy id, if unique.
-        """
-        ids = set([
-            h['%s_id' % key]
-            for h in self['properties']['wof:hierarchy']
-        ])
+def props(*keys, **kwargs):
+    return Path('properties', *keys, **kwargs)
 
-        # TODO: Handle 2+ links.
-        # Punt when more than one link.
-        if len(ids) == 1:
-            id = list(ids)[0]
-            return id if id > 0 else None
 
-    @safe_property
-    def wof_continent_id(self):
-        return self._wof_hierarchy_id('continent')
+def concordance(key):
+    return props('wof:concordances', key)
 
-    @safe_property
-    def wof_country_id(self):
-        return self._wof_hierarchy_id('country')
 
-    @safe_property
-    def wof_region_id(self):
-        return self._wof_hierarchy_id('region')
+def strip_stars(value):
+    return value.strip('*') if isinstance(value, str) else None
 
-    @safe_property
-    def wof_county_id(self):
-        return self._wof_hierarchy_id('county')
 
-    @safe_property
-    def dbp_id(self):
-        return self['properties']['wof:concordances']['dbp:id']
+def hierarchy_id(key):
+    """Get a WOF hierarchy id, if unique.
+    """
+    key = '%s_id' % key
 
-    @safe_property
-    def fb_id(self):
-        return self['properties']['wof:concordances']['fb:id']
+    def get(doc):
 
-    @safe_property
-    def fct_id(self):
-        return self['properties']['wof:concordances']['fct:id']
+        hierarchy = doc.get('properties')
 
-    @safe_property
-    def fips_code(self):
-        return self['properties']['wof:concordances']['fips:code']
+        if isinstance(hierarchy, dict):
+            hierarchy = hierarchy.get('wof:hierarchy')
 
-    @safe_property
-    def gn_id(self):
-        return self['properties']['wof:concordances']['gn:id']
+        if not isinstance(hierarchy, list):
+            return None
 
-    @safe_property
-    def gp_id(self):
-        return self['properties']['wof:concordances']['gp:id']
+        ids = set()
+        for h in hierarchy:
 
-    @safe_property
-    def hasc_id(self):
-        return self['properties']['wof:concordances']['hasc:id']
+            if not isinstance(h, dict) or key not in h:
+                return None
 
-    @safe_property
-    def iso_id(self):
-        return self['properties']['wof:concordances']['iso:id']
+            if isinstance(h[key], (list, dict)):
+                return None
 
-    @safe_property
-    def unlc_id(self):
-        return self['properties']['wof:concordances']['unlc:id']
+            ids.add(h[key])
 
-    @safe_property
-    def loc_id(self):
-        return self['properties']['wof:concordances']['loc:id']
+        # TODO: Handle 2+ links.
+        # Punt when more than one link.
+        if len(ids) == 1:
+            id = list(ids)[0]
+            if isinstance(id, (int, float)) and id > 0:
+                return id
 
-    @safe_property
-    def nyt_id(self):
-        return self['properties']['wof:concordances']['nyt:id']
+    return get
 
-    @safe_property
-    def qs_id(self):
-        return self['properties']['wof:concordances']['qs:id']
 
-    @safe_property
-    def qs_pg_id(self):
-        return self['properties']['wof:concordances']['qs_pg:id']
+class WOFDoc(UserDict):
 
-    @safe_property
-    def wd_id(self):
-        return self['properties']['wof:concordances']['wd:id']
+    # Column -> field. See `fields.Extractor`.
+    fields = dict(
+
+        wof_id=Path('id'),
+
+        wof_continent_id=hierarchy_id('continent'),
+        wof_country_id=hierarchy_id('country'),
+        wof_region_id=hierarchy_id('region'),
+        wof_county_id=hierarchy_id('county'),
+
+        dbp_id=concordance('dbp:id'),
+        fb_id=concordance('fb:id'),
+        fct_id=concordance('fct:id'),
+        fips_code=concordance('fips:code'),
+        gn_id=concordance('gn:id'),
+        gp_id=concordance('gp:id'),
+        hasc_id=concordance('hasc:id'),
+        iso_id=concordance('iso:id'),
+        unlc_id=concordance('unlc:id'),
+        loc_id=concordance('loc:id'),
+        nyt_id=concordance('nyt:id'),
+        qs_id=concordance('qs:id'),
+        qs_pg_id=concordance('qs_pg:id'),
+        wd_id=concordance('wd:id'),
+        wk_page=concordance('wk:page'),
+
+        country_iso=props('iso:country'),
+
+        latitude=First(
+            props('gn:latitude'),
+            props('geom:latitude'),
+        ),
+
+        longitude=First(
+            props('gn:longitude'),
+            props('geom:longitude'),
+        ),
+
+        population=First(
+            props('gn:population'),
+            props('wof:population'),
+            props('wk:population'),
+        ),
+
+        area_m2=props('geom:area_square_m'),
+
+        name=First(
+            props('name:eng_x_preferred', 0),
+            props('wof:name'),
+            props('qs_pg:name'),
+        ),
+
+        name_a0=First(
+            props('qs:a0'),
+            props('qs:adm0'),
+            props('ne:SOV0NAME'),
+            props('qs_pg:name_adm0'),
+            props('woe:name_adm0'),
+        ),
+
+        name_a1=First(
+            props('qs:a1', then=strip_stars),
+            props('ne:ADM1NAME'),
+            props('qs_pg:name_adm1'),
+            props('woe:name_adm1'),
+        ),
+
+    )
+
+    def __init_subclass__(cls, **kwargs):
+        """Compile the field spec once per class. Rows only get the model's
+        columns.
+        """
+        super().__init_subclass__(**kwargs)
+        cls.extract = Extractor(cls.fields, cls.model.column_names())
 
-    @safe_property
-    def wk_page(self):
-        return self['properties']['wof:concordances']['wk:page']
+    @classmethod
+    def from_path(cls, path):
+        return cls(read_json(path))
+
+    def __repr__(self):
+        return '%s<%d>' % (self.__class__.__name__, self.wof_id)
 
-    @safe_property
-    def country_iso(self):
-        return self['properties']['iso:country']
+    def __getattr__(self, name):
+        """Read a single field - `doc.name`.
+        """
+        try:
+            get = self.extract.getters[name]
+        except KeyError:
+            raise AttributeError(name)
 
-    @safe_property
-    def _gn_latitude(self):
-        return self['properties']['gn:latitude']
+        return get(self.data)
 
-    @safe_property
-    def _geom_latitude(self):
-        return self['properties']['geom:latitude']
+    def row(self):
+        """Extract all columns.
 
-    @safe_property
-    def latitude(self):
-        return first(
-            self._gn_latitude,
-            self._geom_latitude,
-        )
+        Returns: dict, column -> value
+        """
+        return self.extract(self.data)
 
-    @safe_property
-    def _gn_longitude(self):
-        return self['properties']['gn:longitude']
+    def db_row(self):
+        """Returns: models.BaseModel
+        """
+        return self.model(**self.row())
 
-    @safe_property
-    def _geom_longitude(self):
-        return self['properties']['geom:longitude']
+    def db_values(self):
+        """Get a row as a tuple, aligned with `model.column_names()`.
+        Columns the doc doesn't have get the column default.
+        """
+        row = self.row()
 
-    @safe_property
-    def longitude(self):
-        return first(
-            self._gn_longitude,
-            self._geom_longitude,
+        return tuple(
+            row.get(col, default)
+            for col, default in self.model.column_defaults()
         )
 
-    @safe_property
-    def _gn_population(self):
-        return self['properties']['gn:population']
 
-    @safe_property
-    def _wof_population(self):
-        return self['properties']['wof:population']
+WOFDoc.extract = Extractor(WOFDoc.fields)
 
-    @safe_property
-    def _wk_population(self):
-        return self['properties']['wk:population']
 
-    @safe_property
-    def population(self):
-        return first(
-            self._gn_population,
-            self._wof_population,
-            self._wk_population,
-        )
+class WOFRegionDoc(WOFDoc):
 
-    @safe_property
-    def area_m2(self):
-        return self['properties']['geom:area_square_m']
+    model = WOFRegion
 
-    @safe_property
-    def _name_eng_x_preferred(self):
-        return self['properties']['name:eng_x_preferred'][0]
+    fields = dict(
+        WOFDoc.fields,
+        name_abbr=First(
+            props('abrv:eng_x_preferred', 0),
+            props('wof:abbreviation'),
+        ),
+    )
 
-    @safe_property
-    def _wof_name(self):
-        return self['properties']['wof:name']
 
-    @safe_property
-    def _qs_pg_name(self):
-        return self['properties']['qs_pg:name']
+class WOFCountyDoc(WOFDoc):
 
-    @safe_property
-    def name(self):
-        return first(
-            self._name_eng_x_preferred,
-            self._wof_name,
-            self._qs_pg_name,
-        )
+    model = WOFCounty
 
-    @safe_property
-    def _qs_a0(self):
-        return self['properties']['qs:a0']
-
-    @safe_property
-    def _qs_adm0(self):
-        return self['properties']['qs:adm0']
-
-    @safe_property
-    def _ne_sov0name(self):
-        return self['properties']['ne:SOV0NAME']
-
-    @safe_property
-    def _qs_pg_name_adm0(self):
-        return self['properties']['qs_pg:name_adm0']
-
-    @safe_property
-    def _woe_name_adm0(self):
-        return self['properties']['woe:name_adm0']
-
-    @safe_property
-    def name_a0(self):
-        return first(
-            self._qs_a0,
-            self._qs_adm0,
-            self._ne_sov0name,
-            self._qs_pg_name_adm0,
-            self._woe_name_adm0,
-        )
 
-    @safe_property
-    def _qs_a1(self):
-        return self['properties']['qs:a1'].strip('*')
-
-    @safe_property
-    def _ne_adm1name(self):
-        return self['properties']['ne:ADM1NAME']
-
-    @safe_property
-    def _qs_pg_name_adm1(self):
-        return self['properties']['qs_pg:name_adm1']
-
-    @safe_property
-    def _woe_name_adm1(self):
-        return self['properties']['woe:name_adm1']
-
-    @safe_property
-    def name_a1(self):
-        return first(
-            self._qs_a1,
-            self._ne_adm1name,
-            self._qs_pg_name_adm1,
-            self._woe_name_adm1,
-        )
+class WOFLocalityDoc(WOFDoc):
 
+    model = WOFLocality
 
-class WOFRegionDoc(WOFDoc):
+    fields = dict(
+        WOFDoc.fields,
+        wikipedia_wordcount=props('wk:wordcount'),
+        elevation=First(
+            props('gn:elevation'),
+            props('ne:ELEVATION'),
+        ),
+    )
 
-    @safe_property
-    def _abrv_eng_x_preferred(self):
-        return self['properties']['abrv:eng_x_preferred'][0]
 
-    @safe_property
-    def _wof_abbreviation(self):
-        return self['properties']['wof:abbreviation']
+class WOFRegionRepo(WOFRepo):
 
-    @safe_property
-    def name_abbr(self):
-        return first(
-            self._abrv_eng_x_preferred,
-            self._wof_abbreviation,
-        )
+    doc_cls = WOFRegionDoc
 
-    def db_row(self):
-        """Returns: models.WOFRegion
-        """
-        return WOFRegion(**{
-            col: getattr(self, col)
-            for col in WOFRegion.column_names()
-            if hasattr(self, col)
-        })
+    placetype = 'region'
 
+    @classmethod
+    def from_env(cls):
+        return cls(find_source(os.path.join(DATA_DIR, 'wof-region')))
 
-class WOFCountyDoc(WOFDoc):
 
-    def db_row(self):
-        """Returns: models.WOFCounty
-        """
-        return WOFCounty(**{
-            col: getattr(self, col)
-            for col in WOFCounty.column_names()
-            if hasattr(self, col)
-        })
+class WOFCountyRepo(WOFRepo):
 
+    doc_cls = WOFCountyDoc
 
-class WOFLocalityDoc(WOFDoc):
+    placetype = 'county'
 
-    @safe_property
-    def wikipedia_wordcount(self):
-        return self['properties']['wk:wordcount']
+    @classmethod
+    def from_env(cls):
+        return cls(find_source(os.path.join(DATA_DIR, 'wof-county')))
 
-    @safe_property
-    def _gn_elevation(self):
-        return self['properties']['gn:elevation']
 
-    @safe_property
-    def _ne_elevation(self):
-        return self['properties']['ne:ELEVATION']
+class WOFLocalityRepo(WOFRepo):
 
-    @safe_property
-    def elevation(self):
-        return first(
-            self._gn_elevation,
-            self._ne_elevation,
-        )
+    doc_cls = WOFLocalityDoc
 
-    def db_row(self):
-        """Returns: models.WOFLocality
-        """
-        return WOFLocality(**{
-            col: getattr(self, col)
-            for col in WOFLocality.column_names()
-            if hasattr(self, col)
-        })
+    placetype = 'locality'
+
+    @classmethod
+    def from_env(cls):
+        return cls(find_source(os.path.join(DATA_DIR, 'wof-locality')))
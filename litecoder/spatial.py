@@ -0,0 +1,138 @@
+
+
+import numpy as np
+
+from scipy.spatial import cKDTree
+
+from .columnar import NO_MATCH, column_array, take_columns
+
+
+# Mean Earth radius.
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_xyz(lats, lons):
+    """Project degrees onto the unit sphere.
+
+    Returns: (n, 3) array
+    """
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lons = np.radians(np.asarray(lons, dtype=np.float64))
+
+    cos_lat = np.cos(lats)
+
+    return np.column_stack([
+        cos_lat * np.cos(lons),
+        cos_lat * np.sin(lons),
+        np.sin(lats),
+    ])
+
+
+def chord_to_km(chord):
+    """Straight-line distance between unit vectors -> great-circle km.
+    """
+    chord = np.clip(chord, 0, 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(chord / 2)
+
+
+def km_to_chord(km):
+    km = min(km, np.pi * EARTH_RADIUS_KM)
+    return 2 * np.sin(km / (2 * EARTH_RADIUS_KM))
+
+
+class SpatialIndex:
+
+    def __init__(self, lats, lons, rows):
+        """KD-tree over points on the unit sphere. Euclidean (chord) order
+        is the same as great-circle order, so nearest neighbors are exact,
+        and chord lengths convert back to haversine distances.
+
+        Args:
+            lats (array): Degrees.
+            lons (array): Degrees.
+            rows (array): Entity store row for each point.
+        """
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.tree = cKDTree(to_xyz(lats, lons))
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def from_store(cls, store):
+        """Index every entity with coordinates.
+        """
+        lats = column_array(store, 'latitude')
+        lons = column_array(store, 'longitude')
+
+        rows = np.flatnonzero(~(np.isnan(lats) | np.isnan(lons)))
+
+        return cls(lats[rows], lons[rows], rows)
+
+    def query(self, lats, lons, k=1, max_km=None):
+        """Find the nearest entities to each point.
+
+        Args:
+            lats (array): Degrees.
+            lons (array): Degrees.
+            k (int): Neighbors per point.
+            max_km (float): Ignore entities farther than this.
+
+        Returns: (rows, km), both (n, k); rows are NO_MATCH and km are NaN
+        when there are fewer than k entities in range.
+        """
+        xyz = to_xyz(lats, lons)
+
+        rows = np.full((len(xyz), k), NO_MATCH, dtype=np.int64)
+        km = np.full((len(xyz), k), np.nan)
+
+        if not len(self) or not len(xyz):
+            return rows, km
+
+        bound = np.inf if max_km is None else km_to_chord(max_km)
+
+        # Bad coordinates don't match anything.
+        valid = np.isfinite(xyz).all(axis=1)
+
+        chord, idx = self.tree.query(
+            xyz[valid], k=k, distance_upper_bound=bound,
+        )
+
+        chord = chord.reshape(-1, k)
+        idx = idx.reshape(-1, k)
+
+        # Misses come back as idx == len(tree), chord == inf.
+        found = idx < len(self)
+
+        rows[valid] = np.where(
+            found, self.rows[np.minimum(idx, len(self)-1)], NO_MATCH,
+        )
+
+        km[valid] = np.where(found, chord_to_km(chord), np.nan)
+
+        return rows, km
+
+
+def reverse_column(index, lats, lons, max_km=None, fields=()):
+    """Reverse-geocode columns of coordinates, in one vectorized query.
+
+    Args:
+        index (usa.Index)
+        lats (array): Degrees.
+        lons (array): Degrees.
+        max_km (float): Ignore entities farther than this.
+        fields (iter): Extra numeric columns to return.
+
+    Returns: dict of arrays, aligned with the input:
+        wof_id: int64; NO_MATCH when nothing is in range.
+        km: float64 distance, or NaN.
+        Each field: float64 with NaN, or int64 with INT_NULL, on misses.
+    """
+    rows, km = index.spatial().query(lats, lons, 1, max_km)
+
+    rows, km = rows[:, 0], km[:, 0]
+
+    result = dict(km=km)
+    result.update(take_columns(index._store(), rows, ('wof_id', *fields)))
+
+    return result
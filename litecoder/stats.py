@@ -0,0 +1,281 @@
+
+
+import random
+import threading
+
+from collections import OrderedDict
+
+
+# Log2 latency buckets, in microseconds: bucket 0 is < 1µs, bucket i is
+# [2^(i-1), 2^i) µs, and the last one is everything slower.
+NUM_BUCKETS = 24
+
+COUNTERS = ('lookups', 'hits', 'misses', 'ambiguous', 'cache_hits')
+
+HISTOGRAMS = ('get', 'batch')
+
+
+def bucket(seconds):
+    """Histogram bucket for a latency.
+    """
+    return min(int(seconds * 1e6).bit_length(), NUM_BUCKETS - 1)
+
+
+def bucket_bounds():
+    """Upper bound of each bucket, in seconds. The last is +Inf.
+    """
+    return [2 ** i / 1e6 for i in range(NUM_BUCKETS - 1)] + [float('inf')]
+
+
+class ThreadStats:
+
+    __slots__ = COUNTERS + ('hists', 'sums', 'missed', 'sample')
+
+    def __init__(self):
+        """Counts for one thread. Only the owning thread writes them, so
+        recording doesn't need a lock.
+        """
+        for name in COUNTERS:
+            setattr(self, name, 0)
+
+        self.hists = {name: [0] * NUM_BUCKETS for name in HISTOGRAMS}
+        self.sums = dict.fromkeys(HISTOGRAMS, 0.)
+
+        # Reservoir of missed keys, out of `missed` seen.
+        self.missed = 0
+        self.sample = []
+
+
+class LookupStats:
+
+    def __init__(self, sample_size=100):
+        """Hit / miss / ambiguity counters, latency histograms and a sample of
+        missed keys, for an `Index`. See `Index.enable_stats`.
+
+        Each thread records into its own counts; `snapshot` merges them.
+
+        Args:
+            sample_size (int): Max missed keys to keep.
+        """
+        self.sample_size = sample_size
+        self.hooks = []
+
+        self._lock = threading.Lock()
+        self._threads = []
+        self._local = threading.local()
+
+    def _counts(self):
+        """Counts for the current thread, registered on first use.
+        """
+        try:
+            return self._local.counts
+
+        except AttributeError:
+
+            counts = self._local.counts = ThreadStats()
+
+            with self._lock:
+                self._threads.append(counts)
+
+            return counts
+
+    def _miss(self, counts, key):
+        """Count a miss, and maybe keep the key (Algorithm R).
+        """
+        counts.misses += 1
+        counts.missed += 1
+
+        if len(counts.sample) < self.sample_size:
+            counts.sample.append(key)
+
+        else:
+            i = random.randrange(counts.missed)
+            if i < self.sample_size:
+                counts.sample[i] = key
+
+    def _count(self, counts, key, n):
+        if n:
+            counts.hits += 1
+            if n > 1:
+                counts.ambiguous += 1
+        else:
+            self._miss(counts, key)
+
+    def record(self, key, n, seconds):
+        """Record one `__getitem__`.
+
+        Args:
+            key (str): Normalized key.
+            n (int): Number of matches.
+            seconds (float)
+        """
+        counts = self._counts()
+
+        counts.lookups += 1
+        self._count(counts, key, n)
+
+        counts.hists['get'][bucket(seconds)] += 1
+        counts.sums['get'] += seconds
+
+        for hook in self.hooks:
+            hook(key, n, seconds)
+
+    def record_batch(self, texts, results, seconds, cache_hits, keyify):
+        """Record one `lookup_many`.
+
+        Args:
+            texts (list): Raw inputs.
+            results (list): Matches (or None) for each input.
+            seconds (float): Time for the whole batch.
+            cache_hits (int): Distinct inputs served from the cache.
+            keyify (callable): Normalizes inputs, for the missed keys.
+        """
+        counts = self._counts()
+
+        counts.lookups += len(results)
+        counts.cache_hits += cache_hits
+
+        sizes = [len(matches) if matches else 0 for matches in results]
+
+        for text, n in zip(texts, sizes):
+            if n:
+                self._count(counts, None, n)
+            else:
+                self._miss(counts, keyify(text))
+
+        counts.hists['batch'][bucket(seconds)] += 1
+        counts.sums['batch'] += seconds
+
+        if self.hooks:
+
+            per_key = seconds / len(results) if results else 0.
+
+            for text, n in zip(texts, sizes):
+                key = keyify(text)
+                for hook in self.hooks:
+                    hook(key, n, per_key)
+
+    def add_hook(self, func):
+        """Call a function on every lookup - eg, to forward to a metrics
+        client. For `lookup_many`, it's called for each input, with the
+        batch time split evenly.
+
+        Args:
+            func (callable): (key, number of matches, seconds) -> None
+        """
+        self.hooks.append(func)
+
+    def remove_hook(self, func):
+        self.hooks.remove(func)
+
+    def reset(self):
+        """Zero all counts. Threads keep their registration.
+        """
+        with self._lock:
+            for counts in self._threads:
+                counts.__init__()
+
+    def missed_keys(self):
+        """Merge the per-thread reservoirs, weighting each key by the number
+        of misses it stands for (A-Res).
+
+        Returns: list of str
+        """
+        weighted = []
+
+        for counts in list(self._threads):
+
+            sample = list(counts.sample)
+
+            if not sample:
+                continue
+
+            weight = counts.missed / len(sample)
+
+            weighted += [(random.random() ** (1 / weight), k) for k in sample]
+
+        weighted.sort(reverse=True)
+
+        return [key for _, key in weighted[:self.sample_size]]
+
+    def snapshot(self):
+        """Merged counts, across threads.
+
+        Returns: dict
+        """
+        res = OrderedDict((name, 0) for name in COUNTERS)
+
+        hists = {name: [0] * NUM_BUCKETS for name in HISTOGRAMS}
+        sums = dict.fromkeys(HISTOGRAMS, 0.)
+
+        for counts in list(self._threads):
+
+            for name in COUNTERS:
+                res[name] += getattr(counts, name)
+
+            for name in HISTOGRAMS:
+
+                sums[name] += counts.sums[name]
+
+                for i, n in enumerate(counts.hists[name]):
+                    hists[name][i] += n
+
+        res['latency'] = OrderedDict(
+            (name, dict(
+                buckets=hists[name],
+                count=sum(hists[name]),
+                sum=sums[name],
+            ))
+            for name in HISTOGRAMS
+        )
+
+        res['missed_keys'] = self.missed_keys()
+
+        return res
+
+    def to_prometheus(self, prefix='litecoder', labels=None):
+        """Render a snapshot in the Prometheus text format.
+
+        Args:
+            prefix (str): Metric name prefix.
+            labels (dict): Added to every sample - eg, the index name.
+
+        Returns: str
+        """
+        snap = self.snapshot()
+
+        def fmt_labels(extra=()):
+            pairs = list((labels or {}).items()) + list(extra)
+            if not pairs:
+                return ''
+            return '{%s}' % ','.join('%s="%s"' % p for p in pairs)
+
+        lines = []
+
+        for name in COUNTERS:
+            metric = '%s_%s_total' % (prefix, name)
+            lines.append('# TYPE %s counter' % metric)
+            lines.append('%s%s %d' % (metric, fmt_labels(), snap[name]))
+
+        bounds = bucket_bounds()
+
+        for name, hist in snap['latency'].items():
+
+            metric = '%s_%s_seconds' % (prefix, name)
+            lines.append('# TYPE %s histogram' % metric)
+
+            total = 0
+            for le, n in zip(bounds, hist['buckets']):
+
+                total += n
+
+                le = '+Inf' if le == float('inf') else '%g' % le
+
+                lines.append('%s_bucket%s %d' % (
+                    metric, fmt_labels([('le', le)]), total,
+                ))
+
+            lines.append('%s_sum%s %r' % (metric, fmt_labels(), hist['sum']))
+            lines.append('%s_count%s %d' % (metric, fmt_labels(), total))
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,405 @@
+
+
+import math
+
+from array import array
+
+
+# Column kind -> array typecode.
+KIND_TYPECODES = dict(
+    q='q',  # int64
+    d='d',  # float64
+    b='b',  # bool, as int8
+    s='i',  # string table ref
+    g='i',  # parent entity row
+)
+
+# Stored in place of None.
+INT_NULL = -2**63
+REF_NULL = -1
+BOOL_NULL = -1
+
+
+def column_kind(values):
+    """Infer a column kind from a list of values.
+
+    Args:
+        values (list)
+
+    Returns: str
+    """
+    types = set(type(v) for v in values if v is not None)
+
+    if types == {bool}:
+        return 'b'
+
+    if types == {int}:
+        return 'q'
+
+    if types and types <= {int, float}:
+        return 'd'
+
+    if types == {dict}:
+        return 'g'
+
+    return 's'
+
+
+def infer_columns(rows):
+    """Infer (name, kind, child columns) triples from a list of dicts.
+
+    Args:
+        rows (list of dict)
+    """
+    names = sorted(set(k for row in rows for k in row))
+
+    columns = []
+    for name in names:
+
+        values = [row.get(name) for row in rows]
+        kind = column_kind(values)
+
+        child = None
+        if kind == 'g':
+            child = infer_columns([v for v in values if v is not None])
+
+        columns.append((name, kind, child))
+
+    return columns
+
+
+class StringTable:
+
+    def __init__(self, strings=None):
+        """Interned strings, referenced by position.
+
+        Args:
+            strings (list)
+        """
+        self.strings = strings or []
+        self._refs = None
+
+    def __getstate__(self):
+        """Don't serialize the reverse map; it's rebuilt on demand.
+        """
+        return dict(strings=self.strings)
+
+    def __setstate__(self, state):
+        self.strings = state['strings']
+        self._refs = None
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getitem__(self, ref):
+        return self.strings[ref]
+
+    def ref(self, value):
+        """Get (or assign) the ref for a string.
+        """
+        if self._refs is None:
+            self._refs = {s: i for i, s in enumerate(self.strings)}
+
+        ref = self._refs.get(value)
+
+        if ref is None:
+            ref = self._refs[value] = len(self.strings)
+            self.strings.append(value)
+
+        return ref
+
+
+class EntityStore:
+
+    def __init__(self, columns, strings=None):
+        """Columnar entity metadata. Numbers are kept in typed arrays, strings
+        in an interned table, and parent entities (eg, a city's region) in
+        nested stores, referenced by row.
+
+        Args:
+            columns (list): (name, kind, child columns) triples. Kinds are
+                q (int), d (float), b (bool), s (str), g (parent entity).
+            strings (StringTable): Shared with nested stores.
+        """
+        self.strings = strings if strings is not None else StringTable()
+        self.columns = [(name, kind) for name, kind, _ in columns]
+
+        self._arrays = {
+            name: array(KIND_TYPECODES[kind])
+            for name, kind, _ in columns
+        }
+
+        self._kinds = {name: kind for name, kind, _ in columns}
+
+        self._groups = {
+            name: EntityStore(child, self.strings)
+            for name, kind, child in columns
+            if kind == 'g'
+        }
+
+        # Values that don't fit the column type, keyed by (name, row).
+        self._overflow = dict()
+
+        self._rows = dict()
+
+    @classmethod
+    def from_buffers(cls, columns, buffers, strings, overflow, prefix='col.'):
+        """Build a read-only store over existing arrays (eg, mmap views).
+
+        Args:
+            columns (list): (name, kind, child columns) triples.
+            buffers (func): Section name -> array-like.
+            strings (sequence): Ref -> str.
+            overflow (list): (name, row, value) triples, with names relative
+                to the top-level store (eg, `region.name`).
+        """
+        store = cls.__new__(cls)
+        store.strings = strings
+        store.columns = [(name, kind) for name, kind, _ in columns]
+
+        store._arrays = {
+            name: buffers(prefix+name)
+            for name, _, _ in columns
+        }
+
+        store._kinds = {name: kind for name, kind, _ in columns}
+
+        store._groups = {
+            name: cls.from_buffers(
+                child, buffers, strings,
+                [(n.partition('.')[2], r, v) for n, r, v in overflow
+                    if n.startswith(name+'.')],
+                '%s%s.' % (prefix, name),
+            )
+            for name, kind, child in columns
+            if kind == 'g'
+        }
+
+        store._overflow = {
+            (name, row): value
+            for name, row, value in overflow
+            if '.' not in name
+        }
+
+        store._rows = None
+
+        return store
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_rows']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._rows = None
+
+    def __len__(self):
+        return len(self._arrays['wof_id'])
+
+    def schema(self):
+        """Get (name, kind, child columns) triples.
+        """
+        return [
+            (name, kind, self._groups[name].schema() if kind == 'g' else None)
+            for name, kind in self.columns
+        ]
+
+    def column(self, name):
+        """Get the raw array for a column. Nulls are stored as sentinels.
+        """
+        return self._arrays[name]
+
+    def row(self, id):
+        """Map a WOF id -> row, or None.
+        """
+        if self._rows is None:
+            self._rows = {id: i for i, id in enumerate(self._arrays['wof_id'])}
+
+        return self._rows.get(id)
+
+    def _encode(self, name, kind, value):
+        """Python value -> array value.
+        """
+        if kind == 's':
+            if value is None:
+                return REF_NULL
+            if not isinstance(value, str):
+                raise TypeError(value)
+            return self.strings.ref(value)
+
+        if kind == 'g':
+            return REF_NULL if value is None else self._groups[name].add(value)
+
+        if value is None:
+            return dict(q=INT_NULL, d=math.nan, b=BOOL_NULL)[kind]
+
+        if kind == 'b':
+            return int(value)
+
+        return value
+
+    def add(self, data):
+        """Add (or replace) an entity, keyed on `wof_id`.
+
+        Args:
+            data (dict)
+
+        Returns: int, the row.
+        """
+        row = self.row(data['wof_id'])
+
+        if row is None:
+            row = len(self)
+            self._rows[data['wof_id']] = row
+            for values in self._arrays.values():
+                values.append(0)
+
+        for name, kind in self.columns:
+
+            value = data.get(name)
+
+            self._overflow.pop((name, row), None)
+
+            try:
+                self._arrays[name][row] = self._encode(name, kind, value)
+
+            # Type doesn't match the column.
+            except (TypeError, ValueError, OverflowError):
+                self._arrays[name][row] = self._encode(name, kind, None)
+                self._overflow[(name, row)] = value
+
+        return row
+
+    def remove(self, ids):
+        """Drop entities, by WOF id. Later rows shift down; parent entities
+        and strings are kept.
+
+        Args:
+            ids (iter)
+        """
+        drop = {self.row(id) for id in ids} - {None}
+
+        if not drop:
+            return
+
+        keep = [row for row in range(len(self)) if row not in drop]
+        new_rows = {old: new for new, old in enumerate(keep)}
+
+        for name, values in self._arrays.items():
+            self._arrays[name] = array(
+                values.typecode, [values[row] for row in keep],
+            )
+
+        self._overflow = {
+            (name, new_rows[row]): value
+            for (name, row), value in self._overflow.items()
+            if row in new_rows
+        }
+
+        self._rows = None
+
+    def get(self, row, name):
+        """Read a value.
+
+        Raises: KeyError, for unknown columns.
+        """
+        kind = self._kinds[name]
+        value = self._arrays[name][row]
+
+        if kind == 's':
+            return None if value == REF_NULL else self.strings[value]
+
+        if kind == 'g':
+            return None if value == REF_NULL else \
+                Record(self._groups[name], value)
+
+        if kind == 'd':
+            null = math.isnan(value)
+
+        else:
+            null = value == (BOOL_NULL if kind == 'b' else INT_NULL)
+
+        if null:
+            return self._overflow.get((name, row))
+
+        return bool(value) if kind == 'b' else value
+
+    def to_dict(self, row):
+        """Rebuild the full metadata dict for a row.
+        """
+        data = dict()
+
+        for name, kind in self.columns:
+            value = self.get(row, name)
+            data[name] = value.to_dict() if kind == 'g' and value else value
+
+        return data
+
+    def sections(self, prefix='col.'):
+        """Generate (name, array) pairs for every column, recursively.
+        """
+        for name, _ in self.columns:
+            yield prefix+name, self._arrays[name]
+
+        for name, group in self._groups.items():
+            yield from group.sections('%s%s.' % (prefix, name))
+
+    def overflow(self, prefix=''):
+        """Get (name, row, value) triples for out-of-type values.
+        """
+        rows = [
+            (prefix+name, row, value)
+            for (name, row), value in self._overflow.items()
+        ]
+
+        for name, group in self._groups.items():
+            rows += group.overflow('%s%s.' % (prefix, name))
+
+        return rows
+
+
+class Record:
+
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store, row):
+        """Attribute / item access to one row of an `EntityStore`.
+        """
+        self._store = store
+        self._row = row
+
+    def __getattr__(self, name):
+
+        # Slots aren't set yet when unpickling.
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        try:
+            return self._store.get(self._row, name)
+        except KeyError:
+            raise AttributeError(name)
+
+    def __getitem__(self, name):
+        return self._store.get(self._row, name)
+
+    def __contains__(self, name):
+        return name in self._store._kinds
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __eq__(self, other):
+        return isinstance(other, Record) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return '%s<%r>' % (self.__class__.__name__, self.to_dict())
+
+    def keys(self):
+        return [name for name, _ in self._store.columns]
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def to_dict(self):
+        return self._store.to_dict(self._row)
@@ -1,18 +1,27 @@
 
 
+import os
 import re
 import pickle
 
-from tqdm import tqdm
 from collections import defaultdict
 from itertools import product
-from cached_property import cached_property
-from box import Box
+from time import perf_counter
 
-from sqlalchemy.inspection import inspect
+from . import (
+    logger, US_CITY_PATH, US_STATE_PATH, US_CITY_MMAP_PATH, US_STATE_MMAP_PATH
+)
+
+from .extract import Scanner
+from .fuzzy import SortedKeys, MAX_NODES, search as fuzzy_search
+from .utils import LRUCache
+from .stats import LookupStats
+from .store import EntityStore, Record, infer_columns
+from .mmindex import write_index, IndexFile
 
-from . import logger, US_CITY_PATH, US_STATE_PATH
-from .models import WOFRegion, WOFLocality
+# NOTE: Loading and querying a prebuilt index only needs the stdlib. The
+# models (SQLAlchemy, NumPy, SciPy, YAML) and tqdm are imported on the build
+# path, inside the functions that need them.
 
 
 # TODO: Country alt-names YAML.
@@ -38,137 +47,161 @@ def keyify(text):
     return text
 
 
-class CityNamePopulations(defaultdict):
+def city_keys(names, bare_names, state_names):
+    """Enumerate index keys for a city, given its names.
 
-    def __init__(self):
-        """Index name -> [pops], using median pop if no metadata.
-        """
-        super().__init__(list)
+    Args:
+        names (iter): Name + alt names.
+        bare_names (list): Names unique enough to be indexed alone.
+        state_names (list): State name + abbreviation.
 
-        logger.info('Indexing name -> populations.')
+    Yields: str
+    """
+    # Bare name
+    for name in bare_names:
+        yield name
 
-        median_pop = WOFLocality.median_population()
+    # Bare name, USA
+    for name, usa in product(bare_names, USA_NAMES):
+        yield ' '.join((name, usa))
 
-        for row in tqdm(WOFLocality.query):
-            for name in row.names:
-                self[keyify(name)].append(row.population or median_pop)
+    # Name, state
+    for name, state in product(names, state_names):
+        yield ' '.join((name, state))
 
-    def __getitem__(self, text):
-        return super().__getitem__(keyify(text))
+    # Name, state, USA
+    for name, state, usa in product(names, state_names, USA_NAMES):
+        yield ' '.join((name, state, usa))
 
 
-class AllowBareCityName:
+def state_key_iter(row):
+    """Enumerate index keys for a state.
+
+    Args:
+        row (db.Region)
 
-    def __init__(self, min_p1_gap=200000, blocklist=None):
-        self.name_pops = CityNamePopulations()
-        self.min_p1_gap = min_p1_gap
-        self.blocklist = set(map(keyify, blocklist or []))
+    Yields: str
+    """
+    names = (row.name,)
+    abbrs = (row.name_abbr,)
 
-    def blocked(self, name):
-        return keyify(name) in self.blocklist
+    # Name
+    yield from names
 
-    def large_p1_gap(self, row, name):
-        """Get the difference in population between this city and the second-
-        most-populous city with the name. Allow if over threshold.
-        """
-        all_pops = sorted(self.name_pops[name], reverse=True)
-        pop = row.population or 0
-        return pop - sum(all_pops[1:]) > self.min_p1_gap
+    # TODO: Bare abbrs?
 
-    def __call__(self, row, name):
-        """Is a name unique enough that it should be indexed independently?
+    # Name, USA
+    for name, usa in product(names, USA_NAMES):
+        yield ' '.join((name, usa))
 
-        Args:
-            row (models.WOFLocality)
-            name (str)
+    # Abbr, USA
+    for abbr, usa in product(abbrs, USA_NAMES):
+        yield ' '.join((abbr, usa))
 
-        Returns: bool
-        """
-        return not self.blocked(name) and self.large_p1_gap(row, name)
 
+class Match:
+
+    __slots__ = ('_store', '_row')
 
-class CityKeyIter:
+    # Name of the model in `litecoder.models`.
+    model_name = None
 
-    def __init__(self, allow_bare):
-        self.allow_bare = allow_bare
+    def __init__(self, store, row):
+        """Lightweight view of an entity in an `EntityStore`.
 
-    def __call__(self, row):
-        """Enumerate index keys for a city.
+        Args:
+            store (store.EntityStore)
+            row (int)
+        """
+        self._store = store
+        self._row = row
+
+    @classmethod
+    def from_data(cls, data):
+        """Build a standalone match from a metadata dict.
 
         Args:
-            row (db.Locality)
+            data (dict)
+        """
+        store = EntityStore(infer_columns([data]))
+        return cls(store, store.add(data))
 
-        Yields: str
+    def __reduce__(self):
+        """Pickle just this entity, not the whole store.
         """
-        bare_names = [n for n in row.names if self.allow_bare(row, n)]
+        return (self.__class__.from_data, (self.data.to_dict(),))
 
-        # Get non-empty state names.
-        state_names = [n for n in (row.name_a1, row.us_state_abbr) if n]
+    def __eq__(self, other):
+        return self.__class__ is other.__class__ and self._pk == other._pk
 
-        # Bare name
-        for name in bare_names:
-            yield name
+    def __hash__(self):
+        return hash((self.__class__, self._pk))
 
-        # Bare name, USA
-        for name, usa in product(bare_names, USA_NAMES):
-            yield ' '.join((name, usa))
+    @property
+    def data(self):
+        return Record(self._store, self._row)
 
-        # Name, state
-        for name, state in product(row.names, state_names):
-            yield ' '.join((name, state))
+    @property
+    def _pk(self):
+        return (self._store.get(self._row, 'wof_id'),)
 
-        # Name, state, USA
-        for name, state, usa in product(row.names, state_names, USA_NAMES):
-            yield ' '.join((name, state, usa))
+    @property
+    def _model_cls(self):
+        from . import models
+        return getattr(models, self.model_name)
 
+    @property
+    def db_row(self):
+        """Hydrate database row, lazily. For more than one match, use
+        `hydrate`.
+        """
+        from .db import hydration_session
+        return hydration_session().query(self._model_cls).get(self._pk)
 
-def state_key_iter(row):
-    """Enumerate index keys for a state.
+
+def hydrate(matches, chunk_size=10000):
+    """Fetch database rows for a list of matches, with one `IN` query per
+    model, instead of one query per match.
 
     Args:
-        row (db.Region)
+        matches (iter of Match)
+        chunk_size (int): Max ids per query.
 
-    Yields: str
+    Returns: list of rows, aligned with `matches`. None for misses.
     """
-    names = (row.name,)
-    abbrs = (row.name_abbr,)
+    from .db import hydration_session
 
-    # Name
-    yield from names
+    session = hydration_session()
 
-    # TODO: Bare abbrs?
+    matches = list(matches)
 
-    # Name, USA
-    for name, usa in product(names, USA_NAMES):
-        yield ' '.join((name, usa))
-
-    # Abbr, USA
-    for abbr, usa in product(abbrs, USA_NAMES):
-        yield ' '.join((abbr, usa))
+    model_ids = defaultdict(set)
+    for match in matches:
+        model_ids[match._model_cls].add(match._pk[0])
 
+    rows = {}
+    for model, ids in model_ids.items():
 
-class Match:
+        ids = list(ids)
 
-    def __init__(self, row):
-        """Set model class, PK, metadata.
-        """
-        state = inspect(row)
+        for i in range(0, len(ids), chunk_size):
 
-        # Don't store the actual row, so we can serialize.
-        self._model_cls = state.class_
-        self._pk = state.identity
+            query = session.query(model).filter(
+                model.wof_id.in_(ids[i:i+chunk_size])
+            )
 
-        self.data = Box(dict(row))
+            for row in query:
+                rows[model, row.wof_id] = row
 
-    @cached_property
-    def db_row(self):
-        """Hydrate database row, lazily.
-        """
-        return self._model_cls.query.get(self._pk)
+    return [rows.get((m._model_cls, m._pk[0])) for m in matches]
 
 
 class CityMatch(Match):
 
+    __slots__ = ()
+
+    model_name = 'WOFLocality'
+
     def __repr__(self):
         return '%s<%s, %s, %s, wof:%d>' % (
             self.__class__.__name__,
@@ -181,6 +214,10 @@ class CityMatch(Match):
 
 class StateMatch(Match):
 
+    __slots__ = ()
+
+    model_name = 'WOFRegion'
+
     def __repr__(self):
         return '%s<%s, %s, wof:%d>' % (
             self.__class__.__name__,
@@ -190,8 +227,59 @@ class StateMatch(Match):
         )
 
 
+MATCH_CLASSES = {cls.__name__: cls for cls in (Match, CityMatch, StateMatch)}
+
+
+class BatchLookup:
+
+    __slots__ = ('results', 'cache_hits', 'distinct_inputs')
+
+    def __init__(self, results, cache_hits, distinct_inputs):
+        """Results from `Index.lookup_many`.
+
+        Args:
+            results (list): Matches (or None) for each input.
+            cache_hits (int): Distinct inputs served from the LRU cache.
+            distinct_inputs (int): Distinct raw strings in the batch, before
+                normalization - "NYC" and "nyc" count twice.
+        """
+        self.results = results
+        self.cache_hits = cache_hits
+        self.distinct_inputs = distinct_inputs
+
+    def __repr__(self):
+        return '%s<%d results, %d distinct, %d cache hits>' % (
+            self.__class__.__name__,
+            len(self.results),
+            self.distinct_inputs,
+            self.cache_hits,
+        )
+
+    def __len__(self):
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __getitem__(self, i):
+        return self.results[i]
+
+
 class Index:
 
+    # Max raw strings remembered across `lookup_many` calls.
+    cache_size = 100000
+
+    match_cls = Match
+
+    # Max edits for fuzzy fallback on exact misses. 0 = exact only.
+    fuzzy_dist = 0
+
+    fuzzy_max_nodes = MAX_NODES
+
+    # Lookup counters, when enabled. See `enable_stats`.
+    stats = None
+
     @classmethod
     def load(cls, path):
         with open(path, 'rb') as fh:
@@ -199,7 +287,32 @@ class Index:
 
     def __init__(self):
         self._key_to_ids = defaultdict(set)
-        self._id_to_loc = dict()
+        self._entities = None
+        self._cache = LRUCache(self.cache_size)
+        self._sorted_keys = None
+        self._scanner = None
+        self._spatial = None
+        self._spatial_pickle = None
+
+    def __getstate__(self):
+        """Don't serialize the lookup cache, or the fuzzy / free-text key
+        tables. The KD-tree is saved pre-pickled, so that loading the index
+        doesn't import SciPy.
+        """
+        state = self.__dict__.copy()
+        state.pop('_cache', None)
+        state.pop('_sorted_keys', None)
+        state.pop('_scanner', None)
+        state.pop('_spatial', None)
+        state.pop('stats', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache = LRUCache(self.cache_size)
+        self._sorted_keys = None
+        self._scanner = None
+        self._spatial = None
 
     def __len__(self):
         return len(self._key_to_ids)
@@ -208,74 +321,774 @@ class Index:
         return '%s<%d keys, %d entities>' % (
             self.__class__.__name__,
             len(self._key_to_ids),
-            len(self._id_to_loc),
+            len(self._entities or ()),
         )
 
+    def _key_ids(self, key):
+        """Get the ids for a normalized key, or None if not indexed.
+        """
+        if key not in self._key_to_ids:
+            return None
+
+        return tuple(self._key_to_ids[key])
+
+    def _ids_to_rows(self, ids):
+        """Map ids -> `EntityStore` rows.
+        """
+        return [self._entities.row(id) for id in ids]
+
+    def _key_rows(self, key):
+        """Get `EntityStore` rows for a normalized key, or None.
+        """
+        ids = self._key_ids(key)
+        return None if ids is None else self._ids_to_rows(ids)
+
+    def _ids_to_locs(self, ids):
+        if ids is None:
+            return None
+
+        store = self._entities
+        return [self.match_cls(store, row) for row in self._ids_to_rows(ids)]
+
+    def _store(self):
+        """The entity store, for whole-index operations.
+        """
+        if self._entities is None:
+            raise ValueError('%s has no entities; build it first.' % (
+                self.__class__.__name__,
+            ))
+
+        return self._entities
+
+    def _key_table(self):
+        """Sorted keys, for fuzzy search. Built on first use.
+        """
+        if self._sorted_keys is None:
+            self._sorted_keys = SortedKeys(sorted(self._key_to_ids))
+
+        return self._sorted_keys
+
+    def _table_ids(self, table, pos):
+        return self._key_ids(table.key(pos))
+
+    def _fuzzy_ids(self, key, max_dist, max_nodes):
+        """Get ids for the nearest keys within `max_dist` edits, or None.
+        """
+        table = self._key_table()
+
+        positions = fuzzy_search(table, table.encode(key), max_dist, max_nodes)
+
+        if not positions:
+            return None
+
+        ids = set()
+        for pos in positions:
+            ids.update(self._table_ids(table, pos))
+
+        return tuple(sorted(ids))
+
+    def _lookup_key(self, key):
+        """Exact ids for a key, with fuzzy fallback if enabled.
+        """
+        ids = self._key_ids(key)
+
+        if ids is None and self.fuzzy_dist:
+            ids = self._fuzzy_ids(key, self.fuzzy_dist, self.fuzzy_max_nodes)
+
+        return ids
+
     def __getitem__(self, text):
         """Get ids, map to records only if there is a match in the index
         """
-        if keyify(text) not in self._key_to_ids:
-            return None
+        if self.stats is not None:
+            return self._timed_getitem(text)
+
+        return self._ids_to_locs(self._lookup_key(keyify(text)))
+
+    def _timed_getitem(self, text):
+        start = perf_counter()
+
+        key = keyify(text)
+        locs = self._ids_to_locs(self._lookup_key(key))
+
+        self.stats.record(key, len(locs) if locs else 0, perf_counter()-start)
+
+        return locs
+
+    def enable_stats(self, sample_size=100):
+        """Count hits, misses, ambiguous hits and cache hits, time lookups,
+        and sample missed keys, in `__getitem__`, `lookup_many` and
+        `geocode_column`. When off, lookups just pay for one attribute check.
+
+        Args:
+            sample_size (int): Max missed keys to keep.
+
+        Returns: stats.LookupStats
+        """
+        self.stats = LookupStats(sample_size)
+        return self.stats
+
+    def disable_stats(self):
+        self.__dict__.pop('stats', None)
+
+    def fuzzy(self, text, max_dist=1, max_nodes=MAX_NODES):
+        """Look up a string; if there's no exact match, take the closest keys
+        within `max_dist` edits. Short strings are exact-only - 1 edit is
+        allowed from 3 characters, 2 from 6.
+
+        Args:
+            text (str)
+            max_dist (int): Max edits, usually 1-2.
+            max_nodes (int): Search budget, which bounds latency.
+
+        Returns: list of matches, or None
+        """
+        key = keyify(text)
+
+        ids = self._key_ids(key)
+
+        if ids is None:
+            ids = self._fuzzy_ids(key, max_dist, max_nodes)
+
+        return self._ids_to_locs(ids)
+
+    def keys(self):
+        return iter(self._key_to_ids)
+
+    def scanner(self):
+        """Free-text scanner over this index's keys. Built on first use.
+        """
+        if self._scanner is None:
+            self._scanner = Scanner([self])
+
+        return self._scanner
+
+    def extract(self, text):
+        """Find location mentions in free text - eg, "living in austin tx,
+        love bbq". Takes the longest non-overlapping keys, left to right.
+
+        Args:
+            text (str)
+
+        Returns: list of extract.Span
+        """
+        return self.scanner().extract(text)
+
+    def spatial(self):
+        """KD-tree over entity coordinates. Loaded from the saved index if
+        it has one, otherwise built on first use.
+
+        Returns: spatial.SpatialIndex
+        """
+        if self._spatial is None:
+
+            from .spatial import SpatialIndex
+
+            self._spatial = (
+                pickle.loads(self._spatial_pickle) if self._spatial_pickle
+                else SpatialIndex.from_store(self._store())
+            )
+
+        return self._spatial
+
+    def build_spatial(self):
+        """Build the KD-tree for `reverse`, and keep a serialized copy so
+        that it's saved with the index.
+        """
+        from .spatial import SpatialIndex
+
+        self._spatial = SpatialIndex.from_store(self._store())
+        self._spatial_pickle = pickle.dumps(self._spatial)
+
+    def reverse(self, lat, lon, k=1, max_km=None):
+        """Find the entities nearest to a point.
+
+        Args:
+            lat (float)
+            lon (float)
+            k (int): Max results.
+            max_km (float): Ignore entities farther than this.
+
+        Returns: list of (match, km) pairs, nearest first, or None
+        """
+        rows, km = self.spatial().query([lat], [lon], k, max_km)
+
+        res = [
+            (self.match_cls(self._entities, int(row)), float(dist))
+            for row, dist in zip(rows[0], km[0])
+            if row >= 0
+        ]
+
+        return res or None
+
+    def reverse_many(self, lats, lons, max_km=None, fields=()):
+        """Find the nearest entity to each of a column of points. See
+        `spatial.reverse_column`.
+        """
+        from .spatial import reverse_column
+        return reverse_column(self, lats, lons, max_km, fields)
+
+    def set_fuzzy(self, max_dist, max_nodes=MAX_NODES):
+        """Fall back to fuzzy search on exact misses, in `__getitem__`,
+        `lookup_many` and `geocode_column`.
+
+        Args:
+            max_dist (int): 0 turns fuzzy matching off.
+            max_nodes (int)
+        """
+        self.fuzzy_dist = max_dist
+        self.fuzzy_max_nodes = max_nodes
+        self._cache.clear()
+
+    def set_cache_size(self, size):
+        """Resize (and empty) the `lookup_many` cache.
+
+        Args:
+            size (int): Max cached strings. 0 disables the cache.
+        """
+        self.cache_size = size
+        self._cache = LRUCache(size)
+
+    def geocode_column(self, values, fields=()):
+        """Geocode a column of strings into NumPy arrays. See
+        `columnar.geocode_column`.
 
-        ids = self._key_to_ids[keyify(text)]
+        Args:
+            values (list, np.ndarray, pd.Series, pa.Array)
+            fields (iter): Extra numeric columns, eg `latitude`.
+
+        Returns: dict of np.ndarray
+        """
+        from .columnar import geocode_column
+        return geocode_column(self, values, fields)
+
+    def lookup_many(self, texts):
+        """Look up a batch of strings. Each distinct string is normalized at
+        most once, and ids are cached across batches.
+
+        Args:
+            texts (iter of str)
+
+        Returns: BatchLookup, with results in input order. Repeated inputs
+        share the same result list.
+        """
+        stats = self.stats
+
+        if stats is not None:
+            texts = list(texts)
+            start = perf_counter()
+
+        batch = dict()
+        results = []
+        hits = 0
+
+        for text in texts:
 
-        return [self._id_to_loc[id] for id in ids]
+            locs = batch.get(text, False)
+
+            if locs is False:
+
+                ids = self._cache.get(text, False)
+
+                if ids is False:
+                    ids = self._lookup_key(keyify(text))
+                    self._cache[text] = ids
+
+                else:
+                    hits += 1
+
+                locs = batch[text] = self._ids_to_locs(ids)
+
+            results.append(locs)
+
+        if stats is not None:
+            stats.record_batch(
+                texts, results, perf_counter()-start, hits, keyify,
+            )
+
+        return BatchLookup(results, hits, len(batch))
 
     def add_key(self, key, id):
         self._key_to_ids[key].add(id)
+        self._sorted_keys = None
+        self._scanner = None
+
+        # Cached ids could be stale.
+        if self._cache:
+            self._cache.clear()
+
+    def remove_key(self, key, id):
+        """Remove one key -> id mapping. The key is dropped if no ids are
+        left.
+        """
+        key_ids = self._key_to_ids.get(key)
+
+        if key_ids is not None:
+
+            key_ids.discard(id)
+
+            if not key_ids:
+                del self._key_to_ids[key]
+
+        self._sorted_keys = None
+        self._scanner = None
+        self._cache.clear()
+
+    def remove_keys(self, ids):
+        """Remove all key -> id mappings for a set of ids. Keys left with no
+        ids are dropped.
+
+        Args:
+            ids (set)
+        """
+        for key in list(self._key_to_ids):
+
+            key_ids = self._key_to_ids[key]
+            key_ids -= ids
+
+            if not key_ids:
+                del self._key_to_ids[key]
+
+        self._sorted_keys = None
+        self._scanner = None
+        self._cache.clear()
+
+    def remove_locations(self, ids):
+        """Drop metadata for a set of ids.
+        """
+        if self._entities is not None:
+            self._entities.remove(ids)
+
+        self._spatial = None
+        self._spatial_pickle = None
+
+    def add_location(self, row):
+        """Store metadata for an entity.
+
+        Args:
+            row (models.BaseModel)
+        """
+        self.add_entity(dict(row), row.store_columns())
+
+    def add_entity(self, data, columns):
+        """Store a metadata dict.
+
+        Args:
+            data (dict): Same shape as `dict(row)`.
+            columns (list): From `BaseModel.store_columns`.
+        """
+        if self._entities is None:
+            self._entities = EntityStore(columns)
 
-    def add_location(self, id, location):
-        self._id_to_loc[id] = location
+        self._entities.add(data)
+
+        # The KD-tree is stale.
+        self._spatial = None
+        self._spatial_pickle = None
 
     def locations(self):
-        return list(self._id_to_loc.values())
+        store = self._entities or ()
+        return [self.match_cls(store, row) for row in range(len(store))]
 
     def save(self, path):
         with open(path, 'wb') as fh:
             pickle.dump(self, fh)
 
+    @classmethod
+    def load_mmap(cls, path):
+        return MMapIndex(path)
+
+    def save_mmap(self, path):
+        """Write a memory-mapped copy of the index. See `MMapIndex`.
+        """
+        store = self._store()
+
+        key_to_rows = {
+            key: [store.row(id) for id in ids]
+            for key, ids in self._key_to_ids.items()
+        }
+
+        meta = dict(
+            index=self.__class__.__name__,
+            match=self.match_cls.__name__,
+        )
+
+        blobs = dict(spatial=self._spatial_pickle or b'')
+
+        write_index(path, key_to_rows, store, meta, blobs)
+
+
+class MMapIndex(Index):
+
+    def __init__(self, path):
+        """Read-only index over a file written by `Index.save_mmap`. Loading
+        is near-instant, and forked / separate processes share the pages.
+
+        Args:
+            path (str)
+        """
+        self.path = path
+        self._file = IndexFile(path)
+        self._entities = self._file.entities
+        self._cache = LRUCache(self.cache_size)
+        self._scanner = None
+        self._spatial = None
+        self._spatial_pickle = self._file.blob('spatial')
+
+        self.match_cls = MATCH_CLASSES[self._file.meta['match']]
+
+    def __reduce__(self):
+        """Pickle by path; the receiving process maps the file again.
+        """
+        return (self.__class__, (self.path,))
+
+    def __len__(self):
+        return self._file.num_keys
+
+    def __repr__(self):
+        return '%s<%s, %d keys, %d entities>' % (
+            self.__class__.__name__,
+            self._file.meta.get('index'),
+            self._file.num_keys,
+            self._file.num_entities,
+        )
+
+    def _key_ids(self, key):
+        """Get entity row numbers for a key.
+        """
+        pos = self._file.find(key)
+        return None if pos < 0 else tuple(self._file.ids(pos))
+
+    def _ids_to_rows(self, ids):
+        return list(ids)
+
+    def keys(self):
+        key = self._file.key
+        return (key(i).decode('utf8') for i in range(self._file.num_keys))
+
+    def _key_table(self):
+        return self._file
+
+    def _table_ids(self, table, pos):
+        return self._file.ids(pos)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('%s is read-only.' % self.__class__.__name__)
+
+    add_key = _read_only
+    remove_key = _read_only
+    remove_keys = _read_only
+    add_location = _read_only
+    add_entity = _read_only
+    remove_locations = _read_only
+    build_spatial = _read_only
+
+    def save(self, path):
+        raise TypeError('Use `Index.save` on the built index.')
+
+
+def build_state_path(path):
+    """Where the build state is saved, next to a city index pickle -
+    us-cities.p -> us-cities.state.p.
+    """
+    root, ext = os.path.splitext(path)
+    return root + '.state' + ext
+
 
 class USCityIndex(Index):
 
+    match_cls = CityMatch
+
     @classmethod
     def load(cls, path=US_CITY_PATH):
-        return super().load(path)
+        """Load an index. The build state stays on disk until `update` or
+        `rethreshold` needs it.
+        """
+        idx = super().load(path)
+        idx._state_path = build_state_path(path)
+        return idx
+
+    @classmethod
+    def load_mmap(cls, path=US_CITY_MMAP_PATH):
+        return super().load_mmap(path)
 
-    def __init__(self, bare_name_blocklist=None):
+    def __init__(self, bare_name_blocklist=None, min_p1_gap=200000):
         super().__init__()
         self.bare_name_blocklist = bare_name_blocklist
+        self.min_p1_gap = min_p1_gap
+        self._build_state = None
+        self._state_path = None
 
-    def build(self):
-        """Index all US cities.
+    def __getstate__(self):
+        """The build state is saved to its own file, in `save`, so that
+        lookup-only processes don't load it.
+        """
+        state = super().__getstate__()
+        state.pop('_build_state', None)
+        state.pop('_state_path', None)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._build_state = None
+        self._state_path = None
+
+    def save(self, path):
+        """Pickle the index, and the build state to `build_state_path`.
         """
-        allow_bare = AllowBareCityName(blocklist=self.bare_name_blocklist)
+        super().save(path)
+
+        state = self.build_state()
+
+        if state is not None:
+            with open(build_state_path(path), 'wb') as fh:
+                pickle.dump(state, fh)
+
+    def build(self, workers=1, name_pops=None):
+        """Index all US cities.
+
+        The locality table is read once, into plain dicts; populations are
+        sorted per name up front; then keys are generated across `workers`
+        processes and merged.
+
+        Args:
+            workers (int)
+            name_pops (build_state.NamePopulations): A saved name -> populations
+                table, instead of building one.
 
-        iter_keys = CityKeyIter(allow_bare)
+        Returns: pipeline.Timings, seconds per stage
+        """
+        from .models import WOFLocality
+        from .pipeline import Timings, CityTable, generate_keys
+        from .build_state import BuildState
 
-        # Deduped cities.
-        cities = WOFLocality.clean_us_cities()
+        timings = Timings()
 
         logger.info('Indexing US cities.')
 
-        for row in tqdm(cities):
+        with timings.stage('extract'):
+            table = CityTable(
+                min_p1_gap=self.min_p1_gap,
+                blocklist=self.bare_name_blocklist,
+                name_pops=name_pops,
+            )
 
-            # Key -> id(s)
-            for key in map(keyify, iter_keys(row)):
-                self.add_key(key, row.wof_id)
+        with timings.stage('bare names'):
+            inputs = table.key_inputs()
+
+        with timings.stage('keys'):
+            key_ids = generate_keys(inputs, workers)
+
+        with timings.stage('merge'):
+            for key, ids in key_ids.items():
+                self._key_to_ids[key].update(ids)
+
+        self._sorted_keys = None
+        self._scanner = None
+        self._cache.clear()
+
+        with timings.stage('entities'):
+
+            columns = WOFLocality.store_columns()
+
+            for data, _ in table.cities:
+                self.add_entity(data, columns)
+
+        with timings.stage('spatial'):
+            self.build_spatial()
+
+        with timings.stage('fingerprints'):
+            self._build_state = BuildState.from_table(
+                table, table.fingerprints(),
+            )
+
+        return timings
+
+    def build_state(self):
+        """Returns: build_state.BuildState, or None if the index was built
+        without one.
+        """
+        if self._build_state is None and self._state_path:
+
+            if os.path.exists(self._state_path):
+                with open(self._state_path, 'rb') as fh:
+                    self._build_state = pickle.load(fh)
+
+        return self._build_state
+
+    def update(self):
+        """Patch the index to match the database, the alt-names YAML and the
+        blocklist, without a full rebuild. Cities are re-keyed if their own
+        fingerprint changed, or if they have a name whose bare-name test could
+        have flipped; metadata is only re-stored for changed cities.
+
+        Returns: (re-keyed, removed) counts
+        """
+        from .models import WOFLocality
+        from .pipeline import CityTable, generate_keys
+        from .build_state import BuildState
+
+        state = self.build_state()
+
+        if state is None:
+            raise ValueError('No build state; run a full `build`.')
+
+        logger.info('Finding changed US cities.')
+
+        table = CityTable(
+            min_p1_gap=self.min_p1_gap,
+            blocklist=self.bare_name_blocklist,
+        )
+
+        names = state.changed_names(table)
+
+        # Every bare-name test could change.
+        rekey_all = state.min_p1_gap != table.min_p1_gap
+
+        fingerprints = table.fingerprints()
+
+        rekey, changed = [], []
+
+        for data, city_names in table.cities:
+
+            wof_id = data['wof_id']
+
+            if state.fingerprints.get(wof_id) != fingerprints[wof_id]:
+                changed.append(data)
 
-            # ID -> city
-            self.add_location(row.wof_id, CityMatch(row))
+            elif not rekey_all and names.isdisjoint(map(keyify, city_names)):
+                continue
+
+            rekey.append((data, city_names))
+
+        removed = state.fingerprints.keys() - fingerprints.keys()
+
+        logger.info('Re-keying %d cities, removing %d.' % (
+            len(rekey), len(removed),
+        ))
+
+        self.remove_keys(removed | {data['wof_id'] for data, _ in rekey})
+        self.remove_locations(removed)
+
+        key_ids = generate_keys(table.key_inputs(rekey))
+
+        for key, ids in key_ids.items():
+            for id in ids:
+                self.add_key(key, id)
+
+        columns = WOFLocality.store_columns()
+
+        for data in changed:
+            self.add_entity(data, columns)
+
+        if rekey or removed:
+            self.build_spatial()
+
+        self._build_state = BuildState.from_table(table, fingerprints)
+
+        return len(rekey), len(removed)
+
+    def rethreshold(self, min_p1_gap=None, blocklist=None):
+        """Re-run the bare-name test under new parameters, against the saved
+        name -> populations table, and rewrite just the bare name and bare
+        name + USA keys that flip. Doesn't touch the database.
+
+        Args:
+            min_p1_gap (int): Defaults to the current value.
+            blocklist (iter): Bare-name blocklist. Defaults to the current
+                one.
+
+        Returns: int, number of re-keyed cities.
+        """
+        from .utils import state_abbr
+
+        state = self.build_state()
+
+        if state is None:
+            raise ValueError('No build state; run a full `build`.')
+
+        if min_p1_gap is None:
+            min_p1_gap = state.min_p1_gap
+
+        if blocklist is None:
+            new_blocklist = state.blocklist
+        else:
+            new_blocklist = set(map(keyify, blocklist))
+
+        name_pops = state.name_pops
+
+        rekeyed = 0
+
+        for match in self.locations():
+
+            data = match.data
+            names = state.names.get(data.wof_id)
+
+            if names is None:
+                continue
+
+            old_bare, new_bare = [
+                [n for n in names if name_pops.allow_bare(
+                    n, data.population, gap, blocked,
+                )]
+                for gap, blocked in (
+                    (state.min_p1_gap, state.blocklist),
+                    (min_p1_gap, new_blocklist),
+                )
+            ]
+
+            if old_bare == new_bare:
+                continue
+
+            state_names = [
+                n for n in (data.name_a1, state_abbr(data.name_a1)) if n
+            ]
+
+            old_keys, new_keys = [
+                set(map(keyify, city_keys(names, bare, state_names)))
+                for bare in (old_bare, new_bare)
+            ]
+
+            for key in old_keys - new_keys:
+                self.remove_key(key, data.wof_id)
+
+            for key in new_keys - old_keys:
+                self.add_key(key, data.wof_id)
+
+            rekeyed += 1
+
+        logger.info('Re-keyed %d cities.' % rekeyed)
+
+        state.min_p1_gap = min_p1_gap
+        state.blocklist = new_blocklist
+
+        # So that `update` keeps the new parameters.
+        self.min_p1_gap = min_p1_gap
+
+        if blocklist is not None:
+            self.bare_name_blocklist = blocklist
+
+        return rekeyed
 
 
 class USStateIndex(Index):
 
+    match_cls = StateMatch
+
     @classmethod
     def load(cls, path=US_STATE_PATH):
         return super().load(path)
 
+    @classmethod
+    def load_mmap(cls, path=US_STATE_MMAP_PATH):
+        return super().load_mmap(path)
+
     def build(self):
         """Index all US states.
         """
+        from tqdm import tqdm
+        from .models import WOFRegion
+
         states = WOFRegion.query.filter(WOFRegion.country_iso=='US')
 
         logger.info('Indexing US states.')
@@ -287,4 +1100,6 @@ class USStateIndex(Index):
                 self.add_key(key, row.wof_id)
 
             # ID -> state
-            self.add_location(row.wof_id, StateMatch(row))
+            self.add_location(row)
+
+        self.build_spatial()
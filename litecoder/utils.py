@@ -1,6 +1,9 @@
 
 
-import ujson
+import threading
+
+from collections import OrderedDict
+from functools import lru_cache
 
 
 class safe_property:
@@ -36,6 +39,74 @@ def first(*seq):
     return next((x for x in seq if x is not None), None)
 
 
+@lru_cache()
+def state_abbr(name):
+    """US state name -> abbreviation, or None.
+    """
+    import us
+
+    try:
+        return us.states.lookup(name).abbr
+    except Exception:
+        return None
+
+
+def loads_json(text):
+    import ujson  # Only needed on the ingest path.
+    return ujson.loads(text)
+
+
 def read_json(path):
     with open(path) as fh:
-        return ujson.load(fh)
+        return loads_json(fh.read())
+
+
+class LRUCache:
+
+    def __init__(self, maxsize):
+        """Bounded mapping that evicts the least-recently-used key. Safe to
+        share across threads.
+
+        Args:
+            maxsize (int): Max number of keys. 0 disables the cache.
+        """
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Get a value, marking it as recently used.
+        """
+        with self._lock:
+
+            try:
+                value = self._data[key]
+            except KeyError:
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        """Set a value, evicting the oldest key when full.
+        """
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+
+            self._data[key] = value
+            self._data.move_to_end(key)
+
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
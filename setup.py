@@ -8,6 +8,7 @@ PACKAGE_DATA = {
         'data/*.db',
         'data/*.yml',
         'data/*.p',
+        'data/*.idx',
     ]
 }
 
@@ -17,11 +18,9 @@ INSTALL_REQUIRES = [
     'SQLAlchemy',
     'us',
     'boltons',
-    'cached-property',
     'tqdm',
     'attrs',
     'ujson',
-    'python-box',
     'PyYAML',
 ]
 
@@ -49,4 +48,7 @@ setup(
     classifiers=CLASSIFIERS,
     install_requires=INSTALL_REQUIRES,
     package_data=PACKAGE_DATA,
+    entry_points={
+        'console_scripts': ['litecoder=litecoder.cli:main'],
+    },
 )
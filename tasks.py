@@ -1,14 +1,20 @@
 
 
+import os
 import pytest
+import shlex
 
 from invoke import task
 from subprocess import call
 
 from litecoder.db import engine
-from litecoder import logger, US_STATE_PATH, US_CITY_PATH
+from litecoder import (
+    logger, US_STATE_PATH, US_CITY_PATH, US_STATE_MMAP_PATH, US_CITY_MMAP_PATH,
+    US_CITY_NAME_POPS_PATH, US_GEOCODER_PATH,
+)
 from litecoder.models import BaseModel, WOFLocality
 from litecoder.usa import USStateIndex, USCityIndex
+from litecoder.geocoder import Geocoder
 
 from litecoder.sources.wof import (
     WOFRegionRepo, WOFCountyRepo, WOFLocalityRepo
@@ -37,17 +43,26 @@ def reset_db(c):
 
 
 @task(reset_db)
-def load_db(c):
+def load_db(c, countries=None, sqlite=None):
     """Load SQLite tables.
-    """
-    logger.info('Loading regions.')
-    WOFRegionRepo.from_env().load_db()
 
-    logger.info('Loading counties.')
-    WOFCountyRepo.from_env().load_db()
+    Args:
+        countries (str): Comma-separated ISO codes - only load docs from
+            these countries.
+        sqlite (str): Load everything from one WOF SQLite distribution,
+            instead of per-placetype directories / bundles in DATA_DIR.
+    """
+    if countries:
+        countries = countries.split(',')
 
-    logger.info('Loading localities.')
-    WOFLocalityRepo.from_env().load_db()
+    for name, repo_cls in (
+        ('regions', WOFRegionRepo),
+        ('counties', WOFCountyRepo),
+        ('localities', WOFLocalityRepo),
+    ):
+        repo = repo_cls(sqlite) if sqlite else repo_cls.from_env()
+        logger.info('Loading %s from %s.' % (name, repo.root))
+        repo.bulk_load(countries=countries)
 
 
 @task
@@ -55,22 +70,95 @@ def clean_db(c):
     """Database post-processing.
     """
     logger.info('Cleaning localities.')
-    WOFLocality.dedupe()
+    WOFLocality.dedupe(workers=os.cpu_count())
+
+
+def save_geocoder(city_idx, state_idx):
+    """Merge the city + state keys, for `Geocoder`.
+    """
+    logger.info('Merging city + state keys.')
+    Geocoder([city_idx, state_idx]).save(US_GEOCODER_PATH)
 
 
 @task
-def build_indexes(c):
+def build_indexes(c, workers=1):
     """Build dist indexes.
+
+    Args:
+        workers (int): Processes for city key generation.
     """
     logger.info('Indexing states.')
     state_idx = USStateIndex()
     state_idx.build()
     state_idx.save(US_STATE_PATH)
+    state_idx.save_mmap(US_STATE_MMAP_PATH)
 
     logger.info('Indexing cities.')
     city_idx = USCityIndex()
-    city_idx.build()
+    timings = city_idx.build(workers=int(workers))
+    logger.info('City index stages: %s' % timings)
+    city_idx.save(US_CITY_PATH)
+    city_idx.save_mmap(US_CITY_MMAP_PATH)
+    city_idx.build_state().name_pops.save(US_CITY_NAME_POPS_PATH)
+
+    save_geocoder(city_idx, state_idx)
+
+
+@task
+def update_indexes(c):
+    """Patch the city index with changed localities / alt names.
+    """
+    logger.info('Updating cities.')
+    city_idx = USCityIndex.load()
+    city_idx.update()
+    city_idx.save(US_CITY_PATH)
+    city_idx.save_mmap(US_CITY_MMAP_PATH)
+
+    save_geocoder(city_idx, USStateIndex.load())
+
+
+@task
+def rethreshold_cities(c, min_p1_gap=None, blocklist=None):
+    """Re-run the bare-name test on the city index, without the database.
+
+    Args:
+        min_p1_gap (int)
+        blocklist (str): Comma-separated names.
+    """
+    city_idx = USCityIndex.load()
+
+    city_idx.rethreshold(
+        int(min_p1_gap) if min_p1_gap else None,
+        blocklist.split(',') if blocklist is not None else None,
+    )
+
     city_idx.save(US_CITY_PATH)
+    city_idx.save_mmap(US_CITY_MMAP_PATH)
+
+    save_geocoder(city_idx, USStateIndex.load())
+
+
+@task
+def benchmark(c, filter=None, repeat=None, output=None):
+    """Run the benchmark suite, save results as JSON.
+
+    Args:
+        filter (str): Regex on benchmark names.
+        repeat (int): Samples per benchmark.
+        output (str): Default: benchmarks/results/<commit>.json
+    """
+    cmd = ['python benchmarks/suite.py run']
+
+    if filter:
+        cmd.append('--filter %s' % shlex.quote(filter))
+
+    if repeat:
+        cmd.append('--repeat %s' % repeat)
+
+    if output:
+        cmd.append('--output %s' % output)
+
+    c.run(' '.join(cmd), env=dict(PYTHONPATH='.'))
 
 
 @task(build_indexes)
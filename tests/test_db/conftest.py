@@ -5,7 +5,7 @@ import os
 
 os.environ['LITECODER_ENV'] = 'test'
 
-from litecoder.db import engine, session
+from litecoder.db import engine
 from litecoder.models import BaseModel
 from litecoder.usa import USCityIndex, USStateIndex
 
@@ -31,3 +31,21 @@ def load_db(reset_db):
     WOFRegionRepo(REGION_DIR).load_db()
     WOFCountyRepo(COUNTY_DIR).load_db()
     WOFLocalityRepo(LOCALITY_DIR).load_db()
+
+
+@pytest.fixture(scope='module')
+def city_idx(load_db):
+    """Build a city index from the fixtures.
+    """
+    idx = USCityIndex()
+    idx.build()
+    return idx
+
+
+@pytest.fixture(scope='module')
+def state_idx(load_db):
+    """Build a state index from the fixtures.
+    """
+    idx = USStateIndex()
+    idx.build()
+    return idx
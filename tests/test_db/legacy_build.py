@@ -0,0 +1,83 @@
+"""The original row-by-row city keying, which scanned the locality table
+through the ORM for every build. Kept as a reference for
+`litecoder.pipeline`.
+"""
+
+from collections import defaultdict
+from tqdm import tqdm
+
+from litecoder import logger
+from litecoder.models import WOFLocality
+from litecoder.usa import keyify, city_keys
+
+
+class CityNamePopulations(defaultdict):
+
+    def __init__(self):
+        """Index name -> [pops], using median pop if no metadata.
+        """
+        super().__init__(list)
+
+        logger.info('Indexing name -> populations.')
+
+        median_pop = WOFLocality.median_population()
+
+        for row in tqdm(WOFLocality.query):
+            for name in row.names:
+                self[keyify(name)].append(row.population or median_pop)
+
+    def __getitem__(self, text):
+        return super().__getitem__(keyify(text))
+
+
+class AllowBareCityName:
+
+    def __init__(self, min_p1_gap=200000, blocklist=None):
+        self.name_pops = CityNamePopulations()
+        self.min_p1_gap = min_p1_gap
+        self.blocklist = set(map(keyify, blocklist or []))
+
+    def blocked(self, name):
+        return keyify(name) in self.blocklist
+
+    def large_p1_gap(self, row, name):
+        """Get the difference in population between this city and the second-
+        most-populous city with the name. Allow if over threshold.
+        """
+        all_pops = sorted(self.name_pops[name], reverse=True)
+        pop = row.population or 0
+        return pop - sum(all_pops[1:]) > self.min_p1_gap
+
+    def __call__(self, row, name):
+        """Is a name unique enough that it should be indexed independently?
+
+        Args:
+            row (models.WOFLocality)
+            name (str)
+
+        Returns: bool
+        """
+        return not self.blocked(name) and self.large_p1_gap(row, name)
+
+
+class CityKeyIter:
+
+    def __init__(self, allow_bare):
+        self.allow_bare = allow_bare
+
+    def __call__(self, row):
+        """Enumerate index keys for a city.
+
+        Args:
+            row (db.Locality)
+
+        Yields: str
+        """
+        names = row.names
+
+        bare_names = [n for n in names if self.allow_bare(row, n)]
+
+        # Get non-empty state names.
+        state_names = [n for n in (row.name_a1, row.us_state_abbr) if n]
+
+        yield from city_keys(names, bare_names, state_names)
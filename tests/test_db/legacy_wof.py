@@ -0,0 +1,281 @@
+"""The original exception-driven WOF doc classes, kept as a reference for
+the compiled field specs in `litecoder.sources.wof`.
+"""
+
+from collections import UserDict
+
+from litecoder.utils import safe_property, first
+
+
+class WOFDoc(UserDict):
+
+    @safe_property
+    def wof_id(self):
+        return self['id']
+
+    def _wof_hierarchy_id(self, key):
+        """Get WOF hierarchy id, if unique.
+        """
+        ids = set([
+            h['%s_id' % key]
+            for h in self['properties']['wof:hierarchy']
+        ])
+
+        # TODO: Handle 2+ links.
+        # Punt when more than one link.
+        if len(ids) == 1:
+            id = list(ids)[0]
+            return id if id > 0 else None
+
+    @safe_property
+    def wof_continent_id(self):
+        return self._wof_hierarchy_id('continent')
+
+    @safe_property
+    def wof_country_id(self):
+        return self._wof_hierarchy_id('country')
+
+    @safe_property
+    def wof_region_id(self):
+        return self._wof_hierarchy_id('region')
+
+    @safe_property
+    def wof_county_id(self):
+        return self._wof_hierarchy_id('county')
+
+    @safe_property
+    def dbp_id(self):
+        return self['properties']['wof:concordances']['dbp:id']
+
+    @safe_property
+    def fb_id(self):
+        return self['properties']['wof:concordances']['fb:id']
+
+    @safe_property
+    def fct_id(self):
+        return self['properties']['wof:concordances']['fct:id']
+
+    @safe_property
+    def fips_code(self):
+        return self['properties']['wof:concordances']['fips:code']
+
+    @safe_property
+    def gn_id(self):
+        return self['properties']['wof:concordances']['gn:id']
+
+    @safe_property
+    def gp_id(self):
+        return self['properties']['wof:concordances']['gp:id']
+
+    @safe_property
+    def hasc_id(self):
+        return self['properties']['wof:concordances']['hasc:id']
+
+    @safe_property
+    def iso_id(self):
+        return self['properties']['wof:concordances']['iso:id']
+
+    @safe_property
+    def unlc_id(self):
+        return self['properties']['wof:concordances']['unlc:id']
+
+    @safe_property
+    def loc_id(self):
+        return self['properties']['wof:concordances']['loc:id']
+
+    @safe_property
+    def nyt_id(self):
+        return self['properties']['wof:concordances']['nyt:id']
+
+    @safe_property
+    def qs_id(self):
+        return self['properties']['wof:concordances']['qs:id']
+
+    @safe_property
+    def qs_pg_id(self):
+        return self['properties']['wof:concordances']['qs_pg:id']
+
+    @safe_property
+    def wd_id(self):
+        return self['properties']['wof:concordances']['wd:id']
+
+    @safe_property
+    def wk_page(self):
+        return self['properties']['wof:concordances']['wk:page']
+
+    @safe_property
+    def country_iso(self):
+        return self['properties']['iso:country']
+
+    @safe_property
+    def _gn_latitude(self):
+        return self['properties']['gn:latitude']
+
+    @safe_property
+    def _geom_latitude(self):
+        return self['properties']['geom:latitude']
+
+    @safe_property
+    def latitude(self):
+        return first(
+            self._gn_latitude,
+            self._geom_latitude,
+        )
+
+    @safe_property
+    def _gn_longitude(self):
+        return self['properties']['gn:longitude']
+
+    @safe_property
+    def _geom_longitude(self):
+        return self['properties']['geom:longitude']
+
+    @safe_property
+    def longitude(self):
+        return first(
+            self._gn_longitude,
+            self._geom_longitude,
+        )
+
+    @safe_property
+    def _gn_population(self):
+        return self['properties']['gn:population']
+
+    @safe_property
+    def _wof_population(self):
+        return self['properties']['wof:population']
+
+    @safe_property
+    def _wk_population(self):
+        return self['properties']['wk:population']
+
+    @safe_property
+    def population(self):
+        return first(
+            self._gn_population,
+            self._wof_population,
+            self._wk_population,
+        )
+
+    @safe_property
+    def area_m2(self):
+        return self['properties']['geom:area_square_m']
+
+    @safe_property
+    def _name_eng_x_preferred(self):
+        return self['properties']['name:eng_x_preferred'][0]
+
+    @safe_property
+    def _wof_name(self):
+        return self['properties']['wof:name']
+
+    @safe_property
+    def _qs_pg_name(self):
+        return self['properties']['qs_pg:name']
+
+    @safe_property
+    def name(self):
+        return first(
+            self._name_eng_x_preferred,
+            self._wof_name,
+            self._qs_pg_name,
+        )
+
+    @safe_property
+    def _qs_a0(self):
+        return self['properties']['qs:a0']
+
+    @safe_property
+    def _qs_adm0(self):
+        return self['properties']['qs:adm0']
+
+    @safe_property
+    def _ne_sov0name(self):
+        return self['properties']['ne:SOV0NAME']
+
+    @safe_property
+    def _qs_pg_name_adm0(self):
+        return self['properties']['qs_pg:name_adm0']
+
+    @safe_property
+    def _woe_name_adm0(self):
+        return self['properties']['woe:name_adm0']
+
+    @safe_property
+    def name_a0(self):
+        return first(
+            self._qs_a0,
+            self._qs_adm0,
+            self._ne_sov0name,
+            self._qs_pg_name_adm0,
+            self._woe_name_adm0,
+        )
+
+    @safe_property
+    def _qs_a1(self):
+        return self['properties']['qs:a1'].strip('*')
+
+    @safe_property
+    def _ne_adm1name(self):
+        return self['properties']['ne:ADM1NAME']
+
+    @safe_property
+    def _qs_pg_name_adm1(self):
+        return self['properties']['qs_pg:name_adm1']
+
+    @safe_property
+    def _woe_name_adm1(self):
+        return self['properties']['woe:name_adm1']
+
+    @safe_property
+    def name_a1(self):
+        return first(
+            self._qs_a1,
+            self._ne_adm1name,
+            self._qs_pg_name_adm1,
+            self._woe_name_adm1,
+        )
+
+
+class WOFRegionDoc(WOFDoc):
+
+    @safe_property
+    def _abrv_eng_x_preferred(self):
+        return self['properties']['abrv:eng_x_preferred'][0]
+
+    @safe_property
+    def _wof_abbreviation(self):
+        return self['properties']['wof:abbreviation']
+
+    @safe_property
+    def name_abbr(self):
+        return first(
+            self._abrv_eng_x_preferred,
+            self._wof_abbreviation,
+        )
+
+
+class WOFCountyDoc(WOFDoc):
+    pass
+
+
+class WOFLocalityDoc(WOFDoc):
+
+    @safe_property
+    def wikipedia_wordcount(self):
+        return self['properties']['wk:wordcount']
+
+    @safe_property
+    def _gn_elevation(self):
+        return self['properties']['gn:elevation']
+
+    @safe_property
+    def _ne_elevation(self):
+        return self['properties']['ne:ELEVATION']
+
+    @safe_property
+    def elevation(self):
+        return first(
+            self._gn_elevation,
+            self._ne_elevation,
+        )
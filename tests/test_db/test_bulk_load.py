@@ -0,0 +1,108 @@
+
+
+import pytest
+
+from litecoder.db import engine, session
+from litecoder.models import BaseModel, WOFRegion, WOFCounty, WOFLocality
+
+from litecoder.sources.wof import (
+    WOFRegionRepo, WOFCountyRepo, WOFLocalityRepo
+)
+
+from . import REGION_DIR, COUNTY_DIR, LOCALITY_DIR
+
+
+MODELS = (WOFRegion, WOFCounty, WOFLocality)
+
+
+def snapshot():
+    """All rows in all tables, as dicts.
+    """
+    return {
+        model.__tablename__: sorted(
+            (dict(row) for row in session.query(model)),
+            key=lambda r: r['wof_id'],
+        )
+        for model in MODELS
+    }
+
+
+def reset_tables():
+    session.remove()
+    BaseModel.metadata.drop_all(engine)
+    BaseModel.metadata.create_all(engine)
+
+
+@pytest.fixture(scope='module')
+def orm_rows(reset_db):
+
+    WOFRegionRepo(REGION_DIR).load_db()
+    WOFCountyRepo(COUNTY_DIR).load_db()
+    WOFLocalityRepo(LOCALITY_DIR).load_db()
+
+    rows = snapshot()
+
+    reset_tables()
+
+    return rows
+
+
+def test_same_rows(orm_rows):
+
+    assert WOFRegionRepo(REGION_DIR).bulk_load() == len(orm_rows['wof_region'])
+    assert WOFCountyRepo(COUNTY_DIR).bulk_load() == len(orm_rows['wof_county'])
+    assert WOFLocalityRepo(LOCALITY_DIR).bulk_load(n=2) == \
+        len(orm_rows['wof_locality'])
+
+    assert snapshot() == orm_rows
+
+
+def test_indexes_and_pragmas(orm_rows):
+    """Secondary indexes should exist after loading, and the connection
+    settings should be put back.
+    """
+    reset_tables()
+
+    with engine.connect() as conn:
+        synchronous = conn.execute('pragma synchronous').scalar()
+
+    WOFLocalityRepo(LOCALITY_DIR).bulk_load()
+
+    with engine.connect() as conn:
+
+        names = {
+            row[1] for row in
+            conn.execute('pragma index_list(wof_locality)')
+        }
+
+        assert conn.execute('pragma synchronous').scalar() == synchronous
+
+    assert {i.name for i in WOFLocality.__table__.indexes} <= names
+
+
+@pytest.mark.parametrize('repo_cls,root', [
+    (WOFRegionRepo, REGION_DIR),
+    (WOFCountyRepo, COUNTY_DIR),
+    (WOFLocalityRepo, LOCALITY_DIR),
+])
+def test_worker_values(repo_cls, root):
+    """Rows extracted in workers should match in-process extraction.
+    """
+    repo = repo_cls(root)
+
+    expected = [
+        repo.doc_cls.from_path(path).db_values()
+        for path in repo.paths_iter()
+    ]
+
+    values = list(repo.db_values_iter(num_procs=2, batch_size=1))
+
+    assert sorted(values, key=repr) == sorted(expected, key=repr)
+
+
+def test_filter_countries():
+
+    repo = WOFLocalityRepo(LOCALITY_DIR)
+
+    assert len(list(repo.db_values_iter(countries=['US']))) == 3
+    assert list(repo.db_values_iter(countries=['CA'])) == []
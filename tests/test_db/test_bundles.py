@@ -0,0 +1,147 @@
+
+
+import pytest
+import os
+import shutil
+import sqlite3
+import tarfile
+
+from litecoder.sources.bundles import (
+    DirSource, TarSource, SQLiteSource, open_source, find_source
+)
+
+from litecoder.sources.stream import pipeline_iter
+from litecoder.sources.wof import (
+    WOFRegionRepo, WOFCountyRepo, WOFLocalityRepo
+)
+
+from . import FIXTURES_DIR
+
+
+REPOS = (
+    (WOFRegionRepo, 'wof-region'),
+    (WOFCountyRepo, 'wof-county'),
+    (WOFLocalityRepo, 'wof-locality'),
+)
+
+
+def values(repo, **kwargs):
+    return sorted(repo.db_values_iter(num_procs=2, **kwargs), key=repr)
+
+
+@pytest.fixture(scope='module')
+def bundles(tmp_path_factory):
+    """Tar bundles for each placetype, and one SQLite distribution with all
+    of them, an alt geometry, and a row of another placetype.
+    """
+    root = tmp_path_factory.mktemp('bundles')
+
+    db_path = str(root / 'wof.db')
+
+    conn = sqlite3.connect(db_path)
+    conn.execute('create table geojson (id int, body text, is_alt bool)')
+    conn.execute('create table spr (id int, placetype text)')
+
+    for repo_cls, name in REPOS:
+
+        repo = repo_cls(os.path.join(FIXTURES_DIR, name))
+
+        for ext, mode in (('.tar.gz', 'w:gz'), ('.tar.bz2', 'w:bz2')):
+            with tarfile.open(str(root / (name + ext)), mode) as tar:
+                tar.add(repo.root, arcname=name)
+
+        for path in repo.paths_iter():
+
+            with open(path) as fh:
+                body = fh.read()
+
+            wof_id = int(os.path.basename(path).split('.')[0])
+
+            conn.execute('insert into geojson values (?, ?, 0)',
+                (wof_id, body))
+
+            conn.execute('insert into geojson values (?, ?, 1)',
+                (wof_id, '{"id": %d, "properties": {}}' % wof_id))
+
+            conn.execute('insert into spr values (?, ?)',
+                (wof_id, repo.placetype))
+
+    conn.execute('insert into geojson values (1, ?, 0)',
+        ('{"id": 1, "properties": {}}',))
+
+    conn.execute("insert into spr values (1, 'neighbourhood')")
+
+    conn.commit()
+    conn.close()
+
+    return root
+
+
+@pytest.mark.parametrize('repo_cls,name', REPOS)
+@pytest.mark.parametrize('ext', ['.tar.gz', '.tar.bz2'])
+def test_tar(bundles, repo_cls, name, ext):
+
+    expected = values(repo_cls(os.path.join(FIXTURES_DIR, name)))
+
+    assert values(repo_cls(str(bundles / (name + ext)))) == expected
+
+
+@pytest.mark.parametrize('repo_cls,name', REPOS)
+def test_sqlite(bundles, repo_cls, name):
+
+    expected = values(repo_cls(os.path.join(FIXTURES_DIR, name)))
+
+    repo = repo_cls(str(bundles / 'wof.db'))
+
+    assert values(repo, batch_size=1) == expected
+
+
+def test_sqlite_path_quoting(bundles, tmp_path):
+    """Paths with URI syntax in them should still open.
+    """
+    path = str(tmp_path / 'wof ?#%25.db')
+    shutil.copy(str(bundles / 'wof.db'), path)
+
+    repo = WOFLocalityRepo(path)
+
+    assert values(repo) == values(
+        WOFLocalityRepo(os.path.join(FIXTURES_DIR, 'wof-locality')),
+    )
+
+
+def test_full_docs(bundles):
+
+    docs = list(WOFLocalityRepo(str(bundles / 'wof-locality.tar.gz'))
+        .docs_iter(num_procs=2))
+
+    assert len(docs) == 3
+    assert all('geometry' in doc for doc in docs)
+
+
+def test_open_source(bundles):
+
+    assert isinstance(open_source(str(bundles)), DirSource)
+    assert isinstance(open_source(str(bundles / 'wof.db')), SQLiteSource)
+
+    assert isinstance(
+        open_source(str(bundles / 'wof-region.tar.bz2')),
+        TarSource,
+    )
+
+    with pytest.raises(ValueError):
+        open_source(str(bundles / 'wof.csv'))
+
+    assert find_source(str(bundles / 'wof-county')) == \
+        str(bundles / 'wof-county.tar.gz')
+
+
+def fail(batch):
+    raise ValueError('bad batch')
+
+
+def test_pipeline_error():
+
+    with pytest.raises(RuntimeError) as e:
+        list(pipeline_iter(lambda: iter([[1], [2]]), fail, 2))
+
+    assert 'bad batch' in str(e.value)
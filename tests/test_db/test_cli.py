@@ -0,0 +1,174 @@
+
+
+import pytest
+import csv
+import json
+
+from types import SimpleNamespace
+
+from litecoder import cli
+
+
+@pytest.fixture(scope='module')
+def index_args(city_idx, state_idx, tmpdir_factory):
+    """Save the fixture indexes, return CLI args that point at them.
+    """
+    root = tmpdir_factory.mktemp('cli')
+
+    city_path = str(root.join('us-cities.idx'))
+    state_path = str(root.join('us-states.p'))
+
+    city_idx.save_mmap(city_path)
+    state_idx.save(state_path)
+
+    return ['--city-index', city_path, '--state-index', state_path]
+
+
+QUERIES = ['Boston, MA', 'xyz', 'Massachusetts', 'Tuscaloosa, AL', '']
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_csv(index_args, tmpdir, workers):
+
+    in_path = str(tmpdir.join('in.csv'))
+    out_path = str(tmpdir.join('out.csv'))
+
+    with open(in_path, 'w', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['id', 'location'])
+        for i, query in enumerate(QUERIES * 5):
+            writer.writerow([i, query])
+
+    cli.main([
+        'geocode', in_path, '-c', 'location', '-o', out_path,
+        '-w', str(workers), '--chunk-size', '2', *index_args,
+    ])
+
+    with open(out_path, newline='') as fh:
+        rows = list(csv.DictReader(fh))
+
+    # Order is stable.
+    assert [int(r['id']) for r in rows] == list(range(len(QUERIES) * 5))
+
+    boston, miss, mass, tusc, empty = rows[:5]
+
+    assert boston['geo_wof_id'] == '85950361'
+    assert boston['geo_state'] == 'MA'
+    assert boston['geo_type'] == 'city'
+
+    assert miss['geo_wof_id'] == ''
+
+    assert mass['geo_wof_id'] == '85688645'
+    assert mass['geo_type'] == 'state'
+
+    assert tusc['geo_name'] == 'Tuscaloosa'
+    assert float(tusc['geo_lat']) == pytest.approx(33.20984)
+
+    assert empty['geo_wof_id'] == ''
+
+
+def test_ragged_csv(index_args, tmpdir):
+    """Rows with more or fewer fields than the header should still be
+    written; extra values go after the geo fields.
+    """
+    in_path = str(tmpdir.join('in.csv'))
+    out_path = str(tmpdir.join('out.csv'))
+
+    with open(in_path, 'w', newline='') as fh:
+        fh.write('id,location\n1,Boston MA,extra,fields\n2\n')
+
+    cli.main(['geocode', in_path, '-c', 'location', '-o', out_path,
+        *index_args])
+
+    with open(out_path, newline='') as fh:
+        rows = list(csv.reader(fh))
+
+    header, boston, short = rows
+
+    assert header[:2] == ['id', 'location']
+    assert len(short) == len(header)
+
+    assert boston[:3] == ['1', 'Boston MA', '85950361']
+    assert boston[len(header):] == ['extra', 'fields']
+
+    assert short[:3] == ['2', '', '']
+
+
+def test_csv_missing_column(index_args, tmpdir, capsys):
+
+    in_path = str(tmpdir.join('in.csv'))
+
+    with open(in_path, 'w', newline='') as fh:
+        fh.write('id,location\n1,Boston MA\n')
+
+    with pytest.raises(SystemExit) as e:
+        cli.main(['geocode', in_path, '-c', 'locaton', *index_args])
+
+    assert e.value.code == 2
+    assert 'Column "locaton" not in the input' in capsys.readouterr().err
+
+
+def test_jsonl(index_args, tmpdir):
+
+    in_path = str(tmpdir.join('in.jsonl'))
+    out_path = str(tmpdir.join('out.jsonl'))
+
+    with open(in_path, 'w') as fh:
+        for query in QUERIES:
+            fh.write(json.dumps(dict(loc=query, x=1)) + '\n')
+
+    cli.main([
+        'geocode', in_path, '-c', 'loc', '-o', out_path,
+        '--prefix', 'lc_', *index_args,
+    ])
+
+    with open(out_path) as fh:
+        rows = [json.loads(line) for line in fh]
+
+    assert len(rows) == len(QUERIES)
+    assert rows[0]['x'] == 1
+    assert rows[0]['lc_wof_id'] == 85950361
+    assert rows[1]['lc_wof_id'] is None
+
+
+def test_jsonl_missing_column(index_args, tmpdir, capsys):
+
+    in_path = str(tmpdir.join('in.jsonl'))
+    out_path = str(tmpdir.join('out.jsonl'))
+
+    with open(in_path, 'w') as fh:
+        fh.write('{"loc": "Boston, MA"}\n{"x": 1}\n\n{"x": 2}\n')
+
+    cli.main(['geocode', in_path, '-c', 'loc', '-o', out_path, *index_args])
+
+    assert '2 rows have no "loc" field. Lines: 2, 4' in capsys.readouterr().err
+
+    with open(out_path) as fh:
+        assert len(fh.readlines()) == 3
+
+
+def test_jsonl_not_object(index_args, tmpdir, capsys):
+
+    in_path = str(tmpdir.join('in.jsonl'))
+    out_path = str(tmpdir.join('out.jsonl'))
+
+    with open(in_path, 'w') as fh:
+        fh.write('{"loc": "Boston, MA"}\n[1, 2]\n')
+
+    with pytest.raises(SystemExit):
+        cli.main(['geocode', in_path, '-c', 'loc', '-o', out_path,
+            *index_args])
+
+    assert 'Line 2: expected a JSON object, got list.' in \
+        capsys.readouterr().err
+
+
+def test_city_state_abbr():
+    """Cities without a region should still get an abbreviated state.
+    """
+    data = SimpleNamespace(
+        wof_id=1, name='Boston', region=None, name_a1='Massachusetts',
+        latitude=0, longitude=0,
+    )
+
+    assert cli.city_fields(SimpleNamespace(data=data))[2] == 'MA'
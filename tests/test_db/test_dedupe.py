@@ -0,0 +1,123 @@
+
+
+import pytest
+import random
+
+from scipy.spatial import cKDTree
+
+from litecoder.db import session
+from litecoder.models import WOFLocality
+from litecoder.models.wof_locality import ID_COLS
+
+
+COUNTY_IDS = (102085553, 102087579, 1)
+
+REGION_IDS = (85688637, 85688645, 85688675, 1)
+
+# One big name group, for the KD-tree path, and lots of small ones.
+NAMES = ('A',) * 20 + tuple('BCDEFGHIJKLMNOPQRSTUVWXYZ') + (None,)
+
+
+def random_row(wof_id):
+    """A locality that shares ids with others, with random gaps.
+    """
+    row = dict(
+        wof_id=wof_id,
+        wof_county_id=random.choice(COUNTY_IDS),
+        wof_region_id=random.choice(REGION_IDS),
+        name=random.choice(NAMES),
+        population=random.choice((100, None)),
+        latitude=40 + random.random(),
+        longitude=-70 + random.random(),
+    )
+
+    for name in ID_COLS:
+        if random.random() < 0.5:
+            row[name] = '%s-%d' % (name, random.randrange(20))
+
+    return row
+
+
+@pytest.fixture(scope='module')
+def localities(load_db):
+
+    random.seed(1)
+
+    rows = [random_row(i) for i in range(1, 501)]
+
+    # Exact ties.
+    rows += [dict(rows[0], wof_id=i) for i in range(1001, 1004)]
+
+    session.bulk_insert_mappings(WOFLocality, rows)
+    session.commit()
+
+
+def dupe_ids():
+    return {
+        r.wof_id for r in
+        WOFLocality.query.filter(WOFLocality.duplicate==True)
+    }
+
+
+def reset_dupes():
+    WOFLocality.query.update({WOFLocality.duplicate: False})
+    session.commit()
+
+
+def test_same_as_orm(localities):
+
+    for name in ID_COLS:
+        WOFLocality.dedupe_id_col(name)
+
+    orm_dupes = dupe_ids()
+
+    reset_dupes()
+
+    count = WOFLocality.dedupe_id_cols()
+
+    assert count == len(orm_dupes)
+    assert dupe_ids() == orm_dupes
+
+    # Ties go to the lowest id.
+    assert {1001, 1002, 1003} <= orm_dupes
+
+    reset_dupes()
+
+
+def test_scores(localities):
+
+    scores = dict(list(session.execute(WOFLocality.score_table().select())))
+
+    assert scores == {r.wof_id: r.field_count for r in WOFLocality.query}
+
+    session.rollback()
+
+
+def legacy_proximity_dupes(buffer):
+    """The old global KD-tree + ORM rows version.
+    """
+    rows = WOFLocality.query.all()
+
+    idx = cKDTree([[r.longitude, r.latitude] for r in rows])
+
+    dupes = set()
+    for i, j in idx.query_pairs(buffer):
+
+        row1, row2 = rows[i], rows[j]
+
+        if row1.name == row2.name:
+            dupes.add(row1.wof_id if row1.field_count < row2.field_count
+                else row2.wof_id)
+
+    return dupes
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_proximity_same_as_legacy(localities, workers):
+
+    legacy_dupes = legacy_proximity_dupes(0.1)
+
+    assert WOFLocality.dedupe_proximity(0.1, workers) == len(legacy_dupes)
+    assert dupe_ids() == legacy_dupes
+
+    reset_dupes()
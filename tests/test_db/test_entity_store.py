@@ -0,0 +1,84 @@
+
+
+import pytest
+import pickle
+
+from litecoder.models import WOFLocality, WOFRegion
+from litecoder.store import EntityStore, infer_columns
+from litecoder.usa import CityMatch
+
+
+pytestmark = pytest.mark.usefixtures('load_db')
+
+
+@pytest.mark.parametrize('model,idx', [
+    (WOFLocality, 'city_idx'),
+    (WOFRegion, 'state_idx'),
+])
+def test_round_trip(model, idx, request):
+    """Stored metadata should match the database rows.
+    """
+    idx = request.getfixturevalue(idx)
+
+    for match in idx.locations():
+        row = model.query.get(match.data.wof_id)
+        assert match.data.to_dict() == dict(row)
+
+
+def test_attribute_access(city_idx):
+
+    boston = city_idx['Boston, MA'][0]
+
+    assert boston.data.name == 'Boston'
+    assert boston.data['name'] == 'Boston'
+    assert boston.data.region.name_abbr == 'MA'
+    assert boston.data.get('xyz', 1) == 1
+
+    with pytest.raises(AttributeError):
+        boston.data.xyz
+
+
+def test_interned_strings(city_idx):
+    """Shared strings should be stored once.
+    """
+    strings = city_idx._entities.strings.strings
+    assert strings.count('United States') == 1
+
+
+def test_overflow():
+    """Values that don't fit the column type should round-trip.
+    """
+    store = EntityStore(infer_columns([dict(wof_id=1, population=1)]))
+
+    store.add(dict(wof_id=1, population=1))
+    store.add(dict(wof_id=2, population='n/a'))
+    store.add(dict(wof_id=3, population=2**70))
+
+    assert store.to_dict(0) == dict(wof_id=1, population=1)
+    assert store.to_dict(1) == dict(wof_id=2, population='n/a')
+    assert store.to_dict(2) == dict(wof_id=3, population=2**70)
+
+
+def test_replace():
+    """Adding an existing id should overwrite the row.
+    """
+    store = EntityStore(infer_columns([dict(wof_id=1, name='a')]))
+
+    store.add(dict(wof_id=1, name='a'))
+    store.add(dict(wof_id=1, name='b'))
+
+    assert len(store) == 1
+    assert store.to_dict(0) == dict(wof_id=1, name='b')
+
+
+def test_pickle_match(city_idx):
+    """Pickling a match should only carry its own entity.
+    """
+    boston = city_idx['Boston, MA'][0]
+
+    copy = pickle.loads(pickle.dumps(boston))
+
+    assert isinstance(copy, CityMatch)
+    assert copy == boston
+    assert copy.data.to_dict() == boston.data.to_dict()
+    assert len(copy._store) == 1
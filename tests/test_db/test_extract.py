@@ -0,0 +1,96 @@
+
+
+from litecoder.extract import Scanner, tokenize
+
+
+def test_tokenize():
+
+    text = 'Living in St. Louis, MO!! (near D.C.)'
+
+    tokens = list(tokenize(text))
+
+    assert [t for _, _, t in tokens] == \
+        ['living', 'in', 'st', 'louis', 'mo', 'near', 'dc']
+
+    assert [text[s:e] for s, e, _ in tokens] == \
+        ['Living', 'in', 'St', 'Louis', 'MO', 'near', 'D.C.']
+
+
+def test_spans(city_idx):
+
+    text = 'Living in Boston, MA - and Tuscaloosa al.'
+
+    spans = city_idx.extract(text)
+
+    assert [s.text for s in spans] == ['Boston, MA', 'Tuscaloosa al']
+    assert [s.key for s in spans] == ['boston ma', 'tuscaloosa al']
+    assert [s.wof_ids for s in spans] == [[85950361], [85914453]]
+
+    for span in spans:
+        assert text[span.start:span.end] == span.text
+
+
+def test_longest_match(city_idx):
+    """Take the longest key, not a shorter key it starts with.
+    """
+    spans = city_idx.extract('from boston massachusetts usa')
+
+    assert [s.key for s in spans] == ['boston massachusetts usa']
+
+
+def test_no_overlaps(city_idx):
+
+    spans = city_idx.extract('boston boston ma nyc')
+
+    assert [s.key for s in spans] == ['boston', 'boston ma', 'nyc']
+
+
+def test_matches_lookup(city_idx):
+    """Each span should have the same matches as a direct lookup.
+    """
+    for span in city_idx.extract('I <3 NYC and Boston!'):
+        assert span.matches == city_idx[span.text]
+
+
+def test_no_mentions(city_idx):
+    assert city_idx.extract('nothing to see here') == []
+    assert city_idx.extract('') == []
+
+
+def test_cities_and_states(city_idx, state_idx):
+    """Merge key sets; keys in both indexes get matches from each.
+    """
+    scanner = Scanner([city_idx, state_idx])
+
+    spans = scanner.extract('Tuscaloosa, Alabama; then California')
+
+    assert [s.key for s in spans] == ['tuscaloosa alabama', 'california']
+    assert spans[0].wof_ids == [85914453]
+    assert spans[1].wof_ids == [85688637]
+
+
+def test_mmap(city_idx, tmpdir):
+
+    path = str(tmpdir.join('us-cities.idx'))
+    city_idx.save_mmap(path)
+
+    mm_idx = city_idx.load_mmap(path)
+
+    text = 'Living in Boston, MA - and Tuscaloosa al.'
+
+    assert [s.wof_ids for s in mm_idx.extract(text)] == \
+        [s.wof_ids for s in city_idx.extract(text)]
+
+
+def test_new_keys(city_idx):
+    """The scanner should be rebuilt after keys are added.
+    """
+    idx = city_idx.__class__()
+    idx._key_to_ids.update(city_idx._key_to_ids)
+    idx._entities = city_idx._entities
+
+    assert idx.extract('zzzville') == []
+
+    idx.add_key('zzzville', 85950361)
+
+    assert idx.extract('zzzville')[0].wof_ids == [85950361]
@@ -0,0 +1,192 @@
+
+
+import pytest
+import random
+
+from litecoder import fuzzy
+from litecoder.usa import USCityIndex
+
+
+def osa_distance(a, b):
+    """Reference edit distance, with adjacent transpositions.
+    """
+    d = [[i+j if not i*j else 0 for j in range(len(b)+1)]
+         for i in range(len(a)+1)]
+
+    for i in range(1, len(a)+1):
+        for j in range(1, len(b)+1):
+
+            d[i][j] = min(
+                d[i-1][j] + 1,
+                d[i][j-1] + 1,
+                d[i-1][j-1] + (a[i-1] != b[j-1]),
+            )
+
+            if i > 1 and j > 1 and a[i-1] == b[j-2] and a[i-2] == b[j-1]:
+                d[i][j] = min(d[i][j], d[i-2][j-2] + 1)
+
+    return d[-1][-1]
+
+
+@pytest.mark.parametrize('query', [
+    'bostn',
+    'bostonn',
+    'bsoton',
+    'tuscalosa',
+    'xyz',
+    'ab',
+    '',
+])
+@pytest.mark.parametrize('max_dist', [1, 2])
+def test_search_matches_brute_force(query, max_dist):
+    """Search should return exactly the nearest keys within the limit.
+    """
+    keys = sorted([
+        'boston', 'bostons', 'austin', 'tuscaloosa', 'tuscola', 'ab', 'abc',
+        'xy', 'xyzzy', 'boise',
+    ])
+
+    table = fuzzy.SortedKeys(keys)
+
+    limit = min(max_dist, fuzzy.auto_dist(len(query)))
+
+    dists = [osa_distance(query, k) for k in keys]
+    best = min(d for d in dists)
+
+    expected = [i for i, d in enumerate(dists) if 0 < best == d <= limit]
+
+    assert sorted(fuzzy.search(table, query, max_dist)) == expected
+
+
+def test_search_random_keys():
+
+    rand = random.Random(1)
+
+    keys = sorted({
+        ''.join(rand.choices('abcde', k=rand.randint(3, 8)))
+        for _ in range(500)
+    })
+
+    table = fuzzy.SortedKeys(keys)
+    key_set = set(keys)
+
+    for _ in range(200):
+
+        query = ''.join(rand.choices('abcde', k=rand.randint(3, 8)))
+
+        if query in key_set:
+            continue
+
+        dists = [osa_distance(query, k) for k in keys]
+        best = min(dists)
+        limit = fuzzy.auto_dist(len(query))
+
+        expected = [i for i, d in enumerate(dists) if best == d <= limit]
+
+        assert sorted(fuzzy.search(table, query, 2, 10**9)) == expected
+
+
+def test_node_budget():
+    """With a tiny budget, the 2-edit search should give up. 1 edit is a
+    fixed number of lookups, with no budget.
+    """
+    keys = sorted('key%d' % i for i in range(1000))
+    table = fuzzy.SortedKeys(keys)
+
+    assert keys.index('key999') in fuzzy.search(table, 'kez9z9', 2, 10**9)
+    assert fuzzy.search(table, 'kez9z9', 2, 3) == []
+
+    assert fuzzy.search(table, 'kez999', 2, 3) == [keys.index('key999')]
+
+
+def test_transposition():
+    table = fuzzy.SortedKeys(['boston'])
+    assert fuzzy.search(table, 'bsoton', 1) == [0]
+
+
+@pytest.mark.parametrize('query', [
+    'Bostn, MA',
+    'bostn massachusetts',
+    'Boston, Masachusetts',
+])
+def test_misspelled_city(city_idx, query):
+
+    assert city_idx[query] is None
+
+    res = city_idx.fuzzy(query, 2)
+
+    assert [m.data.wof_id for m in res] == [85950361]
+
+
+def test_misspelled_name(city_idx):
+
+    res = city_idx.fuzzy('tuscalosa al')
+
+    assert [m.data.wof_id for m in res] == [85914453]
+
+
+def test_exact_first(city_idx):
+    """Exact matches should win, even if other keys are 1 edit away.
+    """
+    assert city_idx.fuzzy('Boston, MA') == city_idx['Boston, MA']
+
+
+def test_short_queries_exact_only(city_idx):
+    assert city_idx.fuzzy('bo', 2) is None
+
+
+def test_miss(city_idx):
+    assert city_idx.fuzzy('qwertyuiop', 2) is None
+
+
+def test_set_fuzzy(city_idx):
+    """Plain lookups should fall back to fuzzy search once it's enabled.
+    """
+    assert city_idx['tuscalosa al'] is None
+    assert city_idx.lookup_many(['tuscalosa al'])[0] is None
+
+    city_idx.set_fuzzy(1)
+
+    try:
+        assert city_idx['tuscalosa al'][0].data.wof_id == 85914453
+        assert city_idx.lookup_many(['tuscalosa al'])[0][0].data.wof_id == \
+            85914453
+
+    finally:
+        city_idx.set_fuzzy(0)
+
+    assert city_idx['tuscalosa al'] is None
+
+
+def test_new_keys(city_idx):
+    """The sorted key table should be rebuilt after keys are added.
+    """
+    idx = USCityIndex()
+    idx._key_to_ids.update(city_idx._key_to_ids)
+    idx._entities = city_idx._entities
+
+    assert idx.fuzzy('zzzzzzzz') is None
+
+    idx.add_key('zzzzzzzy', 85950361)
+
+    assert idx.fuzzy('zzzzzzzz')[0].data.wof_id == 85950361
+
+
+def test_mmap(city_idx, tmpdir):
+    """Memory-mapped indexes should give the same fuzzy matches.
+    """
+    path = str(tmpdir.join('us-cities.idx'))
+    city_idx.save_mmap(path)
+
+    mm_idx = USCityIndex.load_mmap(path)
+
+    for query in ('Bostn, MA', 'tuscalosa al', 'bo', 'qwertyuiop'):
+
+        res = city_idx.fuzzy(query, 2)
+        mm_res = mm_idx.fuzzy(query, 2)
+
+        if res is None:
+            assert mm_res is None
+        else:
+            assert sorted(m.data.wof_id for m in res) == \
+                sorted(m.data.wof_id for m in mm_res)
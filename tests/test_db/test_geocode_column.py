@@ -0,0 +1,125 @@
+
+
+import pytest
+import pickle
+import numpy as np
+
+from litecoder.columnar import NO_MATCH, factorize
+from litecoder.store import INT_NULL
+from litecoder.usa import USCityIndex
+
+
+VALUES = ['Boston, MA', 'xyz', None, 'boston ma', 'Tuscaloosa, AL', 'xyz']
+
+
+def check_result(res):
+
+    assert res['wof_id'].tolist() == [
+        85950361, NO_MATCH, NO_MATCH, 85950361, 85914453, NO_MATCH,
+    ]
+
+    assert res['count'].tolist() == [1, 0, 0, 1, 1, 0]
+
+    lat = res['latitude']
+    assert lat[0] == pytest.approx(42.317974, 0.001)
+    assert np.isnan(lat[1])
+
+    pop = res['population']
+    assert pop.dtype == np.int64
+    assert pop[1] == INT_NULL
+
+
+@pytest.mark.parametrize('wrap', [list, lambda v: np.array(v, dtype=object)])
+def test_geocode_column(city_idx, wrap):
+    res = city_idx.geocode_column(wrap(VALUES), ('latitude', 'population'))
+    check_result(res)
+
+
+def test_mmap(city_idx, tmpdir):
+    path = str(tmpdir.join('us-cities.idx'))
+    city_idx.save_mmap(path)
+    mm_idx = city_idx.load_mmap(path)
+    check_result(mm_idx.geocode_column(VALUES, ('latitude', 'population')))
+
+
+def test_pandas(city_idx):
+    pd = pytest.importorskip('pandas')
+    res = city_idx.geocode_column(pd.Series(VALUES), ('latitude', 'population'))
+    check_result(res)
+
+
+def test_arrow(city_idx):
+    pa = pytest.importorskip('pyarrow')
+    values = pa.chunked_array([VALUES[:3], VALUES[3:]])
+    res = city_idx.geocode_column(values, ('latitude', 'population'))
+    check_result(res)
+
+
+def test_ambiguous(city_idx):
+    """Keys with 2+ matches should get the sentinel id.
+    """
+    city_idx.add_key('twin', 85950361)
+    city_idx.add_key('twin', 85914453)
+
+    res = city_idx.geocode_column(['twin'])
+
+    assert res['wof_id'].tolist() == [NO_MATCH]
+    assert res['count'].tolist() == [2]
+
+    del city_idx._key_to_ids['twin']
+
+
+def test_factorize_fallback(monkeypatch):
+    """Without pandas, factorize with a dict.
+    """
+    import builtins
+
+    real_import = builtins.__import__
+
+    def no_pandas(name, *args, **kwargs):
+        if name == 'pandas':
+            raise ImportError
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, '__import__', no_pandas)
+
+    codes, uniques = factorize(['a', None, 'b', 'a'])
+
+    assert codes.tolist() == [0, -1, 1, 0]
+    assert uniques == ['a', 'b']
+
+
+def test_unbuilt():
+
+    with pytest.raises(ValueError):
+        USCityIndex().geocode_column(VALUES)
+
+
+def test_fuzzy(city_idx):
+    """Misses should fall back to fuzzy search, as in `lookup_many`.
+    """
+    idx = pickle.loads(pickle.dumps(city_idx))
+
+    assert idx.geocode_column(['tuscalosa al'])['count'].tolist() == [0]
+
+    idx.set_fuzzy(1)
+
+    res = idx.geocode_column(['tuscalosa al'])
+    assert res['wof_id'].tolist() == [85914453]
+
+
+def test_stats(city_idx):
+    """Non-null inputs should be counted, as in `lookup_many`.
+    """
+    idx = pickle.loads(pickle.dumps(city_idx))
+    stats = idx.enable_stats()
+
+    idx.geocode_column(VALUES)
+
+    snap = stats.snapshot()
+
+    assert snap['lookups'] == 5
+    assert snap['hits'] == 3
+    assert snap['misses'] == 2
+    assert set(snap['missed_keys']) == {'xyz'}
+    assert snap['latency']['batch']['count'] == 1
@@ -0,0 +1,125 @@
+
+
+import pytest
+
+from litecoder.geocoder import Geocoder
+from litecoder.store import infer_columns
+from litecoder.usa import Index, CityMatch, StateMatch
+
+
+@pytest.fixture(scope='module')
+def geocoder(city_idx, state_idx):
+    return Geocoder([city_idx, state_idx])
+
+
+def test_best(geocoder):
+
+    boston = geocoder.best('Boston, MA')
+
+    assert isinstance(boston, CityMatch)
+    assert boston.data.wof_id == 85950361
+
+    ca = geocoder.best('california')
+
+    assert isinstance(ca, StateMatch)
+    assert ca.data.wof_id == 85688637
+
+    assert geocoder.best('xyz') is None
+    assert geocoder['xyz'] is None
+
+
+def test_same_keys(geocoder, city_idx, state_idx):
+    """Every key resolves to the union of the city + state matches.
+    """
+    keys = set(city_idx.keys()) | set(state_idx.keys())
+
+    assert set(geocoder.keys()) == keys
+    assert len(geocoder) == len(keys)
+
+    for key in keys:
+
+        expected = (city_idx[key] or []) + (state_idx[key] or [])
+
+        assert sorted(geocoder[key], key=repr) == sorted(expected, key=repr)
+
+
+def make_index(match_cls, rows, keys):
+    """An index over metadata dicts, with key -> wof ids.
+    """
+    idx = Index()
+    idx.match_cls = match_cls
+
+    columns = infer_columns(rows)
+
+    for row in rows:
+        idx.add_entity(row, columns)
+
+    for key, ids in keys.items():
+        for id in ids:
+            idx.add_key(key, id)
+
+    return idx
+
+
+@pytest.fixture
+def ranked():
+
+    cities = make_index(CityMatch, [
+        dict(wof_id=1, name='Springfield', population=100),
+        dict(wof_id=2, name='Springfield', population=None),
+        dict(wof_id=3, name='Springfield', population=5000),
+        dict(wof_id=4, name='Georgia', population=10),
+    ], dict(springfield=[1, 2, 3], georgia=[4]))
+
+    states = make_index(StateMatch, [
+        dict(wof_id=10, name='Georgia', population=10000000),
+    ], dict(georgia=[10]))
+
+    return Geocoder([cities, states])
+
+
+def test_population_order(ranked):
+
+    assert [m.data.wof_id for m in ranked['Springfield']] == [3, 1, 2]
+    assert ranked.best('springfield').data.wof_id == 3
+
+
+def test_index_order(ranked):
+    """Earlier indexes come first, regardless of population.
+    """
+    assert [m.data.wof_id for m in ranked['Georgia']] == [4, 10]
+    assert isinstance(ranked.best('Georgia'), CityMatch)
+
+
+def test_save_load(geocoder, tmpdir):
+
+    path = str(tmpdir.join('geocoder.p'))
+
+    geocoder.save(path)
+
+    loaded = Geocoder.load(path)
+
+    assert len(loaded) == len(geocoder)
+    assert loaded.best('Boston, MA') == geocoder.best('Boston, MA')
+    assert loaded.best('Tuscaloosa, AL').data.name == 'Tuscaloosa'
+
+
+def test_mmap_indexes(city_idx, state_idx, tmpdir):
+
+    city_path = str(tmpdir.join('cities.idx'))
+    state_path = str(tmpdir.join('states.idx'))
+
+    city_idx.save_mmap(city_path)
+    state_idx.save_mmap(state_path)
+
+    geocoder = Geocoder([
+        city_idx.load_mmap(city_path),
+        state_idx.load_mmap(state_path),
+    ])
+
+    assert geocoder.best('Boston, MA').data.wof_id == 85950361
+    assert geocoder.best('California').data.wof_id == 85688637
+
+
+def test_repr(geocoder):
+    assert 'USCityIndex + USStateIndex' in repr(geocoder)
@@ -0,0 +1,79 @@
+
+
+import pytest
+import glob
+import json
+import os
+
+from litecoder.sources.geojson import read_members, read_feature
+from litecoder.sources.wof import WOFLocalityRepo
+from litecoder.utils import read_json
+
+from . import FIXTURES_DIR, LOCALITY_DIR
+
+
+PATHS = glob.glob(os.path.join(FIXTURES_DIR, '*/*.geojson'))
+
+
+@pytest.mark.parametrize('path', PATHS)
+@pytest.mark.parametrize('chunk_size', [1, 100, 1 << 16])
+def test_same_as_full_parse(path, chunk_size):
+
+    doc = read_json(path)
+
+    members = read_members(path, ('id', 'properties'), chunk_size)
+
+    assert members == dict(id=doc['id'], properties=doc['properties'])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 100, 1 << 16])
+def test_skip_leading_members(tmp_path, chunk_size):
+    """Members before the ones we want get skipped, including strings with
+    brackets and escapes.
+    """
+    doc = {
+        'geometry': {
+            'type': 'Polygon',
+            'coordinates': [[[float(i), float(i)] for i in range(5000)]],
+            'note': 'a "quoted" ]} string \\',
+        },
+        'bbox': [1, 2, 3, 4],
+        'type': 'Feature',
+        'properties': {'wof:name': 'Boston', 'x': [{}, []]},
+        'id': 1,
+        'after': [1, 2],
+    }
+
+    path = str(tmp_path / 'doc.geojson')
+
+    with open(path, 'w') as fh:
+        json.dump(doc, fh, indent=2)
+
+    assert read_members(path, ('id', 'properties', 'missing'), chunk_size) \
+        == dict(id=1, properties=doc['properties'])
+
+    assert read_members(path, ('geometry',), chunk_size) == \
+        dict(geometry=doc['geometry'])
+
+
+def test_invalid(tmp_path):
+
+    path = str(tmp_path / 'doc.geojson')
+
+    with open(path, 'w') as fh:
+        fh.write('{"type": "Feature", "properties": {"a": ')
+
+    with pytest.raises(ValueError):
+        read_feature(path)
+
+
+def test_repo_modes():
+
+    values = [
+        sorted(repo.db_values_iter(), key=repr) for repo in (
+            WOFLocalityRepo(LOCALITY_DIR, skip_geometry=True),
+            WOFLocalityRepo(LOCALITY_DIR, skip_geometry=False),
+        )
+    ]
+
+    assert values[0] == values[1]
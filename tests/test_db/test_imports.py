@@ -0,0 +1,49 @@
+
+
+import subprocess
+import sys
+import os
+import json
+
+import litecoder
+
+
+HEAVY = ('sqlalchemy', 'numpy', 'scipy', 'yaml', 'tqdm', 'ujson', 'us')
+
+
+SCRIPT = '''
+import sys, json
+from litecoder.usa import USCityIndex
+
+pickle_idx = USCityIndex.load(sys.argv[1])
+mmap_idx = USCityIndex.load_mmap(sys.argv[2])
+
+print(json.dumps(dict(
+    pickle=pickle_idx['Boston, MA'][0].data.wof_id,
+    mmap=mmap_idx['Boston, MA'][0].data.wof_id,
+    modules=[m for m in %r if m in sys.modules],
+)))
+''' % (HEAVY,)
+
+
+def test_lookup_imports(city_idx, tmpdir):
+    """Loading + querying prebuilt indexes shouldn't import build deps.
+    """
+    pickle_path = str(tmpdir.join('us-cities.p'))
+    mmap_path = str(tmpdir.join('us-cities.idx'))
+
+    city_idx.save(pickle_path)
+    city_idx.save_mmap(mmap_path)
+
+    root = os.path.dirname(os.path.dirname(litecoder.__file__))
+
+    out = subprocess.check_output(
+        [sys.executable, '-c', SCRIPT, pickle_path, mmap_path],
+        cwd=root,
+    )
+
+    res = json.loads(out.decode().strip().splitlines()[-1])
+
+    assert res['pickle'] == 85950361
+    assert res['mmap'] == 85950361
+    assert res['modules'] == []
@@ -0,0 +1,89 @@
+
+
+import pickle
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+
+from litecoder.usa import BatchLookup
+
+
+def test_input_order(city_idx):
+    """Results should line up with the inputs.
+    """
+    texts = ['Boston, MA', 'Tuscaloosa, AL', 'xyz', 'boston ma']
+
+    res = city_idx.lookup_many(texts)
+
+    assert isinstance(res, BatchLookup)
+    assert len(res) == len(texts)
+
+    for text, locs in zip(texts, res):
+        assert locs == city_idx[text]
+
+
+def test_counts(city_idx):
+    """Report distinct strings + LRU hits.
+    """
+    city_idx.set_cache_size(10)
+
+    res = city_idx.lookup_many(['Boston', 'Boston', 'NYC', 'xyz'])
+
+    assert res.distinct_inputs == 3
+    assert res.cache_hits == 0
+
+    res = city_idx.lookup_many(['Boston', 'Tuscaloosa, AL'])
+
+    assert res.distinct_inputs == 2
+    assert res.cache_hits == 1
+
+
+def test_cache_eviction(city_idx):
+    """Least-recently-used strings should be evicted.
+    """
+    city_idx.set_cache_size(1)
+
+    city_idx.lookup_many(['Boston'])
+    city_idx.lookup_many(['NYC'])
+
+    assert city_idx.lookup_many(['Boston']).cache_hits == 0
+    assert city_idx.lookup_many(['Boston']).cache_hits == 1
+
+
+def test_state_idx(state_idx):
+    res = state_idx.lookup_many(['Massachusetts', 'xyz'])
+    assert res[0][0].data.wof_id == 85688645
+    assert res[1] is None
+
+
+def test_pickle_drops_cache(city_idx):
+    """The cache shouldn't be serialized, but should exist after loading.
+    """
+    city_idx.lookup_many(['Boston'])
+
+    idx = pickle.loads(pickle.dumps(city_idx))
+
+    assert len(idx._cache) == 0
+    assert idx.lookup_many(['Boston'])[0] is not None
+
+
+def test_shared_cache_threads(city_idx):
+    """Threads sharing an index shouldn't trip over each other's evictions.
+    """
+    idx = pickle.loads(pickle.dumps(city_idx))
+    idx.set_cache_size(2)
+
+    texts = ['Boston', 'Boston, MA', 'Tuscaloosa', 'xyz', 'NYC']
+
+    def work(i):
+        for j in range(500):
+            idx.lookup_many(texts[(i + j) % len(texts):])
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(work, range(8)))
+    finally:
+        sys.setswitchinterval(interval)
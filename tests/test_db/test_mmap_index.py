@@ -0,0 +1,114 @@
+
+
+import pytest
+import pickle
+
+from litecoder.usa import USCityIndex, USStateIndex, MMapIndex
+
+
+@pytest.fixture(scope='module')
+def mmap_paths(city_idx, state_idx, tmpdir_factory):
+    """Write mmap copies of the fixture indexes.
+    """
+    root = tmpdir_factory.mktemp('mmap')
+
+    city_path = str(root.join('us-cities.idx'))
+    state_path = str(root.join('us-states.idx'))
+
+    city_idx.save_mmap(city_path)
+    state_idx.save_mmap(state_path)
+
+    return city_path, state_path
+
+
+def assert_same_results(idx, mm_idx, query):
+
+    res = idx[query]
+    mm_res = mm_idx[query]
+
+    if res is None:
+        assert mm_res is None
+        return
+
+    res = sorted(res, key=lambda m: m.data.wof_id)
+    mm_res = sorted(mm_res, key=lambda m: m.data.wof_id)
+
+    assert [m.data.to_dict() for m in res] == \
+        [m.data.to_dict() for m in mm_res]
+
+    assert [m._pk for m in res] == [m._pk for m in mm_res]
+
+
+def test_city_keys(city_idx, mmap_paths):
+    """Every key should give the same matches as the pickle index.
+    """
+    mm_idx = USCityIndex.load_mmap(mmap_paths[0])
+
+    assert len(mm_idx) == len(city_idx)
+
+    for key in list(city_idx._key_to_ids) + ['xyz', '', 'boston m']:
+        assert_same_results(city_idx, mm_idx, key)
+
+
+def test_state_keys(state_idx, mmap_paths):
+
+    mm_idx = USStateIndex.load_mmap(mmap_paths[1])
+
+    for key in list(state_idx._key_to_ids) + ['xyz']:
+        assert_same_results(state_idx, mm_idx, key)
+
+
+def test_normalize(mmap_paths):
+
+    mm_idx = USCityIndex.load_mmap(mmap_paths[0])
+
+    assert mm_idx['  BOSTON,   MA  '][0].data.wof_id == 85950361
+    assert mm_idx['Boston, MA'][0].data.region.name_abbr == 'MA'
+
+
+def test_lookup_many(city_idx, mmap_paths):
+
+    mm_idx = USCityIndex.load_mmap(mmap_paths[0])
+
+    res = mm_idx.lookup_many(['Boston', 'xyz', 'Boston'])
+
+    assert res[0][0].data.wof_id == 85950361
+    assert res[1] is None
+    assert res.distinct_inputs == 2
+
+
+def test_pickle(mmap_paths):
+    """Pickling should just re-map the file.
+    """
+    mm_idx = USCityIndex.load_mmap(mmap_paths[0])
+
+    copy = pickle.loads(pickle.dumps(mm_idx))
+
+    assert isinstance(copy, MMapIndex)
+    assert copy.path == mm_idx.path
+    assert copy['Boston'][0].data.wof_id == 85950361
+
+
+@pytest.mark.parametrize('method,args', [
+    ('add_key', ('boston', 1)),
+    ('remove_key', ('boston', 0)),
+    ('remove_keys', ({0},)),
+    ('add_location', (None,)),
+    ('add_entity', ({}, [])),
+    ('remove_locations', ({0},)),
+    ('build_spatial', ()),
+])
+def test_read_only(mmap_paths, method, args):
+
+    mm_idx = USCityIndex.load_mmap(mmap_paths[0])
+
+    with pytest.raises(TypeError, match='read-only'):
+        getattr(mm_idx, method)(*args)
+
+    assert mm_idx['Boston'][0].data.wof_id == 85950361
+
+
+def test_save_unbuilt(tmpdir):
+
+    with pytest.raises(ValueError):
+        USCityIndex().save_mmap(str(tmpdir.join('empty.idx')))
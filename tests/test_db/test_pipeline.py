@@ -0,0 +1,57 @@
+
+
+import pytest
+
+from collections import defaultdict
+
+from litecoder.models import WOFLocality
+from litecoder.usa import USCityIndex, keyify
+
+from .legacy_build import AllowBareCityName, CityKeyIter
+
+
+@pytest.fixture(scope='module')
+def row_keys(load_db):
+    """Keys + metadata from the row-by-row ORM path.
+    """
+    iter_keys = CityKeyIter(AllowBareCityName())
+
+    key_ids = defaultdict(set)
+    entities = dict()
+
+    for row in WOFLocality.clean_us_cities():
+
+        for key in map(keyify, iter_keys(row)):
+            key_ids[key].add(row.wof_id)
+
+        entities[row.wof_id] = dict(row)
+
+    return dict(key_ids), entities
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_same_as_row_path(row_keys, workers):
+
+    idx = USCityIndex()
+    idx.build(workers=workers)
+
+    key_ids, entities = row_keys
+
+    assert dict(idx._key_to_ids) == key_ids
+
+    assert {
+        m.data.wof_id: m.data.to_dict() for m in idx.locations()
+    } == entities
+
+
+def test_timings(load_db):
+
+    idx = USCityIndex()
+    timings = idx.build()
+
+    assert list(timings) == [
+        'extract', 'bare names', 'keys', 'merge', 'entities', 'spatial',
+        'fingerprints',
+    ]
+
+    assert all(t >= 0 for t in timings.values())
@@ -0,0 +1,178 @@
+
+
+import pytest
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from litecoder import db
+from litecoder.db import connect_db, connect_readonly
+from litecoder.models import BaseModel, WOFLocality, WOFRegion, WOFCounty
+from litecoder.usa import hydrate
+
+
+@pytest.fixture(scope='module')
+def db_path(load_db, tmp_path_factory):
+    """Copy the fixture rows into a database file.
+    """
+    path = str(tmp_path_factory.mktemp('db') / 'litecoder.db')
+
+    engine, _ = connect_db(path)
+    BaseModel.metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        for model in (WOFRegion, WOFCounty, WOFLocality):
+            rows = db.session.execute(model.__table__.select()).fetchall()
+            conn.execute(model.__table__.insert(), [dict(r) for r in rows])
+
+    engine.dispose()
+
+    return path
+
+
+@pytest.fixture
+def readonly(db_path, monkeypatch):
+    """Hydrate from a read-only connection to the file.
+    """
+    engine, session = connect_readonly(db_path)
+
+    monkeypatch.setattr(db, 'read_engine', engine)
+    monkeypatch.setattr(db, 'read_session', session)
+
+    yield engine, session
+
+    session.remove()
+    engine.dispose()
+
+
+def test_pragmas(readonly):
+
+    engine, _ = readonly
+
+    with engine.connect() as conn:
+
+        assert conn.execute('pragma query_only').scalar() == 1
+        assert conn.execute('pragma mmap_size').scalar() > 0
+
+        with pytest.raises(OperationalError):
+            conn.execute('delete from wof_locality')
+
+
+def test_connection_per_thread(readonly):
+
+    engine, _ = readonly
+
+    conns = []
+    barrier = threading.Barrier(3)
+
+    def connect():
+        conn = engine.raw_connection()
+        conns.append(id(conn.connection))
+        barrier.wait()
+        conn.close()
+
+    threads = [threading.Thread(target=connect) for _ in range(3)]
+
+    for t in threads:
+        t.start()
+
+    for t in threads:
+        t.join()
+
+    assert len(set(conns)) == 3
+
+
+def test_thread_churn(readonly, city_idx):
+    """Long-lived threads keep working while many short-lived ones come
+    and go.
+    """
+    _, session = readonly
+
+    match = city_idx['Boston, MA'][0]
+
+    errors = []
+    done = threading.Event()
+
+    def query():
+        assert hydrate([match])[0].wof_id == 85950361
+
+    def worker(loop):
+        try:
+            query()
+            while loop and not done.is_set():
+                query()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.remove()
+
+    workers = [
+        threading.Thread(target=worker, args=(True,)) for _ in range(4)
+    ]
+
+    for t in workers:
+        t.start()
+
+    for _ in range(30):
+
+        batch = [
+            threading.Thread(target=worker, args=(False,)) for _ in range(10)
+        ]
+
+        for t in batch:
+            t.start()
+
+        for t in batch:
+            t.join()
+
+    done.set()
+
+    for t in workers:
+        t.join()
+
+    assert errors == []
+
+
+def test_db_row(readonly, city_idx):
+
+    row = city_idx['Boston, MA'][0].db_row
+
+    assert row.wof_id == 85950361
+    assert row in readonly[1]
+
+
+def test_hydrate(readonly, city_idx, state_idx):
+
+    engine, _ = readonly
+
+    matches = [
+        city_idx['Boston, MA'][0],
+        state_idx['California'][0],
+        city_idx['Tuscaloosa, AL'][0],
+        city_idx['Boston, MA'][0],
+    ]
+
+    queries = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count(*args):
+        queries.append(args[2])
+
+    rows = hydrate(matches)
+
+    # One query per model.
+    assert len(queries) == 2
+
+    assert [r.wof_id for r in rows] == [
+        85950361, 85688637, 85914453, 85950361,
+    ]
+
+    assert isinstance(rows[1], WOFRegion)
+
+
+def test_hydrate_default_session(city_idx):
+
+    match = city_idx['Boston, MA'][0]
+
+    assert hydrate([match]) == [match.db_row]
@@ -0,0 +1,124 @@
+
+
+import pytest
+import subprocess
+import sys
+import os
+import json
+
+import litecoder
+
+from litecoder.usa import USCityIndex, build_state_path
+from litecoder.build_state import NamePopulations
+
+
+def build(**kwargs):
+    idx = USCityIndex(**kwargs)
+    idx.build()
+    return idx
+
+
+@pytest.mark.parametrize('min_p1_gap,blocklist', [
+    (50000, None),
+    (10 ** 9, None),
+    (200000, ['Boston']),
+    (50000, ['tuscaloosa', 'New York']),
+])
+def test_same_as_build(load_db, min_p1_gap, blocklist):
+
+    idx = build()
+
+    assert idx.rethreshold(min_p1_gap, blocklist) > 0
+
+    expected = build(min_p1_gap=min_p1_gap, bare_name_blocklist=blocklist)
+
+    assert dict(idx._key_to_ids) == dict(expected._key_to_ids)
+
+    # And back.
+    idx.rethreshold(200000, [])
+
+    assert dict(idx._key_to_ids) == dict(build()._key_to_ids)
+
+
+def test_lookup(load_db):
+
+    idx = build()
+
+    assert not idx['tuscaloosa']
+
+    idx.rethreshold(50000)
+
+    assert idx['tuscaloosa'][0].data.wof_id == 85914453
+    assert idx['tuscaloosa usa'][0].data.wof_id == 85914453
+
+
+def test_update_keeps_params(load_db):
+
+    idx = build()
+    idx.rethreshold(50000)
+
+    keys = dict(idx._key_to_ids)
+
+    assert idx.update() == (0, 0)
+    assert dict(idx._key_to_ids) == keys
+
+
+def test_saved_name_pops(load_db, tmp_path):
+
+    idx = build()
+
+    path = str(tmp_path / 'name-pops.p')
+    idx.build_state().name_pops.save(path)
+
+    name_pops = NamePopulations.load(path)
+
+    assert name_pops == idx.build_state().name_pops
+    assert name_pops.median == idx.build_state().name_pops.median
+
+    idx2 = USCityIndex()
+    idx2.build(name_pops=name_pops)
+
+    assert dict(idx2._key_to_ids) == dict(idx._key_to_ids)
+
+
+def test_no_state():
+
+    with pytest.raises(ValueError):
+        USCityIndex().rethreshold(50000)
+
+
+SCRIPT = '''
+import sys, json
+from litecoder.usa import USCityIndex
+
+idx = USCityIndex.load(sys.argv[1])
+print(json.dumps(dict(
+    rekeyed=idx.rethreshold(50000),
+    modules=[m for m in ('sqlalchemy', 'numpy', 'scipy', 'yaml')
+        if m in sys.modules],
+)))
+'''
+
+
+def test_saved_index(load_db, tmp_path):
+    """The build state goes in its own file, and re-thresholding a saved
+    index doesn't import the models.
+    """
+    idx = build()
+
+    path = str(tmp_path / 'us-cities.p')
+    idx.save(path)
+
+    assert os.path.exists(build_state_path(path))
+    assert USCityIndex.load(path)._build_state is None
+
+    root = os.path.dirname(os.path.dirname(litecoder.__file__))
+
+    out = subprocess.check_output(
+        [sys.executable, '-c', SCRIPT, path], cwd=root,
+    )
+
+    res = json.loads(out.decode().strip().splitlines()[-1])
+
+    assert res['rekeyed'] == build().rethreshold(50000)
+    assert res['modules'] == []
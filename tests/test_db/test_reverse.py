@@ -0,0 +1,123 @@
+
+
+import pytest
+import math
+
+import numpy as np
+
+from litecoder.usa import USCityIndex
+from litecoder.spatial import SpatialIndex, EARTH_RADIUS_KM
+
+
+def haversine(lat1, lon1, lat2, lon2):
+
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2 +
+        math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+@pytest.fixture
+def no_rebuild(monkeypatch):
+    """Fail if the KD-tree gets rebuilt.
+    """
+    def from_store(cls, store):
+        raise AssertionError('KD-tree was rebuilt.')
+
+    monkeypatch.setattr(SpatialIndex, 'from_store', classmethod(from_store))
+
+
+def test_nearest(city_idx):
+
+    (match, km), = city_idx.reverse(42.36, -71.06)
+
+    assert match.data.wof_id == 85950361
+
+    assert km == pytest.approx(haversine(
+        42.36, -71.06, match.data.latitude, match.data.longitude,
+    ))
+
+
+def test_k(city_idx):
+    """Return k matches, nearest first.
+    """
+    res = city_idx.reverse(33.2, -87.5, k=3)
+
+    assert [m.data.wof_id for m, _ in res][0] == 85914453
+    assert len(res) == 3
+
+    dists = [km for _, km in res]
+    assert dists == sorted(dists)
+
+
+def test_max_km(city_idx):
+
+    assert city_idx.reverse(42.5, -71.06, max_km=1) is None
+
+    res = city_idx.reverse(42.36, -71.06, k=3, max_km=100)
+    assert [m.data.wof_id for m, _ in res] == [85950361]
+
+
+def test_reverse_many(city_idx):
+
+    lats = np.array([42.36, 33.2, np.nan, 0])
+    lons = np.array([-71.06, -87.5, 0, 0])
+
+    res = city_idx.reverse_many(lats, lons, max_km=500, fields=('latitude',))
+
+    assert res['wof_id'].tolist() == [85950361, 85914453, -1, -1]
+
+    assert np.isnan(res['km'][2:]).all()
+    assert np.isnan(res['latitude'][2:]).all()
+
+    for i in range(2):
+        (match, km), = city_idx.reverse(lats[i], lons[i])
+        assert res['km'][i] == pytest.approx(km)
+        assert res['latitude'][i] == match.data.latitude
+
+
+def test_pickle(city_idx, tmpdir, no_rebuild):
+    """The tree should be loaded with the index, not rebuilt.
+    """
+    path = str(tmpdir.join('us-cities.p'))
+    city_idx.save(path)
+
+    idx = USCityIndex.load(path)
+
+    (match, _), = idx.reverse(42.36, -71.06)
+    assert match.data.wof_id == 85950361
+
+
+def test_mmap(city_idx, tmpdir, no_rebuild):
+
+    path = str(tmpdir.join('us-cities.idx'))
+    city_idx.save_mmap(path)
+
+    idx = USCityIndex.load_mmap(path)
+
+    (match, _), = idx.reverse(42.36, -71.06)
+    assert match.data.wof_id == 85950361
+
+    res = idx.reverse_many([33.2], [-87.5])
+    assert res['wof_id'].tolist() == [85914453]
+
+
+def test_antimeridian():
+    """Distances should wrap around the globe.
+    """
+    idx = SpatialIndex([0, 0], [179.9, 170], [0, 1])
+
+    rows, km = idx.query([0], [-179.9])
+
+    assert rows.tolist() == [[0]]
+    assert km[0][0] == pytest.approx(haversine(0, 179.9, 0, -179.9))
+
+
+def test_unbuilt():
+
+    with pytest.raises(ValueError):
+        USCityIndex().reverse(42.36, -71.06)
@@ -0,0 +1,272 @@
+
+
+import pytest
+import asyncio
+import json
+
+from litecoder.server import GeocodeServer, MicroBatcher
+
+
+async def request(reader, writer, method, target, body=b'', headers=()):
+    """Send a request on an open connection, read the response.
+
+    Returns: (status, headers, body)
+    """
+    head = ['%s %s HTTP/1.1' % (method, target), 'Host: localhost']
+    head += list(headers)
+
+    if body:
+        head.append('Content-Length: %d' % len(body))
+
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + body)
+
+    status = int((await reader.readline()).split()[1])
+
+    res_headers = dict()
+    while True:
+        line = (await reader.readline()).decode().strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        res_headers[name.lower()] = value.strip()
+
+    res = await reader.readexactly(int(res_headers['content-length']))
+
+    return status, res_headers, json.loads(res)
+
+
+def run_loop(coro):
+    """Run a coroutine on a fresh event loop.
+    """
+    loop = asyncio.new_event_loop()
+
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def run(server, client):
+    """Start the server on a free port, run a client coroutine against it.
+    """
+    async def main():
+
+        srv = await server.start('127.0.0.1', 0)
+        port = srv.sockets[0].getsockname()[1]
+
+        writers = []
+
+        async def connect():
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writers.append(writer)
+            return reader, writer
+
+        try:
+            return await client(connect)
+
+        finally:
+
+            # Let the handlers see EOF and return.
+            for writer in writers:
+                writer.close()
+
+            await asyncio.sleep(0.01)
+
+            srv.close()
+            await srv.wait_closed()
+
+    return run_loop(main())
+
+
+@pytest.fixture
+def server(city_idx, state_idx):
+    return GeocodeServer(city_idx, state_idx)
+
+
+def test_geocode(server, city_idx):
+
+    async def client(connect):
+        reader, writer = await connect()
+        return await request(reader, writer, 'GET', '/geocode?q=Boston,+MA')
+
+    status, _, res = run(server, client)
+
+    assert status == 200
+    assert res['query'] == 'Boston, MA'
+    assert res['cities'] == [city_idx['Boston, MA'][0].data.to_dict()]
+    assert res['states'] == []
+
+
+def test_geocode_batch(server):
+
+    async def client(connect):
+        reader, writer = await connect()
+        body = json.dumps(['Boston, MA', 'xyz', 'California', 'Boston, MA'])
+        return await request(reader, writer, 'POST', '/geocode', body.encode())
+
+    status, _, res = run(server, client)
+
+    assert status == 200
+    assert [r['query'] for r in res] == [
+        'Boston, MA', 'xyz', 'California', 'Boston, MA',
+    ]
+
+    boston, miss, ca, boston2 = res
+
+    assert boston['cities'][0]['wof_id'] == 85950361
+    assert miss['cities'] == miss['states'] == []
+    assert ca['states'][0]['wof_id'] == 85688637
+    assert boston2 == boston
+
+
+def test_keep_alive(server):
+
+    async def client(connect):
+
+        reader, writer = await connect()
+
+        res = [
+            await request(reader, writer, 'GET', '/geocode?q=%s' % q)
+            for q in ('boston+ma', 'tuscaloosa+al', 'xyz')
+        ]
+
+        # Then close.
+        res.append(await request(
+            reader, writer, 'GET', '/health', headers=['Connection: close'],
+        ))
+
+        return res, await reader.read()
+
+    res, rest = run(server, client)
+
+    assert [r[0] for r in res] == [200] * 4
+    assert res[1][2]['cities'][0]['name'] == 'Tuscaloosa'
+    assert res[3][1]['connection'] == 'close'
+    assert rest == b''
+
+
+def test_concurrent_requests_share_passes(city_idx, state_idx):
+
+    server = GeocodeServer(city_idx, state_idx, window=0.05)
+
+    async def client(connect):
+
+        async def one(q):
+            reader, writer = await connect()
+            return await request(reader, writer, 'GET', '/geocode?q=%s' % q)
+
+        queries = ['boston+ma', 'california', 'xyz'] * 10
+
+        return await asyncio.gather(*map(one, queries))
+
+    res = run(server, client)
+
+    assert [r[2]['query'] for r in res] == [
+        'boston ma', 'california', 'xyz',
+    ] * 10
+
+    assert server.batcher.queries == 30
+    assert server.batcher.batches < 30
+
+
+@pytest.mark.parametrize('method,target,body,status', [
+    ('GET', '/nope', b'', 404),
+    ('DELETE', '/geocode', b'', 405),
+    ('GET', '/geocode', b'', 400),
+    ('POST', '/geocode', b'{', 400),
+    ('POST', '/geocode', b'{"q": "Boston"}', 400),
+    ('POST', '/geocode', b'[1, 2]', 400),
+])
+def test_errors(server, method, target, body, status):
+
+    async def client(connect):
+        reader, writer = await connect()
+        return await request(reader, writer, method, target, body)
+
+    res_status, _, res = run(server, client)
+
+    assert res_status == status
+    assert 'error' in res
+
+
+def test_long_header(server):
+
+    async def client(connect):
+        reader, writer = await connect()
+        return await request(
+            reader, writer, 'GET', '/health', headers=['X: %s' % ('a' * 70000)],
+        )
+
+    status, headers, res = run(server, client)
+
+    assert status == 400
+    assert headers['connection'] == 'close'
+
+
+def test_batcher_max_batch():
+
+    calls = []
+
+    def func(texts):
+        calls.append(len(texts))
+        return [t.upper() for t in texts]
+
+    batcher = MicroBatcher(func, window=10, max_batch=4)
+
+    async def main():
+        # Flushed as soon as the batch is full, not after the window.
+        return await asyncio.wait_for(asyncio.gather(
+            batcher.submit(['a', 'b']),
+            batcher.submit(['c', 'd']),
+        ), 1)
+
+    assert run_loop(main()) == [['A', 'B'], ['C', 'D']]
+    assert calls == [4]
+
+
+def test_batcher_splits_big_requests():
+    """A request bigger than `max_batch` is run in chunks, and the loop gets
+    a turn between them.
+    """
+    calls = []
+
+    def func(texts):
+        calls.append(list(texts))
+        return [t.upper() for t in texts]
+
+    batcher = MicroBatcher(func, window=0, max_batch=4)
+
+    async def small():
+        await asyncio.sleep(0)
+        return await batcher.submit(['x'])
+
+    async def main():
+        return await asyncio.gather(
+            batcher.submit(list('abcdefghij')), small(),
+        )
+
+    big_res, small_res = run_loop(main())
+
+    assert big_res == list('ABCDEFGHIJ')
+    assert small_res == ['X']
+
+    assert [len(c) for c in calls] == [4, 4, 3]
+    assert calls[-1] == ['i', 'j', 'x']
+
+
+def test_batcher_error():
+
+    def func(texts):
+        raise ValueError()
+
+    batcher = MicroBatcher(func, window=0)
+
+    async def main():
+        return await asyncio.gather(
+            batcher.submit(['a']), batcher.submit(['b']),
+            return_exceptions=True,
+        )
+
+    res = run_loop(main())
+
+    assert [type(e) for e in res] == [ValueError, ValueError]
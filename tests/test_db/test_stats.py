@@ -0,0 +1,212 @@
+
+
+import pytest
+import pickle
+import threading
+
+from litecoder.usa import Index
+from litecoder.store import infer_columns
+from litecoder.stats import bucket, NUM_BUCKETS
+
+
+@pytest.fixture
+def idx():
+    """'a' -> 2 ids, 'b' -> 1 id.
+    """
+    idx = Index()
+
+    rows = [dict(wof_id=i, name=str(i)) for i in (1, 2, 3)]
+    columns = infer_columns(rows)
+
+    for row in rows:
+        idx.add_entity(row, columns)
+
+    idx.add_key('a', 1)
+    idx.add_key('a', 2)
+    idx.add_key('b', 3)
+
+    return idx
+
+
+def test_disabled(idx):
+
+    assert idx.stats is None
+    assert len(idx['a']) == 2
+
+
+def test_getitem(idx):
+
+    stats = idx.enable_stats()
+
+    idx['a']
+    idx['B']
+    idx['  C ']
+    idx['b']
+
+    snap = stats.snapshot()
+
+    assert snap['lookups'] == 4
+    assert snap['hits'] == 3
+    assert snap['misses'] == 1
+    assert snap['ambiguous'] == 1
+    assert snap['cache_hits'] == 0
+    assert snap['missed_keys'] == ['c']
+
+    assert snap['latency']['get']['count'] == 4
+    assert snap['latency']['get']['sum'] > 0
+    assert snap['latency']['batch']['count'] == 0
+
+
+def test_lookup_many(idx):
+
+    stats = idx.enable_stats()
+
+    idx.lookup_many(['a', 'x', 'a', 'b'])
+    idx.lookup_many(['a', 'y'])
+
+    snap = stats.snapshot()
+
+    assert snap['lookups'] == 6
+    assert snap['hits'] == 4
+    assert snap['ambiguous'] == 3
+    assert snap['misses'] == 2
+    assert snap['cache_hits'] == 1
+    assert sorted(snap['missed_keys']) == ['x', 'y']
+
+    assert snap['latency']['batch']['count'] == 2
+
+
+def test_generator_input(idx):
+
+    stats = idx.enable_stats()
+
+    res = idx.lookup_many(t for t in ['a', 'x'])
+
+    assert len(res) == 2
+    assert stats.snapshot()['lookups'] == 2
+
+
+def test_reservoir(idx):
+
+    stats = idx.enable_stats(sample_size=5)
+
+    for i in range(1000):
+        idx['miss %d' % i]
+
+    keys = stats.snapshot()['missed_keys']
+
+    assert len(keys) == 5
+    assert all(k.startswith('miss ') for k in keys)
+
+    # Not just the first 5.
+    assert keys != ['miss %d' % i for i in range(5)]
+
+
+def test_threads(idx):
+
+    stats = idx.enable_stats(sample_size=10)
+
+    def work():
+        for i in range(100):
+            idx['a']
+            idx['miss %d' % i]
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+
+    for t in threads:
+        t.start()
+
+    for t in threads:
+        t.join()
+
+    snap = stats.snapshot()
+
+    assert snap['lookups'] == 800
+    assert snap['hits'] == snap['misses'] == 400
+    assert len(snap['missed_keys']) == 10
+
+
+def test_hooks(idx):
+
+    stats = idx.enable_stats()
+
+    events = []
+
+    def hook(key, n, seconds):
+        events.append((key, n))
+
+    stats.add_hook(hook)
+
+    idx['A']
+    idx.lookup_many(['b', 'Nope'])
+
+    assert events == [('a', 2), ('b', 1), ('nope', 0)]
+
+    stats.remove_hook(hook)
+    idx['a']
+
+    assert len(events) == 3
+
+
+def test_reset(idx):
+
+    stats = idx.enable_stats()
+
+    idx['a']
+    idx['x']
+
+    stats.reset()
+
+    snap = stats.snapshot()
+
+    assert snap['lookups'] == snap['misses'] == 0
+    assert snap['missed_keys'] == []
+
+
+def test_prometheus(idx):
+
+    stats = idx.enable_stats()
+
+    idx['a']
+    idx['x']
+
+    text = stats.to_prometheus(labels=dict(index='city'))
+
+    lines = text.splitlines()
+
+    assert '# TYPE litecoder_lookups_total counter' in lines
+    assert 'litecoder_lookups_total{index="city"} 2' in lines
+    assert 'litecoder_misses_total{index="city"} 1' in lines
+
+    assert '# TYPE litecoder_get_seconds histogram' in lines
+    assert 'litecoder_get_seconds_bucket{index="city",le="+Inf"} 2' in lines
+    assert 'litecoder_get_seconds_count{index="city"} 2' in lines
+
+    # Buckets are cumulative.
+    counts = [
+        int(l.rsplit(' ', 1)[1]) for l in lines
+        if l.startswith('litecoder_get_seconds_bucket')
+    ]
+
+    assert len(counts) == NUM_BUCKETS
+    assert counts == sorted(counts)
+
+
+def test_buckets():
+
+    assert bucket(0) == 0
+    assert bucket(1e-6) == 1
+    assert bucket(3e-6) == 2
+    assert bucket(1e6) == NUM_BUCKETS - 1
+
+
+def test_pickle_drops_stats(idx):
+
+    idx.enable_stats()
+    idx['a']
+
+    assert pickle.loads(pickle.dumps(idx)).stats is None
+
+    idx.disable_stats()
+
+    assert idx.stats is None
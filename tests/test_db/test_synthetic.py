@@ -0,0 +1,116 @@
+
+
+import pytest
+import os
+
+from collections import Counter
+
+from litecoder.db import session
+from litecoder.models import WOFRegion, WOFCounty, WOFLocality
+from litecoder.usa import USCityIndex
+from benchmarks.synthetic import SyntheticWOF, wof_path
+from litecoder.sources.wof import (
+    WOFRegionRepo, WOFCountyRepo, WOFLocalityRepo
+)
+
+
+SPEC = SyntheticWOF(
+    regions=3,
+    counties=10,
+    localities=300,
+    name_collision_rate=0.3,
+    id_dupe_rate=0.1,
+    near_dupe_rate=0.1,
+    geometry_points=8,
+)
+
+
+@pytest.fixture(scope='module')
+def root(tmpdir_factory):
+    root = str(tmpdir_factory.mktemp('synthetic'))
+    SPEC.write(root)
+    return root
+
+
+@pytest.fixture(scope='module')
+def synthetic_db(reset_db, root):
+
+    for repo_cls, placetype in (
+        (WOFRegionRepo, 'region'),
+        (WOFCountyRepo, 'county'),
+        (WOFLocalityRepo, 'locality'),
+    ):
+        repo_cls(os.path.join(root, 'wof-%s' % placetype)).load_db()
+
+
+def test_counts(synthetic_db):
+    assert WOFRegion.query.count() == 3
+    assert WOFCounty.query.count() == 10
+    assert WOFLocality.query.count() == 300
+
+
+def test_hierarchy(synthetic_db):
+
+    regions = {r.wof_id: r for r in WOFRegion.query}
+    counties = {c.wof_id for c in WOFCounty.query}
+
+    for row in WOFLocality.query:
+        assert row.wof_county_id in counties
+        assert row.name_a1 == regions[row.wof_region_id].name
+        assert row.country_iso == 'US'
+
+
+def test_name_collisions(synthetic_db):
+
+    counts = Counter(r.name for r in WOFLocality.query)
+
+    assert max(counts.values()) > 2
+
+
+def test_dupes(synthetic_db):
+
+    assert WOFLocality.dedupe_id_cols() > 0
+    assert WOFLocality.dedupe_proximity() > 0
+
+    WOFLocality.query.update({WOFLocality.duplicate: False})
+    session.commit()
+
+
+def test_build(synthetic_db):
+
+    idx = USCityIndex()
+    idx.build()
+
+    assert len(idx.locations()) == 300
+
+    row = WOFLocality.query.first()
+
+    ids = idx['%s, %s' % (row.name, row.name_a1)]
+
+    assert row.wof_id in {m.data.wof_id for m in ids}
+
+
+def test_geometry(root):
+
+    source = WOFLocalityRepo(os.path.join(root, 'wof-locality')).source()
+    path = wof_path(os.path.join(root, 'wof-locality'), 920000000)
+
+    assert os.path.exists(path)
+
+    data, = source.docs_iter([path], skip_geometry=False)
+
+    ring, = data['geometry']['coordinates']
+
+    assert len(ring) == 9
+    assert ring[0] == ring[-1]
+
+
+def test_deterministic(root, tmpdir):
+
+    SPEC.write(str(tmpdir))
+
+    path = wof_path(str(tmpdir.join('wof-locality')), 920000123)
+    orig = wof_path(os.path.join(root, 'wof-locality'), 920000123)
+
+    with open(path) as f1, open(orig) as f2:
+        assert f1.read() == f2.read()
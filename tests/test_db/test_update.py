@@ -0,0 +1,126 @@
+
+
+import pytest
+
+from litecoder.db import session
+from litecoder.models import WOFLocality, wof_locality
+from litecoder.usa import USCityIndex
+
+
+@pytest.fixture
+def built_idx(load_db):
+    """Build a city index, then roll back any edits to the database.
+    """
+    idx = USCityIndex()
+    idx.build()
+
+    yield idx
+
+    session.rollback()
+
+
+def full_build(**kwargs):
+    idx = USCityIndex(**kwargs)
+    idx.build()
+    return idx
+
+
+def assert_same_index(idx1, idx2):
+    """Same keys -> ids, and the same metadata for each entity.
+    """
+    assert dict(idx1._key_to_ids) == dict(idx2._key_to_ids)
+
+    def entities(idx):
+        return {m.data.wof_id: m.data.to_dict() for m in idx.locations()}
+
+    assert entities(idx1) == entities(idx2)
+
+    for point in ((42.36, -71.06), (33.2, -87.5)):
+        assert idx1.reverse(*point) == idx2.reverse(*point)
+
+
+def city(wof_id):
+    return WOFLocality.query.get(wof_id)
+
+
+def test_no_changes(built_idx):
+
+    assert built_idx.update() == (0, 0)
+
+    assert_same_index(built_idx, full_build())
+
+
+def test_population(built_idx):
+    """If a city gets bigger, it can get bare-name keys.
+    """
+    assert built_idx['tuscaloosa'] is None
+
+    city(85914453).population = 500000
+
+    assert built_idx.update() == (1, 0)
+
+    assert built_idx['tuscaloosa'][0].data.wof_id == 85914453
+    assert built_idx['tuscaloosa al'][0].data.population == 500000
+
+    assert_same_index(built_idx, full_build())
+
+
+def test_removed(built_idx):
+
+    city(85977539).duplicate = True
+
+    assert built_idx.update() == (0, 1)
+
+    assert built_idx['new york, ny'] is None
+
+    assert_same_index(built_idx, full_build())
+
+
+def test_alt_names(built_idx, monkeypatch):
+
+    boston = city(85950361)
+
+    alt_names = dict(wof_locality.city_alt_names())
+    alt_names[boston.wd_id] = ['Hub of the Universe']
+
+    monkeypatch.setattr(wof_locality, 'city_alt_names', lambda: alt_names)
+
+    built_idx.update()
+
+    assert built_idx['hub of the universe, ma'][0].data.wof_id == 85950361
+
+    assert_same_index(built_idx, full_build())
+
+
+def test_blocklist(built_idx):
+
+    assert built_idx['boston'] is not None
+
+    built_idx.bare_name_blocklist = ['Boston']
+
+    assert built_idx.update() == (1, 0)
+
+    assert built_idx['boston'] is None
+
+    assert_same_index(built_idx, full_build(bare_name_blocklist=['Boston']))
+
+
+def test_pickle(built_idx, tmpdir):
+    """Build state should survive a save / load.
+    """
+    path = str(tmpdir.join('us-cities.p'))
+    built_idx.save(path)
+
+    idx = USCityIndex.load(path)
+
+    city(85914453).population = 500000
+
+    assert idx.update() == (1, 0)
+
+    assert_same_index(idx, full_build())
+
+
+def test_no_build_state():
+
+    with pytest.raises(ValueError):
+        USCityIndex().update()
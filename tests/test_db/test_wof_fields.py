@@ -0,0 +1,115 @@
+
+
+import pytest
+import copy
+import glob
+import os
+
+from litecoder.sources import wof
+from litecoder.utils import read_json
+
+from . import REGION_DIR, COUNTY_DIR, LOCALITY_DIR
+from . import legacy_wof
+
+
+DOC_CLASSES = (
+    (wof.WOFRegionDoc, legacy_wof.WOFRegionDoc, REGION_DIR),
+    (wof.WOFCountyDoc, legacy_wof.WOFCountyDoc, COUNTY_DIR),
+    (wof.WOFLocalityDoc, legacy_wof.WOFLocalityDoc, LOCALITY_DIR),
+)
+
+# Values that break the old property getters in different ways.
+ODD_VALUES = (None, '', 0, -1, 1.5, True, [], [None], ['a*'], {}, 'x*')
+
+
+def fixture_docs(root):
+    paths = glob.glob(os.path.join(root, '**/*.geojson'), recursive=True)
+    return [read_json(p) for p in paths]
+
+
+def variants(doc):
+    """Yield copies of a doc with fields removed or swapped for odd values.
+    """
+    yield doc
+
+    for key in ('id', 'properties'):
+        for value in ODD_VALUES:
+            yield dict(doc, **{key: value})
+
+    props = doc['properties']
+
+    for key in props:
+
+        yield dict(doc, properties={
+            k: v for k, v in props.items() if k != key
+        })
+
+        for value in ODD_VALUES:
+            yield dict(doc, properties=dict(props, **{key: value}))
+
+    concordances = props.get('wof:concordances', {})
+
+    for key in concordances:
+        for value in ODD_VALUES:
+            yield dict(doc, properties=dict(props, **{
+                'wof:concordances': dict(concordances, **{key: value}),
+            }))
+
+    hierarchy = props.get('wof:hierarchy', [])
+
+    def with_hierarchy(hierarchy):
+        return dict(doc, properties=dict(props, **{
+            'wof:hierarchy': hierarchy,
+        }))
+
+    if hierarchy:
+
+        yield with_hierarchy(hierarchy * 2)
+
+        for key in hierarchy[0]:
+
+            # Missing key, odd ids.
+            h = copy.deepcopy(hierarchy)
+            del h[0][key]
+            yield with_hierarchy(h)
+
+            for value in ODD_VALUES:
+                h = copy.deepcopy(hierarchy)
+                h[0][key] = value
+                yield with_hierarchy(h)
+
+            # Two different links.
+            h = copy.deepcopy(hierarchy)
+            h.append(dict(h[0], **{key: 1}))
+            yield with_hierarchy(h)
+
+        for value in ODD_VALUES:
+            yield with_hierarchy([value])
+
+
+@pytest.mark.parametrize('doc_cls,legacy_cls,root', DOC_CLASSES)
+def test_same_as_legacy(doc_cls, legacy_cls, root):
+
+    columns = doc_cls.model.column_names()
+
+    for doc in fixture_docs(root):
+        for data in variants(doc):
+
+            new, old = doc_cls(data), legacy_cls(data)
+
+            assert new.row() == {
+                col: getattr(old, col)
+                for col in columns
+                if hasattr(old, col)
+            }
+
+            for name in doc_cls.fields:
+                assert getattr(new, name) == getattr(old, name)
+
+
+def test_unknown_attribute():
+
+    doc = wof.WOFLocalityDoc(dict(id=1))
+
+    with pytest.raises(AttributeError):
+        doc.missing